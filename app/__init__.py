@@ -10,7 +10,58 @@ socketio = SocketIO()
 mail = Mail()
 load_dotenv()
 
-def create_app():
+# Load the ML models in create_app (before gunicorn forks when preload_app is set)
+PRELOAD_MODELS = os.getenv('PRELOAD_MODELS', 'true').lower() == 'true'
+
+# Watch app/models/CURRENT and swap in newly published model versions
+MODEL_HOT_RELOAD = os.getenv('MODEL_HOT_RELOAD', 'true').lower() == 'true'
+
+
+def preload_models():
+    """Load the forecast models once, reporting process memory before and after"""
+    from app.memory_report import log_memory
+    from app.routes.aqi_prediction_service import load_multi_horizon_models
+    
+    log_memory("before model preload")
+    try:
+        load_multi_horizon_models()
+    except Exception as e:
+        print(f"⚠️ Warning: Could not preload ML models: {e}")
+    log_memory("after model preload")
+    log_model_storage("model preload")
+
+
+def log_model_storage(label):
+    """Print where the loaded model weights live, flagging pickles (private to each worker)"""
+    from app.routes.aqi_prediction_service import model_registry
+    
+    model_set = model_registry.active
+    if model_set is None:
+        return
+    marker = '⚠️' if model_set.pickled_models() else '🧠'
+    print(f"{marker} [pid {os.getpid()}] {label}: {model_set.storage_report()}")
+
+
+def start_background_jobs():
+    """Start per-process background threads (called per worker after fork)"""
+    from app.db import warm_pool
+    warm_pool()
+    
+    from app.forecast_warmer import start_forecast_warmer
+    start_forecast_warmer()
+    
+    from app.database.partitions import start_partition_maintainer
+    start_partition_maintainer()
+    
+    from app.alert_sweeper import start_alert_sweeper
+    start_alert_sweeper()
+    
+    if MODEL_HOT_RELOAD:
+        from app.routes.aqi_prediction_service import model_registry
+        model_registry.start()
+
+
+def create_app(preload=PRELOAD_MODELS):
     app = Flask(__name__,
                 static_folder='static',
                 template_folder='templates')
@@ -22,6 +73,13 @@ def create_app():
 
     mail.init_app(app)
     
+    # One pooled DB connection per request, released at teardown
+    from app import db
+    db.init_app(app)
+    
+    if preload:
+        preload_models()
+    
     # socketio.init_app(app, cors_allowed_origins="*")
     
     # ========== IMPORT BLUEPRINTS ==========
@@ -46,10 +104,21 @@ def create_app():
     from app.routes.auth_live_track import live_track_auth
     app.register_blueprint(live_track_auth)
     
+    from app.routes.auth_risk import risk_auth
+    app.register_blueprint(risk_auth)
+    
+    from app.routes.auth_admin import admin_auth
+    app.register_blueprint(admin_auth)
+    
     from app.routes.locationService import geocode_blueprint
     app.register_blueprint(geocode_blueprint)
     
     from app.location_api import location_api
     app.register_blueprint(location_api)
     
+    # ========== BACKGROUND JOBS ==========
+    # Under a preloading gunicorn master these start in post_fork instead
+    if os.getenv('DEFER_BACKGROUND_JOBS', 'false').lower() != 'true':
+        start_background_jobs()
+    
     return app
\ No newline at end of file
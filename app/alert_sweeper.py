@@ -0,0 +1,116 @@
+"""
+Tracking Alert Sweeper
+======================
+Background thread that deletes expired tracking_alerts rows, so the alert
+list endpoint polled by live_track.js is a pure SELECT.
+
+Every worker runs the thread, but each delete batch first takes a Postgres
+advisory lock without waiting: whichever worker holds it is the sweeper for
+that batch and the others skip the round. Deletes go in bounded batches,
+each its own short transaction, so a backlog never holds locks for long.
+
+Configuration (environment):
+    ALERT_SWEEPER_ENABLED            start the thread from create_app (default true)
+    ALERT_SWEEP_INTERVAL_SECONDS     seconds between rounds (default 60)
+    ALERT_SWEEP_BATCH_SIZE           rows deleted per transaction (default 500)
+    ALERT_SWEEP_MAX_BATCHES          batches per round before yielding (default 20)
+"""
+
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+ALERT_SWEEPER_ENABLED = os.getenv('ALERT_SWEEPER_ENABLED', 'true').lower() == 'true'
+ALERT_SWEEP_INTERVAL_SECONDS = float(os.getenv('ALERT_SWEEP_INTERVAL_SECONDS', 60))
+ALERT_SWEEP_BATCH_SIZE = int(os.getenv('ALERT_SWEEP_BATCH_SIZE', 500))
+ALERT_SWEEP_MAX_BATCHES = int(os.getenv('ALERT_SWEEP_MAX_BATCHES', 20))
+
+SWEEP_LOCK = 'tracking_alerts_sweeper'
+
+
+class AlertSweeper:
+    """Deletes expired tracking_alerts in batches, one worker at a time"""
+
+    def __init__(self, interval_seconds: float = ALERT_SWEEP_INTERVAL_SECONDS,
+                 batch_size: int = ALERT_SWEEP_BATCH_SIZE,
+                 max_batches: int = ALERT_SWEEP_MAX_BATCHES):
+        self.interval_seconds = interval_seconds
+        self.batch_size = max(1, batch_size)
+        self.max_batches = max(1, max_batches)
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_run = None
+
+    def delete_batch(self):
+        """Delete up to batch_size expired alerts; None if another worker is sweeping"""
+        from app.db import connection, try_advisory_lock
+
+        with connection() as conn:
+            cursor = conn.cursor()
+            if not try_advisory_lock(cursor, SWEEP_LOCK):
+                cursor.close()
+                return None
+            cursor.execute("""
+                DELETE FROM tracking_alerts
+                WHERE ctid = ANY(ARRAY(
+                    SELECT ctid FROM tracking_alerts
+                    WHERE expiry_time < NOW()
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                ))
+            """, (self.batch_size,))
+            deleted = cursor.rowcount
+            cursor.close()
+        return deleted
+
+    def run_once(self) -> dict:
+        """One sweep round: batches until the backlog is gone or max_batches is reached"""
+        deleted, batches, leader = 0, 0, True
+        while batches < self.max_batches and not self._stop.is_set():
+            count = self.delete_batch()
+            if count is None:
+                leader = False
+                break
+            batches += 1
+            deleted += count
+            if count < self.batch_size:
+                break
+
+        self.last_run = {'deleted': deleted, 'batches': batches, 'leader': leader}
+        if deleted:
+            logger.info(f"🧹 Swept {deleted} expired tracking alerts in {batches} batch(es)")
+        return self.last_run
+
+    def _loop(self):
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"❌ Alert sweep failed: {e}")
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='alert-sweeper', daemon=True)
+        self._thread.start()
+        logger.info(f"🧹 Alert sweeper started (every {self.interval_seconds:g}s)")
+
+    def stop(self):
+        self._stop.set()
+
+
+alert_sweeper = AlertSweeper()
+
+
+def start_alert_sweeper():
+    """Start the shared sweeper thread if enabled (safe to call more than once)"""
+    if ALERT_SWEEPER_ENABLED:
+        alert_sweeper.start()
+    return alert_sweeper
@@ -1,82 +1,12 @@
 import requests
 
+from app.aqi_engine import convert_to_indian_aqi, indian_aqi_category
+
 # API Configuration
 API_KEY = "your_openweather_api_key_here"
 LAT = 16.78  # Example: Talikota
 LON = 76.31
 
-def calculate_sub_index(cp, breakpoints):
-    """Calculate AQI sub-index for a pollutant"""
-    # Handle None or invalid values
-    if cp is None or cp < 0:
-        return None
-    
-    for bp in breakpoints:
-        if bp["low"] <= cp <= bp["high"]:
-            aqi = ((bp["Ihigh"] - bp["Ilow"]) / (bp["high"] - bp["low"])) * (cp - bp["low"]) + bp["Ilow"]
-            return round(aqi, 2)
-    
-    # If value exceeds all breakpoints, return highest index
-    if cp > breakpoints[-1]["high"]:
-        return breakpoints[-1]["Ihigh"]
-    
-    return None
-
-# Indian AQI Breakpoints (CPCB Standards)
-PM25_BREAKPOINTS = [
-    {"low": 0, "high": 30, "Ilow": 0, "Ihigh": 50},
-    {"low": 31, "high": 60, "Ilow": 51, "Ihigh": 100},
-    {"low": 61, "high": 90, "Ilow": 101, "Ihigh": 200},
-    {"low": 91, "high": 120, "Ilow": 201, "Ihigh": 300},
-    {"low": 121, "high": 250, "Ilow": 301, "Ihigh": 400},
-    {"low": 251, "high": 380, "Ilow": 401, "Ihigh": 500},
-]
-
-PM10_BREAKPOINTS = [
-    {"low": 0, "high": 50, "Ilow": 0, "Ihigh": 50},
-    {"low": 51, "high": 100, "Ilow": 51, "Ihigh": 100},
-    {"low": 101, "high": 250, "Ilow": 101, "Ihigh": 200},
-    {"low": 251, "high": 350, "Ilow": 201, "Ihigh": 300},
-    {"low": 351, "high": 430, "Ilow": 301, "Ihigh": 400},
-    {"low": 431, "high": 500, "Ilow": 401, "Ihigh": 500},
-]
-
-NO2_BREAKPOINTS = [
-    {"low": 0, "high": 40, "Ilow": 0, "Ihigh": 50},
-    {"low": 41, "high": 80, "Ilow": 51, "Ihigh": 100},
-    {"low": 81, "high": 180, "Ilow": 101, "Ihigh": 200},
-    {"low": 181, "high": 280, "Ilow": 201, "Ihigh": 300},
-    {"low": 281, "high": 400, "Ilow": 301, "Ihigh": 400},
-    {"low": 401, "high": 500, "Ilow": 401, "Ihigh": 500},
-]
-
-SO2_BREAKPOINTS = [
-    {"low": 0, "high": 40, "Ilow": 0, "Ihigh": 50},
-    {"low": 41, "high": 80, "Ilow": 51, "Ihigh": 100},
-    {"low": 81, "high": 380, "Ilow": 101, "Ihigh": 200},
-    {"low": 381, "high": 800, "Ilow": 201, "Ihigh": 300},
-    {"low": 801, "high": 1600, "Ilow": 301, "Ihigh": 400},
-    {"low": 1601, "high": 2000, "Ilow": 401, "Ihigh": 500},
-]
-
-CO_BREAKPOINTS = [
-    {"low": 0, "high": 1, "Ilow": 0, "Ihigh": 50},
-    {"low": 1.1, "high": 2, "Ilow": 51, "Ihigh": 100},
-    {"low": 2.1, "high": 10, "Ilow": 101, "Ihigh": 200},
-    {"low": 10.1, "high": 17, "Ilow": 201, "Ihigh": 300},
-    {"low": 17.1, "high": 34, "Ilow": 301, "Ihigh": 400},
-    {"low": 34.1, "high": 50, "Ilow": 401, "Ihigh": 500},
-]
-
-O3_BREAKPOINTS = [
-    {"low": 0, "high": 50, "Ilow": 0, "Ihigh": 50},
-    {"low": 51, "high": 100, "Ilow": 51, "Ihigh": 100},
-    {"low": 101, "high": 168, "Ilow": 101, "Ihigh": 200},
-    {"low": 169, "high": 208, "Ilow": 201, "Ihigh": 300},
-    {"low": 209, "high": 748, "Ilow": 301, "Ihigh": 400},
-    {"low": 749, "high": 1000, "Ilow": 401, "Ihigh": 500},
-]
-
 def openweather_aqi_label(aqi):
     """Convert OpenWeather AQI number to label"""
     labels = {
@@ -88,21 +18,6 @@ def openweather_aqi_label(aqi):
     }
     return labels.get(aqi, "Unknown")
 
-def indian_aqi_category(aqi):
-    """Get Indian AQI category"""
-    if aqi <= 50:
-        return "Good"
-    elif aqi <= 100:
-        return "Satisfactory"
-    elif aqi <= 200:
-        return "Moderate"
-    elif aqi <= 300:
-        return "Poor"
-    elif aqi <= 400:
-        return "Very Poor"
-    else:
-        return "Severe"
-
 # =========================================
 # WEATHER API
 # =========================================
@@ -156,34 +71,26 @@ try:
     # =========================================
     # INDIAN AQI CALCULATION (FIXED)
     # =========================================
-    pm25 = components["pm2_5"]
-    pm10 = components["pm10"]
-    no2 = components["no2"]
-    so2 = components["so2"]
-    co = components["co"] / 1000  # Convert µg/m³ to mg/m³
-    o3 = components["o3"]
-    
-    # Calculate sub-indices
-    pm25_index = calculate_sub_index(pm25, PM25_BREAKPOINTS)
-    pm10_index = calculate_sub_index(pm10, PM10_BREAKPOINTS)
-    no2_index = calculate_sub_index(no2, NO2_BREAKPOINTS)
-    so2_index = calculate_sub_index(so2, SO2_BREAKPOINTS)
-    co_index = calculate_sub_index(co, CO_BREAKPOINTS)
-    o3_index = calculate_sub_index(o3, O3_BREAKPOINTS)
-    
-    # Filter out None values and get maximum
-    indices = [idx for idx in [pm25_index, pm10_index, no2_index, so2_index, co_index, o3_index] if idx is not None]
+    result = convert_to_indian_aqi({
+        "pm25": components["pm2_5"],
+        "pm10": components["pm10"],
+        "no2": components["no2"],
+        "so2": components["so2"],
+        "co": components["co"],  # µg/m³, converted to mg/m³ by the engine
+        "o3": components["o3"]
+    })
+    sub_indices = result["sub_indices"]
     
-    if indices:
-        indian_aqi = int(max(indices))
+    if result["aqi"] is not None:
+        indian_aqi = int(result["aqi"])
         
         print("\n=============== INDIAN AQI (CPCB) ===============")
-        print(f"PM2.5 Index: {pm25_index}")
-        print(f"PM10 Index: {pm10_index}")
-        print(f"NO2 Index: {no2_index}")
-        print(f"SO2 Index: {so2_index}")
-        print(f"CO Index: {co_index}")
-        print(f"O3 Index: {o3_index}")
+        print(f"PM2.5 Index: {sub_indices.get('pm25')}")
+        print(f"PM10 Index: {sub_indices.get('pm10')}")
+        print(f"NO2 Index: {sub_indices.get('no2')}")
+        print(f"SO2 Index: {sub_indices.get('so2')}")
+        print(f"CO Index: {sub_indices.get('co')}")
+        print(f"O3 Index: {sub_indices.get('o3')}")
         print(f"\n🎯 Final AQI Value: {indian_aqi}")
         print(f"📊 Category: {indian_aqi_category(indian_aqi)}")
     else:
@@ -0,0 +1,380 @@
+"""
+AQI Computation Engine
+======================
+Single home for the CPCB (Indian) AQI breakpoint logic and AQI category
+lookups. Breakpoint tables are compiled once at import time.
+
+APIs:
+    sub_index(pollutant, concentration)      one pollutant, one reading
+    convert_to_indian_aqi(values)            one reading of all pollutants
+    convert_to_indian_aqi_batch(values)      arrays / DataFrame of readings (NumPy)
+    IncrementalAqi                           running AQI as pollutants arrive one by one
+    indian_aqi_category / us_aqi_category    category names for each scale
+    indian_aqi_category_batch                category names for an array of AQI values
+
+Concentrations are µg/m³ for every pollutant (CO is converted to mg/m³
+internally, as CPCB defines it).
+
+Microbenchmark and parity check (from the repository root):
+    python -m app.aqi_engine
+"""
+
+import time
+from bisect import bisect_right
+from typing import Dict, Optional
+
+import numpy as np
+
+# ============================================================================
+# BREAKPOINT TABLES
+# ============================================================================
+
+POLLUTANTS = ['pm25', 'pm10', 'no2', 'so2', 'co', 'o3']
+
+# (concentration low, concentration high, index low, index high); CO in mg/m³
+INDIAN_BREAKPOINTS = {
+    'pm25': [(0, 30, 0, 50), (31, 60, 51, 100), (61, 90, 101, 200),
+             (91, 120, 201, 300), (121, 250, 301, 400), (251, 380, 401, 500)],
+    'pm10': [(0, 50, 0, 50), (51, 100, 51, 100), (101, 250, 101, 200),
+             (251, 350, 201, 300), (351, 430, 301, 400), (431, 550, 401, 500)],
+    'no2': [(0, 40, 0, 50), (41, 80, 51, 100), (81, 180, 101, 200),
+            (181, 280, 201, 300), (281, 400, 301, 400), (401, 550, 401, 500)],
+    'so2': [(0, 40, 0, 50), (41, 80, 51, 100), (81, 380, 101, 200),
+            (381, 800, 201, 300), (801, 1600, 301, 400), (1601, 2100, 401, 500)],
+    'co': [(0, 1.0, 0, 50), (1.1, 2.0, 51, 100), (2.1, 10, 101, 200),
+           (10.1, 17, 201, 300), (17.1, 34, 301, 400), (34.1, 46, 401, 500)],
+    'o3': [(0, 50, 0, 50), (51, 100, 51, 100), (101, 168, 101, 200),
+           (169, 208, 201, 300), (209, 748, 301, 400), (749, 1000, 401, 500)]
+}
+
+# Input unit (µg/m³) -> breakpoint unit: CO breakpoints are in mg/m³
+UNIT_DIVISOR = {'co': 1000.0}
+
+MAX_SUB_INDEX = 500
+MIN_SUB_INDEX = 0
+
+
+class _Table:
+    """Compiled breakpoints of one pollutant (tuples for scalar use, arrays for NumPy)"""
+
+    __slots__ = ('bp_lo', 'bp_hi', 'aqi_lo', 'slope', 'top', 'bottom',
+                 'np_bp_lo', 'np_bp_hi', 'np_aqi_lo', 'np_slope')
+
+    def __init__(self, breakpoints):
+        self.bp_lo = tuple(bp[0] for bp in breakpoints)
+        self.bp_hi = tuple(bp[1] for bp in breakpoints)
+        self.aqi_lo = tuple(bp[2] for bp in breakpoints)
+        # Same expression as the linear interpolation, evaluated once
+        self.slope = tuple((bp[3] - bp[2]) / (bp[1] - bp[0]) for bp in breakpoints)
+        self.top = self.bp_hi[-1]
+        self.bottom = self.bp_lo[0]
+
+        self.np_bp_lo = np.array(self.bp_lo, dtype=float)
+        self.np_bp_hi = np.array(self.bp_hi, dtype=float)
+        self.np_aqi_lo = np.array(self.aqi_lo, dtype=float)
+        self.np_slope = np.array(self.slope, dtype=float)
+
+
+_TABLES = {pollutant: _Table(breakpoints) for pollutant, breakpoints in INDIAN_BREAKPOINTS.items()}
+
+
+# ============================================================================
+# SCALAR API
+# ============================================================================
+
+def sub_index(pollutant: str, concentration: Optional[float]) -> Optional[int]:
+    """
+    CPCB sub-index of one reading, in breakpoint units (CO in mg/m³).
+    Values between two ranges give None, above the top range 500, below 0 give 0.
+    """
+    table = _TABLES.get(pollutant)
+    if table is None or concentration is None:
+        return None
+
+    segment = bisect_right(table.bp_lo, concentration) - 1
+    if segment >= 0 and table.bp_lo[segment] <= concentration <= table.bp_hi[segment]:
+        return round(table.slope[segment] * (concentration - table.bp_lo[segment]) + table.aqi_lo[segment])
+
+    if concentration > table.top:
+        return MAX_SUB_INDEX
+    elif concentration < table.bottom:
+        return MIN_SUB_INDEX
+    return None
+
+
+def convert_to_indian_aqi(pollutant_values: Dict[str, float]) -> Dict:
+    """Convert pollutant concentrations (µg/m³) to Indian CPCB AQI"""
+    sub_indices = {}
+    for pollutant in POLLUTANTS:
+        concentration = pollutant_values.get(pollutant)
+        if concentration is None:
+            continue
+        value = sub_index(pollutant, concentration / UNIT_DIVISOR[pollutant] if pollutant in UNIT_DIVISOR else concentration)
+        if value is not None:
+            sub_indices[pollutant] = value
+
+    if not sub_indices:
+        return {'aqi': None, 'dominant_pollutant': None, 'sub_indices': {}}
+
+    dominant_pollutant = max(sub_indices, key=sub_indices.get)
+    return {
+        'aqi': sub_indices[dominant_pollutant],
+        'dominant_pollutant': dominant_pollutant,
+        'sub_indices': sub_indices
+    }
+
+
+# ============================================================================
+# BATCH API
+# ============================================================================
+
+def sub_index_batch(pollutant: str, concentration: np.ndarray) -> np.ndarray:
+    """Vectorized sub_index (breakpoint units): NaN where the scalar version returns None"""
+    table = _TABLES[pollutant]
+    concentration = np.asarray(concentration, dtype=float)
+
+    # Segment with the largest lower bound <= concentration
+    segment = np.searchsorted(table.np_bp_lo, concentration, side='right') - 1
+    safe = np.clip(segment, 0, len(table.np_bp_lo) - 1)
+    in_segment = (segment >= 0) & (concentration <= table.np_bp_hi[safe])
+
+    interpolated = np.round(table.np_slope[safe] * (concentration - table.np_bp_lo[safe]) + table.np_aqi_lo[safe])
+
+    result = np.full(concentration.shape, np.nan)
+    result[in_segment] = interpolated[in_segment]
+    result[concentration > table.top] = MAX_SUB_INDEX
+    result[concentration < table.bottom] = MIN_SUB_INDEX
+    return result
+
+
+def convert_to_indian_aqi_batch(values) -> Dict:
+    """
+    Vectorized convert_to_indian_aqi over many readings.
+
+    `values` is a DataFrame or a mapping of pollutant -> array-like, keyed
+    'pm25' (or 'pm2_5'), 'pm10', 'no2', 'so2', 'co', 'o3' in µg/m³. Missing
+    readings may be None/NaN. Returns arrays matching the scalar version
+    element by element:
+        aqi                float array, NaN where the scalar returns None
+        dominant_pollutant object array of pollutant names / None
+        sub_indices        {pollutant: float array, NaN where absent}
+    """
+    def column(name):
+        if name in values:
+            series = values[name]
+        elif name == 'pm25' and 'pm2_5' in values:
+            series = values['pm2_5']
+        else:
+            return None
+        # None becomes NaN under a float dtype
+        return np.asarray(series, dtype=float).reshape(-1)
+
+    columns = {pollutant: column(pollutant) for pollutant in POLLUTANTS}
+    n_rows = next((len(c) for c in columns.values() if c is not None), 0)
+
+    sub_indices = {}
+    for pollutant in POLLUTANTS:
+        concentration = columns[pollutant]
+        if concentration is None:
+            sub_indices[pollutant] = np.full(n_rows, np.nan)
+            continue
+        if pollutant in UNIT_DIVISOR:
+            concentration = concentration / UNIT_DIVISOR[pollutant]
+        sub_indices[pollutant] = sub_index_batch(pollutant, concentration)
+
+    matrix = np.column_stack([sub_indices[p] for p in POLLUTANTS]) if n_rows else np.empty((0, len(POLLUTANTS)))
+    has_any = ~np.isnan(matrix).all(axis=1)
+
+    # First maximum in pollutant order, like max() over the scalar dict
+    dominant_idx = np.argmax(np.where(np.isnan(matrix), -np.inf, matrix), axis=1)
+    aqi = np.where(has_any, matrix[np.arange(n_rows), dominant_idx], np.nan)
+    dominant = np.array([POLLUTANTS[i] if ok else None for i, ok in zip(dominant_idx, has_any)], dtype=object)
+
+    return {
+        'aqi': aqi,
+        'dominant_pollutant': dominant,
+        'sub_indices': sub_indices
+    }
+
+
+# ============================================================================
+# INCREMENTAL API
+# ============================================================================
+
+class IncrementalAqi:
+    """
+    Running AQI for one location/hour as pollutant readings arrive
+    separately. Each update recomputes only that pollutant's sub-index.
+    """
+
+    def __init__(self):
+        self.sub_indices = {}
+
+    def update(self, pollutant: str, concentration: Optional[float]) -> Dict:
+        """Set (or clear with None) one pollutant reading in µg/m³ and return the current AQI"""
+        value = None
+        if concentration is not None:
+            value = sub_index(pollutant, concentration / UNIT_DIVISOR[pollutant] if pollutant in UNIT_DIVISOR else concentration)
+
+        if value is None:
+            self.sub_indices.pop(pollutant, None)
+        else:
+            self.sub_indices[pollutant] = value
+        return self.result()
+
+    def result(self) -> Dict:
+        """Same shape as convert_to_indian_aqi"""
+        ordered = {p: self.sub_indices[p] for p in POLLUTANTS if p in self.sub_indices}
+        if not ordered:
+            return {'aqi': None, 'dominant_pollutant': None, 'sub_indices': {}}
+        dominant_pollutant = max(ordered, key=ordered.get)
+        return {
+            'aqi': ordered[dominant_pollutant],
+            'dominant_pollutant': dominant_pollutant,
+            'sub_indices': ordered
+        }
+
+
+# ============================================================================
+# CATEGORIES
+# ============================================================================
+
+# (upper bound inclusive, name)
+INDIAN_CATEGORIES = [(50, 'Good'), (100, 'Satisfactory'), (200, 'Moderate'),
+                     (300, 'Poor'), (400, 'Very Poor'), (float('inf'), 'Severe')]
+
+# US EPA scale, used by WAQI station readings
+US_CATEGORIES = [(50, 'Good'), (100, 'Moderate'), (150, 'Unhealthy for Sensitive Groups'),
+                 (200, 'Unhealthy'), (300, 'Very Unhealthy'), (float('inf'), 'Hazardous')]
+
+
+def _category(aqi: Optional[float], categories) -> str:
+    if aqi is None or aqi != aqi:
+        return 'Unknown'
+    for upper, name in categories:
+        if aqi <= upper:
+            return name
+    return categories[-1][1]
+
+
+def indian_aqi_category(aqi: Optional[float]) -> str:
+    """CPCB category (Good .. Severe) for an Indian AQI value"""
+    return _category(aqi, INDIAN_CATEGORIES)
+
+
+def indian_aqi_category_batch(aqi) -> np.ndarray:
+    """Vectorized indian_aqi_category: object array of names, 'Unknown' for NaN"""
+    aqi = np.asarray(aqi, dtype=float)
+    bounds = np.array([upper for upper, _ in INDIAN_CATEGORIES[:-1]])
+    names = np.array([name for _, name in INDIAN_CATEGORIES] + ['Unknown'], dtype=object)
+    idx = np.searchsorted(bounds, aqi, side='left')
+    idx[np.isnan(aqi)] = len(names) - 1
+    return names[idx]
+
+
+def us_aqi_category(aqi: Optional[float]) -> str:
+    """US EPA category (Good .. Hazardous) for a US-scale AQI value such as WAQI's"""
+    return _category(aqi, US_CATEGORIES)
+
+
+# ============================================================================
+# MICROBENCHMARK
+# ============================================================================
+
+def _legacy_convert_to_indian_aqi(pollutant_values: Dict[str, float]) -> Dict:
+    """The previous per-call implementation (breakpoints rebuilt on every call), kept for comparison"""
+    indian_breakpoints = {pollutant: list(table) for pollutant, table in INDIAN_BREAKPOINTS.items()}
+
+    def calculate_sub_index(pollutant, concentration):
+        if pollutant not in indian_breakpoints or concentration is None:
+            return None
+        breakpoints = indian_breakpoints[pollutant]
+        for bp_lo, bp_hi, aqi_lo, aqi_hi in breakpoints:
+            if bp_lo <= concentration <= bp_hi:
+                if (bp_hi - bp_lo) == 0:
+                    return aqi_lo
+                return round(((aqi_hi - aqi_lo) / (bp_hi - bp_lo)) * (concentration - bp_lo) + aqi_lo)
+        if concentration > breakpoints[-1][1]:
+            return 500
+        elif concentration < breakpoints[0][0]:
+            return 0
+        return None
+
+    sub_indices = {}
+    for pollutant in ['pm25', 'pm10', 'no2', 'so2']:
+        if pollutant in pollutant_values and pollutant_values[pollutant] is not None:
+            sub_indices[pollutant] = calculate_sub_index(pollutant, pollutant_values[pollutant])
+    if 'co' in pollutant_values and pollutant_values['co'] is not None:
+        sub_indices['co'] = calculate_sub_index('co', pollutant_values['co'] / 1000.0)
+    if 'o3' in pollutant_values and pollutant_values['o3'] is not None:
+        sub_indices['o3'] = calculate_sub_index('o3', pollutant_values['o3'])
+
+    sub_indices = {k: v for k, v in sub_indices.items() if v is not None}
+    if not sub_indices:
+        return {'aqi': None, 'dominant_pollutant': None, 'sub_indices': {}}
+    dominant_pollutant = max(sub_indices, key=sub_indices.get)
+    return {'aqi': sub_indices[dominant_pollutant], 'dominant_pollutant': dominant_pollutant,
+            'sub_indices': sub_indices}
+
+
+def _random_readings(n_rows: int, seed: int = 0) -> Dict[str, np.ndarray]:
+    """Readings spread over every range, including gaps, exact bounds, out-of-range and missing values"""
+    rng = np.random.default_rng(seed)
+    readings = {}
+    for pollutant, breakpoints in INDIAN_BREAKPOINTS.items():
+        scale = 1000.0 if pollutant == 'co' else 1.0
+        top = breakpoints[-1][1] * scale
+        values = rng.uniform(-0.05 * top, 1.2 * top, n_rows)
+        bounds = np.array([b for bp in breakpoints for b in bp[:2]]) * scale
+        exact = rng.random(n_rows) < 0.1
+        values[exact] = rng.choice(bounds, exact.sum())
+        values[rng.random(n_rows) < 0.05] = np.nan
+        readings[pollutant] = values
+    return readings
+
+
+def run_benchmark(n_rows: int = 20000) -> Dict[str, float]:
+    """Check every API against the legacy implementation and print calls per second"""
+    readings = _random_readings(n_rows)
+    records = [
+        {p: (None if np.isnan(readings[p][i]) else float(readings[p][i])) for p in POLLUTANTS}
+        for i in range(n_rows)
+    ]
+
+    expected = [_legacy_convert_to_indian_aqi(record) for record in records]
+    batch = convert_to_indian_aqi_batch(readings)
+    for i, record in enumerate(records):
+        scalar = convert_to_indian_aqi(record)
+        if scalar != expected[i]:
+            raise AssertionError(f"Scalar mismatch for {record}: {scalar} != {expected[i]}")
+
+        incremental = IncrementalAqi()
+        for pollutant in POLLUTANTS:
+            incremental.update(pollutant, record[pollutant])
+        if incremental.result() != expected[i]:
+            raise AssertionError(f"Incremental mismatch for {record}")
+
+        batch_aqi = None if np.isnan(batch['aqi'][i]) else int(batch['aqi'][i])
+        if batch_aqi != expected[i]['aqi'] or batch['dominant_pollutant'][i] != expected[i]['dominant_pollutant']:
+            raise AssertionError(f"Batch mismatch for {record}")
+
+    def rate(fn):
+        start = time.perf_counter()
+        fn()
+        return n_rows / (time.perf_counter() - start)
+
+    results = {
+        'legacy_scalar': rate(lambda: [_legacy_convert_to_indian_aqi(r) for r in records]),
+        'engine_scalar': rate(lambda: [convert_to_indian_aqi(r) for r in records]),
+        'engine_batch': rate(lambda: convert_to_indian_aqi_batch(readings))
+    }
+
+    print(f"✓ {n_rows} readings: scalar, incremental and batch results match the legacy implementation")
+    for name, calls_per_second in results.items():
+        print(f"  {name:<15} {calls_per_second:>14,.0f} readings/s "
+              f"({calls_per_second / results['legacy_scalar']:.1f}x)")
+    return results
+
+
+if __name__ == '__main__':
+    run_benchmark()
@@ -0,0 +1,269 @@
+"""
+Schema Migrations
+=================
+Applies app/database/migrations/NNN_name.sql in version order. Each file
+runs in its own transaction and is recorded in schema_migrations together
+with a checksum, so a re-run only applies what is new. A session advisory
+lock keeps two deploys from migrating at the same time.
+
+The `explain` check runs EXPLAIN on the hot aqi_hourly_data queries and
+fails unless they prune to the right monthly partitions and use the
+composite btree (location reads) or the BRIN index (time-range reads).
+Point it at a local Postgres after `migrate up`; it only reads.
+
+Usage:
+    python -m app.database.migrate [up]          # apply pending migrations
+    python -m app.database.migrate status
+    python -m app.database.migrate maintain [--months-ahead 3] [--retention-months 24]
+    python -m app.database.migrate explain
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from app.db import get_db_connection
+from app.database.partitions import (AQI_PARTITION_MONTHS_AHEAD, AQI_RETENTION_MONTHS,
+                                     list_partitions, maintain)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+MIGRATION_FILE = re.compile(r'^(\d{3})_[\w-]+\.sql$')
+MIGRATION_LOCK_ID = 72_210_001
+
+
+# ============================================================================
+# MIGRATION RUNNER
+# ============================================================================
+
+def discover_migrations(migrations_dir: str = MIGRATIONS_DIR) -> List[Dict]:
+    """Migration files in version order: [{'version', 'name', 'path', 'checksum'}, ...]"""
+    migrations = []
+    for name in sorted(os.listdir(migrations_dir)):
+        match = MIGRATION_FILE.match(name)
+        if not match:
+            continue
+        path = os.path.join(migrations_dir, name)
+        with open(path, 'rb') as f:
+            checksum = hashlib.sha256(f.read()).hexdigest()
+        migrations.append({'version': match.group(1), 'name': name, 'path': path, 'checksum': checksum})
+
+    versions = [m['version'] for m in migrations]
+    duplicates = sorted({v for v in versions if versions.count(v) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate migration versions: {', '.join(duplicates)}")
+    return migrations
+
+
+def _ensure_history_table(connection):
+    cursor = connection.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version VARCHAR(10) PRIMARY KEY,
+            name TEXT NOT NULL,
+            checksum CHAR(64) NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    connection.commit()
+    cursor.close()
+
+
+def applied_migrations(connection) -> Dict[str, Dict]:
+    _ensure_history_table(connection)
+    cursor = connection.cursor()
+    cursor.execute("SELECT version, name, checksum, applied_at FROM schema_migrations ORDER BY version")
+    applied = {version: {'name': name, 'checksum': checksum, 'applied_at': applied_at}
+               for version, name, checksum, applied_at in cursor.fetchall()}
+    cursor.close()
+    return applied
+
+
+def migration_status(connection) -> List[Dict]:
+    applied = applied_migrations(connection)
+    status = []
+    for migration in discover_migrations():
+        record = applied.get(migration['version'])
+        if record is None:
+            state = 'pending'
+        elif record['checksum'] != migration['checksum']:
+            state = 'changed since applied'
+        else:
+            state = 'applied'
+        status.append({**migration, 'state': state, 'applied_at': record and record['applied_at']})
+    return status
+
+
+def migrate(connection) -> List[str]:
+    """Apply pending migrations in order; returns the names applied"""
+    cursor = connection.cursor()
+    cursor.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+    connection.commit()
+
+    applied_now = []
+    try:
+        for migration in migration_status(connection):
+            if migration['state'] == 'changed since applied':
+                print(f"⚠️  {migration['name']} changed after it was applied; not re-running it")
+            if migration['state'] != 'pending':
+                continue
+
+            print(f"→ Applying {migration['name']}")
+            with open(migration['path'], encoding='utf-8') as f:
+                sql = f.read()
+            try:
+                cursor.execute(sql)
+                cursor.execute(
+                    "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                    (migration['version'], migration['name'], migration['checksum'])
+                )
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+            applied_now.append(migration['name'])
+    finally:
+        cursor.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+        connection.commit()
+        cursor.close()
+
+    return applied_now
+
+
+# ============================================================================
+# EXPLAIN CHECK
+# ============================================================================
+
+def _plan_nodes(node):
+    yield node
+    for child in node.get('Plans', []):
+        yield from _plan_nodes(child)
+
+
+def explain(cursor, query: str, params) -> List[Dict]:
+    """Plan nodes of `query` (index paths forced, so tiny tables still show them)"""
+    cursor.execute("SET LOCAL enable_seqscan = off")
+    cursor.execute(f"EXPLAIN (FORMAT JSON) {query}", params)
+    plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return list(_plan_nodes(plan[0]['Plan']))
+
+
+def _index_methods(cursor) -> Dict[str, str]:
+    """index name -> access method for aqi_hourly_data and its partitions"""
+    cursor.execute("""
+        SELECT ic.relname, am.amname
+        FROM pg_index x
+        JOIN pg_class ic ON ic.oid = x.indexrelid
+        JOIN pg_am am ON am.oid = ic.relam
+        JOIN pg_class t ON t.oid = x.indrelid
+        WHERE t.relname LIKE %s
+    """, ('aqi_hourly_data%',))
+    return dict(cursor.fetchall())
+
+
+def check_query_plans(connection) -> List[Dict]:
+    """
+    EXPLAIN the forecast window read and a time-range read of aqi_hourly_data.
+    Returns [{'check', 'ok', 'detail'}, ...].
+    """
+    cursor = connection.cursor()
+    methods = _index_methods(cursor)
+    partitions = {p['name'] for p in list_partitions(cursor)}
+    now = datetime.now().replace(minute=0, second=0, microsecond=0)
+    results = []
+
+    def scanned(nodes):
+        return {n['Relation Name'] for n in nodes if n.get('Relation Name') in partitions}
+
+    # get_24h_data_from_db: one location, 26 hours -> at most two monthly partitions, via the btree
+    window_start = now - timedelta(hours=25)
+    nodes = explain(cursor, """
+        SELECT hour_timestamp, pm2_5, pm10, no2, so2, co, o3, indian_aqi
+        FROM aqi_hourly_data
+        WHERE latitude = %s AND longitude = %s
+          AND hour_timestamp >= %s AND hour_timestamp < %s
+    """, (28.6139, 77.209, window_start, now + timedelta(hours=1)))
+    indexes = {n['Index Name'] for n in nodes if 'Index Name' in n}
+    results.append({
+        'check': 'location window uses the (latitude, longitude, hour_timestamp) btree',
+        'ok': bool(indexes) and all(methods.get(i) == 'btree' for i in indexes)
+              and not any(n['Node Type'] == 'Seq Scan' for n in nodes),
+        'detail': sorted(indexes)
+    })
+    results.append({
+        'check': 'location window prunes to at most 2 partitions',
+        'ok': 1 <= len(scanned(nodes)) <= 2,
+        'detail': sorted(scanned(nodes))
+    })
+
+    # All locations for one week -> BRIN bitmap scan on one or two partitions
+    nodes = explain(cursor, """
+        SELECT latitude, longitude, indian_aqi
+        FROM aqi_hourly_data
+        WHERE hour_timestamp >= %s AND hour_timestamp < %s
+    """, (now - timedelta(days=7), now))
+    indexes = {n['Index Name'] for n in nodes if 'Index Name' in n}
+    results.append({
+        'check': 'time-range read uses the hour_timestamp BRIN index',
+        'ok': bool(indexes) and all(methods.get(i) == 'brin' for i in indexes),
+        'detail': sorted(indexes)
+    })
+    results.append({
+        'check': 'time-range read prunes to at most 2 partitions',
+        'ok': 1 <= len(scanned(nodes)) <= 2,
+        'detail': sorted(scanned(nodes))
+    })
+
+    connection.rollback()
+    cursor.close()
+    return results
+
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Apply and check database migrations')
+    subcommands = parser.add_subparsers(dest='command')
+    subcommands.add_parser('up', help='apply pending migrations (default)')
+    subcommands.add_parser('status', help='list migrations and whether they are applied')
+    maintain_parser = subcommands.add_parser('maintain', help='create future partitions and drop expired ones')
+    maintain_parser.add_argument('--months-ahead', type=int, default=AQI_PARTITION_MONTHS_AHEAD)
+    maintain_parser.add_argument('--retention-months', type=int, default=AQI_RETENTION_MONTHS,
+                                 help='whole months kept before the current one (0 = keep all)')
+    subcommands.add_parser('explain', help='check the aqi_hourly_data query plans')
+    args = parser.parse_args()
+
+    connection = get_db_connection()
+    if not connection:
+        sys.exit(1)
+
+    try:
+        if args.command == 'status':
+            for migration in migration_status(connection):
+                applied_at = f"  ({migration['applied_at']:%Y-%m-%d %H:%M})" if migration['applied_at'] else ''
+                print(f"{migration['state']:>22}  {migration['name']}{applied_at}")
+
+        elif args.command == 'maintain':
+            result = maintain(connection, args.months_ahead, args.retention_months)
+            print(f"✓ {result['created']} partition(s) created, {len(result['dropped'])} dropped {result['dropped']}")
+
+        elif args.command == 'explain':
+            results = check_query_plans(connection)
+            for result in results:
+                print(f"{'✓' if result['ok'] else '✗'} {result['check']}: {', '.join(result['detail']) or '-'}")
+            if not all(result['ok'] for result in results):
+                sys.exit(1)
+
+        else:
+            applied = migrate(connection)
+            print(f"✓ {len(applied)} migration(s) applied" if applied else "✓ Database is up to date")
+    finally:
+        connection.close()
@@ -0,0 +1,138 @@
+-- ============================================
+-- aqi_hourly_data, range-partitioned by month (PostgreSQL 11+)
+-- ============================================
+-- Forecast reads are (latitude, longitude, hour_timestamp) lookups over a
+-- 25 hour window; history charts and retraining read time ranges. Monthly
+-- partitions keep both pruned to one or two small tables, and retention
+-- becomes DROP TABLE on whole months instead of DELETE.
+
+-- An existing unpartitioned table is moved aside and copied in below
+DO $$
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = to_regclass('aqi_hourly_data')) = 'r' THEN
+        ALTER TABLE aqi_hourly_data RENAME TO aqi_hourly_data_unpartitioned;
+    END IF;
+END $$;
+
+CREATE TABLE IF NOT EXISTS aqi_hourly_data (
+    latitude DOUBLE PRECISION NOT NULL,
+    longitude DOUBLE PRECISION NOT NULL,
+    location_name TEXT,
+    hour_timestamp TIMESTAMP NOT NULL,      -- local hour, naive
+    unix_timestamp BIGINT,
+    pm2_5 DOUBLE PRECISION,
+    pm10 DOUBLE PRECISION,
+    no2 DOUBLE PRECISION,
+    so2 DOUBLE PRECISION,
+    co DOUBLE PRECISION,
+    o3 DOUBLE PRECISION,
+    no DOUBLE PRECISION,
+    nh3 DOUBLE PRECISION,
+    indian_aqi INTEGER,
+    dominant_pollutant TEXT,
+    aqi_category TEXT,
+    sub_index_pm25 INTEGER,
+    sub_index_pm10 INTEGER,
+    sub_index_no2 INTEGER,
+    sub_index_so2 INTEGER,
+    sub_index_co INTEGER,
+    sub_index_o3 INTEGER,
+    data_source TEXT DEFAULT 'api',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    -- Upsert key and the composite btree behind every location + time range read
+    CONSTRAINT aqi_hourly_data_location_hour_key
+        UNIQUE (latitude, longitude, hour_timestamp)
+) PARTITION BY RANGE (hour_timestamp);
+
+-- ============================================
+-- Indexes (created on every partition automatically)
+-- ============================================
+
+-- Time-range scans across all locations (rollups, exports); a few pages per month
+CREATE INDEX IF NOT EXISTS aqi_hourly_data_hour_brin
+    ON aqi_hourly_data USING brin (hour_timestamp) WITH (pages_per_range = 32);
+
+-- ============================================
+-- Partition management
+-- ============================================
+
+-- Create the monthly partitions covering [from_ts, to_ts]; returns how many were new.
+-- Partitions are named aqi_hourly_data_pYYYYMM.
+CREATE OR REPLACE FUNCTION aqi_hourly_data_create_partitions(from_ts TIMESTAMP, to_ts TIMESTAMP)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    month_start DATE := date_trunc('month', from_ts)::date;
+    partition_name TEXT;
+    created INTEGER := 0;
+BEGIN
+    -- Workers and ingest jobs may race to create the same month
+    PERFORM pg_advisory_xact_lock(hashtext('aqi_hourly_data_partitions'));
+
+    WHILE month_start <= to_ts LOOP
+        partition_name := 'aqi_hourly_data_p' || to_char(month_start, 'YYYYMM');
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF aqi_hourly_data FOR VALUES FROM (%L) TO (%L)',
+                partition_name, month_start, (month_start + INTERVAL '1 month')::date
+            );
+            created := created + 1;
+        END IF;
+        month_start := (month_start + INTERVAL '1 month')::date;
+    END LOOP;
+
+    RETURN created;
+END;
+$$;
+
+-- ============================================
+-- Copy rows from the old table
+-- ============================================
+
+DO $$
+DECLARE
+    first_hour TIMESTAMP;
+    last_hour TIMESTAMP;
+BEGIN
+    IF to_regclass('aqi_hourly_data_unpartitioned') IS NULL THEN
+        RETURN;
+    END IF;
+
+    SELECT min(hour_timestamp), max(hour_timestamp)
+    INTO first_hour, last_hour
+    FROM aqi_hourly_data_unpartitioned;
+
+    IF first_hour IS NOT NULL THEN
+        PERFORM aqi_hourly_data_create_partitions(first_hour, last_hour);
+
+        INSERT INTO aqi_hourly_data (
+            latitude, longitude, location_name, hour_timestamp, unix_timestamp,
+            pm2_5, pm10, no2, so2, co, o3, no, nh3,
+            indian_aqi, dominant_pollutant, aqi_category,
+            sub_index_pm25, sub_index_pm10, sub_index_no2,
+            sub_index_so2, sub_index_co, sub_index_o3,
+            data_source
+        )
+        SELECT DISTINCT ON (latitude, longitude, hour_timestamp)
+            latitude, longitude, location_name, hour_timestamp, unix_timestamp,
+            pm2_5, pm10, no2, so2, co, o3, no, nh3,
+            indian_aqi, dominant_pollutant, aqi_category,
+            sub_index_pm25, sub_index_pm10, sub_index_no2,
+            sub_index_so2, sub_index_co, sub_index_o3,
+            data_source
+        FROM aqi_hourly_data_unpartitioned
+        ORDER BY latitude, longitude, hour_timestamp, unix_timestamp DESC NULLS LAST;
+    END IF;
+
+    DROP TABLE aqi_hourly_data_unpartitioned;
+END $$;
+
+-- Last month through three months ahead; the partition maintenance job keeps extending this
+SELECT aqi_hourly_data_create_partitions(
+    (date_trunc('month', LOCALTIMESTAMP) - INTERVAL '1 month')::timestamp,
+    (LOCALTIMESTAMP + INTERVAL '3 months')::timestamp
+);
+
+ANALYZE aqi_hourly_data;
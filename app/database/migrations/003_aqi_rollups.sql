@@ -0,0 +1,116 @@
+-- ============================================
+-- Daily and weekly rollups of aqi_hourly_data
+-- ============================================
+-- Long-range history charts read these instead of raw hours: a year is
+-- 365 daily or 53 weekly rows per location. Buckets are recomputed from
+-- the raw hours whenever hours in them are written (aqi_refresh_rollups),
+-- so re-ingested or corrected hours never double count.
+
+CREATE TABLE IF NOT EXISTS aqi_daily_rollup (
+    latitude DOUBLE PRECISION NOT NULL,
+    longitude DOUBLE PRECISION NOT NULL,
+    bucket_start TIMESTAMP NOT NULL,        -- local midnight
+    hours INTEGER NOT NULL,                 -- stored hours in the bucket
+    aqi_min INTEGER,
+    aqi_max INTEGER,
+    aqi_mean DOUBLE PRECISION,
+    pm2_5_mean DOUBLE PRECISION,
+    pm10_mean DOUBLE PRECISION,
+    no2_mean DOUBLE PRECISION,
+    so2_mean DOUBLE PRECISION,
+    co_mean DOUBLE PRECISION,
+    o3_mean DOUBLE PRECISION,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (latitude, longitude, bucket_start)
+);
+
+CREATE TABLE IF NOT EXISTS aqi_weekly_rollup (
+    LIKE aqi_daily_rollup INCLUDING DEFAULTS,   -- bucket_start is Monday 00:00
+    PRIMARY KEY (latitude, longitude, bucket_start)
+);
+
+-- Recompute every day and week bucket of one location that overlaps [from_ts, to_ts]
+CREATE OR REPLACE FUNCTION aqi_refresh_rollups(lat DOUBLE PRECISION, lon DOUBLE PRECISION,
+                                               from_ts TIMESTAMP, to_ts TIMESTAMP)
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    INSERT INTO aqi_daily_rollup (
+        latitude, longitude, bucket_start, hours, aqi_min, aqi_max, aqi_mean,
+        pm2_5_mean, pm10_mean, no2_mean, so2_mean, co_mean, o3_mean
+    )
+    SELECT latitude, longitude, date_trunc('day', hour_timestamp), count(*),
+           min(indian_aqi), max(indian_aqi), avg(indian_aqi),
+           avg(pm2_5), avg(pm10), avg(no2), avg(so2), avg(co), avg(o3)
+    FROM aqi_hourly_data
+    WHERE latitude = lat AND longitude = lon
+      AND hour_timestamp >= date_trunc('day', from_ts)
+      AND hour_timestamp < date_trunc('day', to_ts) + INTERVAL '1 day'
+    GROUP BY latitude, longitude, date_trunc('day', hour_timestamp)
+    ON CONFLICT (latitude, longitude, bucket_start) DO UPDATE SET
+        hours = EXCLUDED.hours,
+        aqi_min = EXCLUDED.aqi_min,
+        aqi_max = EXCLUDED.aqi_max,
+        aqi_mean = EXCLUDED.aqi_mean,
+        pm2_5_mean = EXCLUDED.pm2_5_mean,
+        pm10_mean = EXCLUDED.pm10_mean,
+        no2_mean = EXCLUDED.no2_mean,
+        so2_mean = EXCLUDED.so2_mean,
+        co_mean = EXCLUDED.co_mean,
+        o3_mean = EXCLUDED.o3_mean,
+        updated_at = CURRENT_TIMESTAMP;
+
+    INSERT INTO aqi_weekly_rollup (
+        latitude, longitude, bucket_start, hours, aqi_min, aqi_max, aqi_mean,
+        pm2_5_mean, pm10_mean, no2_mean, so2_mean, co_mean, o3_mean
+    )
+    SELECT latitude, longitude, date_trunc('week', hour_timestamp), count(*),
+           min(indian_aqi), max(indian_aqi), avg(indian_aqi),
+           avg(pm2_5), avg(pm10), avg(no2), avg(so2), avg(co), avg(o3)
+    FROM aqi_hourly_data
+    WHERE latitude = lat AND longitude = lon
+      AND hour_timestamp >= date_trunc('week', from_ts)
+      AND hour_timestamp < date_trunc('week', to_ts) + INTERVAL '1 week'
+    GROUP BY latitude, longitude, date_trunc('week', hour_timestamp)
+    ON CONFLICT (latitude, longitude, bucket_start) DO UPDATE SET
+        hours = EXCLUDED.hours,
+        aqi_min = EXCLUDED.aqi_min,
+        aqi_max = EXCLUDED.aqi_max,
+        aqi_mean = EXCLUDED.aqi_mean,
+        pm2_5_mean = EXCLUDED.pm2_5_mean,
+        pm10_mean = EXCLUDED.pm10_mean,
+        no2_mean = EXCLUDED.no2_mean,
+        so2_mean = EXCLUDED.so2_mean,
+        co_mean = EXCLUDED.co_mean,
+        o3_mean = EXCLUDED.o3_mean,
+        updated_at = CURRENT_TIMESTAMP;
+$$;
+
+-- ============================================
+-- Backfill from the hours already stored
+-- ============================================
+
+INSERT INTO aqi_daily_rollup (
+    latitude, longitude, bucket_start, hours, aqi_min, aqi_max, aqi_mean,
+    pm2_5_mean, pm10_mean, no2_mean, so2_mean, co_mean, o3_mean
+)
+SELECT latitude, longitude, date_trunc('day', hour_timestamp), count(*),
+       min(indian_aqi), max(indian_aqi), avg(indian_aqi),
+       avg(pm2_5), avg(pm10), avg(no2), avg(so2), avg(co), avg(o3)
+FROM aqi_hourly_data
+GROUP BY latitude, longitude, date_trunc('day', hour_timestamp)
+ON CONFLICT (latitude, longitude, bucket_start) DO NOTHING;
+
+INSERT INTO aqi_weekly_rollup (
+    latitude, longitude, bucket_start, hours, aqi_min, aqi_max, aqi_mean,
+    pm2_5_mean, pm10_mean, no2_mean, so2_mean, co_mean, o3_mean
+)
+SELECT latitude, longitude, date_trunc('week', hour_timestamp), count(*),
+       min(indian_aqi), max(indian_aqi), avg(indian_aqi),
+       avg(pm2_5), avg(pm10), avg(no2), avg(so2), avg(co), avg(o3)
+FROM aqi_hourly_data
+GROUP BY latitude, longitude, date_trunc('week', hour_timestamp)
+ON CONFLICT (latitude, longitude, bucket_start) DO NOTHING;
+
+ANALYZE aqi_daily_rollup;
+ANALYZE aqi_weekly_rollup;
@@ -0,0 +1,25 @@
+-- ============================================
+-- Read path index for tracking_alerts
+-- ============================================
+-- get_alerts_from_db reads a user's unexpired alerts, newest first:
+--   WHERE user_email = ? AND expiry_time >= NOW() ORDER BY alert_timestamp DESC LIMIT 50
+-- This index finds the unexpired rows without touching expired ones; the
+-- payload (message, recommendations, pollutants) is fetched from the heap.
+-- It is deliberately not a covering index: btree entries are capped at
+-- about 2.7 KB, and a long Gemini recommendation list would make the
+-- alert INSERT fail. Expired rows are deleted in batches by the background
+-- sweeper (app/alert_sweeper.py), which uses idx_expiry_time.
+
+CREATE INDEX IF NOT EXISTS idx_tracking_alerts_user_active
+    ON tracking_alerts (user_email, expiry_time)
+    INCLUDE (alert_timestamp);
+
+-- Covered by the primary key and the index above
+DROP INDEX IF EXISTS idx_user_email;
+
+-- The sweeper's steady deletes should trigger vacuum early so dead alert
+-- rows do not bloat the table and its indexes
+ALTER TABLE tracking_alerts SET (
+    autovacuum_vacuum_scale_factor = 0.02,
+    autovacuum_vacuum_threshold = 200
+);
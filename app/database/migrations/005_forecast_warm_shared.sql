@@ -0,0 +1,40 @@
+-- ============================================
+-- Shared state for the hourly forecast warmer
+-- ============================================
+-- Every gunicorn worker has its own in-process forecast cache. These tables
+-- let one worker warm the hour for all of them (app/forecast_warmer.py):
+--   forecast_demand       request counts per cache cell, flushed by every worker
+--   forecast_warm_rounds  one row per hour; the worker that inserts it warms
+--   forecast_snapshots    computed forecasts per cell, hour and model version,
+--                         read by any worker whose own cache misses
+-- Snapshots are a cache that can be recomputed, so the table is UNLOGGED:
+-- no WAL on write, emptied after a crash.
+
+CREATE TABLE IF NOT EXISTS forecast_demand (
+    cell_lat INTEGER NOT NULL,              -- ForecastCache.make_key grid cell
+    cell_lon INTEGER NOT NULL,
+    latitude DOUBLE PRECISION NOT NULL,     -- a requested point inside the cell
+    longitude DOUBLE PRECISION NOT NULL,
+    requests BIGINT NOT NULL DEFAULT 0,
+    last_requested TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (cell_lat, cell_lon)
+);
+
+CREATE INDEX IF NOT EXISTS idx_forecast_demand_requests
+    ON forecast_demand (requests DESC);
+
+CREATE TABLE IF NOT EXISTS forecast_warm_rounds (
+    hour_bucket TIMESTAMP PRIMARY KEY,
+    worker TEXT NOT NULL,
+    claimed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE UNLOGGED TABLE IF NOT EXISTS forecast_snapshots (
+    cell_lat INTEGER NOT NULL,
+    cell_lon INTEGER NOT NULL,
+    hour_bucket TIMESTAMP NOT NULL,
+    model_version TEXT NOT NULL,
+    forecast JSONB NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (cell_lat, cell_lon, hour_bucket, model_version)
+);
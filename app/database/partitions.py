@@ -0,0 +1,230 @@
+"""
+aqi_hourly_data Partition Maintenance
+=====================================
+aqi_hourly_data is range-partitioned by month (migration 002). This module
+keeps partitions created ahead of the clock and, when a retention period is
+set, drops whole months that fell out of it - a catalog operation instead of
+a DELETE over millions of rows.
+
+Expired partitions are detached with DETACH PARTITION ... CONCURRENTLY
+(PostgreSQL 14+) and only then dropped. A plain DROP TABLE of a partition
+takes ACCESS EXCLUSIVE on aqi_hourly_data itself, queues behind in-flight
+reads and blocks every query behind it while it waits. CONCURRENTLY cannot
+run inside a transaction block, so maintenance runs on its own autocommit
+connection.
+
+A background thread runs the maintenance once per interval in every worker;
+a session-level Postgres advisory lock lets only one of them do the work per
+round.
+
+Configuration (environment):
+    PARTITION_MAINTENANCE_ENABLED        start the thread from create_app (default true)
+    PARTITION_MAINTENANCE_HOURS          hours between runs (default 6)
+    AQI_PARTITION_MONTHS_AHEAD           future months kept created (default 3)
+    AQI_RETENTION_MONTHS                 whole months of history kept before the
+                                         current one; 0 keeps everything (default 0)
+"""
+
+import logging
+import os
+import re
+import threading
+from datetime import date
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+PARTITION_MAINTENANCE_ENABLED = os.getenv('PARTITION_MAINTENANCE_ENABLED', 'true').lower() == 'true'
+PARTITION_MAINTENANCE_HOURS = float(os.getenv('PARTITION_MAINTENANCE_HOURS', 6))
+AQI_PARTITION_MONTHS_AHEAD = int(os.getenv('AQI_PARTITION_MONTHS_AHEAD', 3))
+AQI_RETENTION_MONTHS = int(os.getenv('AQI_RETENTION_MONTHS', 0))
+
+PARENT_TABLE = 'aqi_hourly_data'
+PARTITION_NAME = re.compile(r'^aqi_hourly_data_p(\d{4})(\d{2})$')
+MAINTENANCE_LOCK = 'aqi_hourly_data_maintenance'
+
+
+# ============================================================================
+# PARTITION OPERATIONS
+# ============================================================================
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _partition_month(name: str) -> Optional[date]:
+    match = PARTITION_NAME.match(name)
+    return date(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+
+def list_partitions(cursor) -> List[Dict]:
+    """
+    Monthly partitions of aqi_hourly_data, oldest first. `detach_pending` is
+    set on a partition whose DETACH ... CONCURRENTLY was interrupted.
+    """
+    cursor.execute("""
+        SELECT c.relname, i.inhdetachpending
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s)
+    """, (PARENT_TABLE,))
+
+    partitions = []
+    for name, detach_pending in cursor.fetchall():
+        month = _partition_month(name)
+        if month:
+            partitions.append({'name': name, 'month': month, 'detach_pending': detach_pending})
+    return sorted(partitions, key=lambda p: p['month'])
+
+
+def list_detached_partitions(cursor) -> List[Dict]:
+    """Tables named like a monthly partition that are no longer attached to aqi_hourly_data"""
+    cursor.execute("""
+        SELECT c.relname
+        FROM pg_class c
+        WHERE c.relkind = 'r'
+          AND c.relnamespace = to_regnamespace(current_schema())
+          AND c.relname LIKE %s
+          AND NOT EXISTS (SELECT 1 FROM pg_inherits i WHERE i.inhrelid = c.oid)
+    """, (PARENT_TABLE + '_p%',))
+
+    detached = []
+    for (name,) in cursor.fetchall():
+        month = _partition_month(name)
+        if month:
+            detached.append({'name': name, 'month': month})
+    return sorted(detached, key=lambda p: p['month'])
+
+
+def ensure_partitions(cursor, first_hour, last_hour) -> int:
+    """Create the partitions covering [first_hour, last_hour]; returns how many were new"""
+    cursor.execute("SELECT aqi_hourly_data_create_partitions(%s, %s)", (first_hour, last_hour))
+    return cursor.fetchone()[0]
+
+
+def drop_expired_partitions(cursor, retention_months: int, today: Optional[date] = None) -> List[str]:
+    """
+    Detach and drop partitions for months that end before the retention
+    window, which starts `retention_months` months before the current month.
+
+    `cursor` must belong to an autocommit connection: DETACH ... CONCURRENTLY
+    only takes SHARE UPDATE EXCLUSIVE on aqi_hourly_data, so reads and
+    inserts keep running, but it cannot run inside a transaction block. The
+    DROP TABLE afterwards only locks the detached table. A detach cut short
+    by a crash is completed with FINALIZE, and a table left detached but not
+    dropped is picked up on the next run.
+    """
+    if retention_months <= 0:
+        return []
+
+    cutoff = add_months((today or date.today()).replace(day=1), -retention_months)
+    dropped = []
+    for partition in list_partitions(cursor):
+        if partition['month'] >= cutoff:
+            continue
+        mode = 'FINALIZE' if partition['detach_pending'] else 'CONCURRENTLY'
+        cursor.execute(f'ALTER TABLE {PARENT_TABLE} DETACH PARTITION "{partition["name"]}" {mode}')
+        cursor.execute(f'DROP TABLE IF EXISTS "{partition["name"]}"')
+        dropped.append(partition['name'])
+
+    for table in list_detached_partitions(cursor):
+        if table['month'] < cutoff:
+            cursor.execute(f'DROP TABLE IF EXISTS "{table["name"]}"')
+            dropped.append(table['name'])
+    return dropped
+
+
+def maintain(connection, months_ahead: int = AQI_PARTITION_MONTHS_AHEAD,
+             retention_months: int = AQI_RETENTION_MONTHS) -> Dict:
+    """
+    Create partitions through `months_ahead` and drop expired ones. Switches
+    `connection` to autocommit, so every statement commits on its own.
+    """
+    connection.autocommit = True
+    cursor = connection.cursor()
+    try:
+        current_month = date.today().replace(day=1)
+        created = ensure_partitions(cursor, current_month, add_months(current_month, months_ahead))
+        dropped = drop_expired_partitions(cursor, retention_months)
+    finally:
+        cursor.close()
+    return {'created': created, 'dropped': dropped}
+
+
+# ============================================================================
+# BACKGROUND MAINTENANCE
+# ============================================================================
+
+class PartitionMaintainer:
+    """Background thread running maintain() every `interval_hours` in one worker at a time"""
+
+    def __init__(self, interval_hours: float = PARTITION_MAINTENANCE_HOURS,
+                 months_ahead: int = AQI_PARTITION_MONTHS_AHEAD,
+                 retention_months: int = AQI_RETENTION_MONTHS):
+        self.interval_hours = interval_hours
+        self.months_ahead = months_ahead
+        self.retention_months = retention_months
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_run = None
+
+    def run_once(self) -> Optional[Dict]:
+        """
+        One maintenance round on a dedicated (unpooled) autocommit connection;
+        None if another worker holds the lock. The lock is session-level, so
+        it spans every statement of the round and goes away with the connection.
+        """
+        from app.db import open_connection
+
+        conn = open_connection()
+        try:
+            conn.autocommit = True
+            cursor = conn.cursor()
+            cursor.execute("SELECT pg_try_advisory_lock(hashtext(%s))", (MAINTENANCE_LOCK,))
+            locked = bool(cursor.fetchone()[0])
+            cursor.close()
+            if not locked:
+                return None
+            result = maintain(conn, self.months_ahead, self.retention_months)
+        finally:
+            conn.close()
+
+        self.last_run = result
+        if result['created'] or result['dropped']:
+            logger.info(f"🗂️ aqi_hourly_data partitions: {result['created']} created, "
+                        f"{len(result['dropped'])} dropped {result['dropped']}")
+        return result
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"❌ Partition maintenance failed: {e}")
+            self._stop.wait(self.interval_hours * 3600)
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='partition-maintainer', daemon=True)
+        self._thread.start()
+        logger.info(f"🗂️ Partition maintainer started (every {self.interval_hours}h)")
+
+    def stop(self):
+        self._stop.set()
+
+
+partition_maintainer = PartitionMaintainer()
+
+
+def start_partition_maintainer():
+    """Start the shared maintainer thread if enabled (safe to call more than once)"""
+    if PARTITION_MAINTENANCE_ENABLED:
+        partition_maintainer.start()
+    return partition_maintainer
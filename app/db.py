@@ -1,61 +1,109 @@
 import os
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
 import psycopg2
+from psycopg2 import extensions
 from psycopg2.extras import RealDictCursor
 from dotenv import load_dotenv
+from flask import g, has_app_context
 
 load_dotenv()
 
-def get_db_connection():
-    """Get PostgreSQL connection using DATABASE_URL or individual parameters"""
-    try:
-        # Try using DATABASE_URL first (preferred for Render compatibility)
-        database_url = os.getenv("DATABASE_URL")
-        if database_url:
-            # Extract connection parameters from DATABASE_URL
+# ============================================================================
+# POOL CONFIGURATION
+# ============================================================================
+
+# Idle connections kept open per process (opened by warm_pool, never trimmed below this)
+DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', 1))
+
+# Hard cap on open connections per process; further checkouts wait
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', 10))
+
+# How long a checkout waits for a free connection before giving up
+DB_POOL_TIMEOUT_SECONDS = float(os.getenv('DB_POOL_TIMEOUT_SECONDS', 10))
+
+# Connections older than this are closed instead of reused (Render drops long-lived sessions)
+DB_POOL_MAX_LIFETIME_SECONDS = float(os.getenv('DB_POOL_MAX_LIFETIME_SECONDS', 1800))
+
+# Idle connections above DB_POOL_MIN_SIZE are closed after this long
+DB_POOL_MAX_IDLE_SECONDS = float(os.getenv('DB_POOL_MAX_IDLE_SECONDS', 300))
+
+# Connections idle longer than this are pinged with SELECT 1 on checkout (0 = always)
+DB_POOL_CHECK_IDLE_SECONDS = float(os.getenv('DB_POOL_CHECK_IDLE_SECONDS', 30))
+
+DB_CONNECT_TIMEOUT_SECONDS = int(os.getenv('DB_CONNECT_TIMEOUT_SECONDS', 10))
+
+
+class DatabaseUnavailable(Exception):
+    """No connection could be opened or checked out of the pool in time"""
+
+
+def _sslmode(host):
+    # sslmode is required for external connections to Render Postgres
+    # External hostnames for Render often contain "render.com" or the "dpg-" prefix
+    return 'require' if host and ('render.com' in host or 'dpg-' in host) else 'prefer'
+
+
+def _connection_params():
+    """psycopg2.connect keyword arguments from DATABASE_URL or individual parameters"""
+    params = {
+        'connect_timeout': DB_CONNECT_TIMEOUT_SECONDS,
+        # Detect peers that vanished while a connection sat idle in the pool
+        'keepalives': 1,
+        'keepalives_idle': 60
+    }
+
+    # Try using DATABASE_URL first (preferred for Render compatibility)
+    database_url = os.getenv("DATABASE_URL")
+    if database_url:
+        try:
             from urllib.parse import urlparse
             parsed = urlparse(database_url)
-            conn = psycopg2.connect(
+            params.update(
                 host     = parsed.hostname,
                 port     = parsed.port or 5432,
                 user     = parsed.username,
                 password = parsed.password,
                 database = parsed.path.lstrip('/'),
-                # sslmode is required for external connections to Render Postgres
-                sslmode  = 'require' if 'render.com' in (parsed.hostname or '') or 'dpg-' in (parsed.hostname or '') else 'prefer'
+                sslmode  = _sslmode(parsed.hostname)
             )
-            print('Database connected successfully - Database Url')
-            return conn
-    except Exception as e:
-        print(f"⚠️  DATABASE_URL parsing failed: {e}. Falling back to individual parameters.")
-    
+            return params
+        except Exception as e:
+            print(f"⚠️  DATABASE_URL parsing failed: {e}. Falling back to individual parameters.")
+
     # Fallback to individual parameters
+    host = os.getenv("POSTGRES_HOST")
+    params.update(
+        host     = host,
+        port     = int(os.getenv("POSTGRES_PORT", 5432)),
+        user     = os.getenv("POSTGRES_USER"),
+        password = os.getenv("POSTGRES_PASSWORD"),
+        database = os.getenv("POSTGRES_DB"),
+        sslmode  = _sslmode(host)
+    )
+    return params
+
+
+def open_connection():
+    """Open a new, unpooled PostgreSQL connection (raises on failure)"""
+    return psycopg2.connect(**_connection_params())
+
+
+def get_db_connection():
+    """
+    Unpooled connection for one-off scripts (ingest, retraining); returns None
+    on failure. Request handlers use connection() instead.
+    """
     try:
-        host = os.getenv("POSTGRES_HOST")
-        database = os.getenv("POSTGRES_DB") # The user used POSTGRES_DATABASE in their example, but they have POSTGRES_DB in .env
-        user = os.getenv("POSTGRES_USER")
-        password = os.getenv("POSTGRES_PASSWORD")
-        port = int(os.getenv("POSTGRES_PORT", 5432))
-        
-        # Determine sslmode
-        # External hostnames for Render often contain "render.com" or the "dpg-" prefix
-        sslmode = 'require' if host and ('render.com' in host or 'dpg-' in host) else 'prefer'
-        
-        conn = psycopg2.connect(
-            host     = host,
-            port     = port,
-            user     = user,
-            password = password,
-            database = database,
-            sslmode  = sslmode
-        )
-        print('Database connected successfully - Individual Parameters')
+        conn = open_connection()
+        print('Database connected successfully')
         return conn
     except Exception as e:
         print(f"❌ Database connection failed: {e}")
-        return None # Return None and let the caller handle it or raise inside.
-        # But wait, common practice in this app seems to be returning None and then erroring.
-        # I'll return None for consistency with previous version, but the user is seeing 
-        # 'NoneType' object has no attribute 'cursor' elsewhere so we should probably handle that too.
+        return None
+
 
 def get_db_cursor(conn, dict_cursor=False):
     """
@@ -64,7 +112,416 @@ def get_db_cursor(conn, dict_cursor=False):
     """
     if not conn:
         return None
-    
+
     if dict_cursor:
         return conn.cursor(cursor_factory=RealDictCursor)
     return conn.cursor()
+
+
+# ============================================================================
+# CONNECTION POOL
+# ============================================================================
+
+class ConnectionPool:
+    """
+    Thread-safe pool of psycopg2 connections.
+
+    Checkout prefers the most recently returned connection (its TLS session is
+    the warmest), pings connections that sat idle for a while, and replaces
+    connections past their maximum lifetime. Waiting checkouts block on a
+    condition until a connection is returned or a slot frees up.
+    """
+
+    def __init__(self, connect=open_connection,
+                 min_size: int = DB_POOL_MIN_SIZE,
+                 max_size: int = DB_POOL_MAX_SIZE,
+                 timeout: float = DB_POOL_TIMEOUT_SECONDS,
+                 max_lifetime: float = DB_POOL_MAX_LIFETIME_SECONDS,
+                 max_idle: float = DB_POOL_MAX_IDLE_SECONDS,
+                 check_idle: float = DB_POOL_CHECK_IDLE_SECONDS):
+        self.connect = connect
+        self.max_size = max(1, max_size)
+        self.min_size = min(max(0, min_size), self.max_size)
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.check_idle = check_idle
+        self.pid = os.getpid()
+
+        self._cond = threading.Condition()
+        self._idle = deque()        # (conn, created_at, returned_at), newest on the right
+        self._in_use = {}           # id(conn) -> created_at
+        self._opening = 0           # slots reserved for connections being opened
+        self._closed = False
+        self._stats = dict.fromkeys([
+            'checkouts', 'opened', 'closed_expired', 'closed_broken', 'closed_idle',
+            'health_checks', 'health_check_failures', 'waits', 'timeouts', 'connect_errors'
+        ], 0)
+        self._wait_seconds_total = 0.0
+        self._wait_seconds_max = 0.0
+
+    def _size(self):
+        return len(self._idle) + len(self._in_use) + self._opening
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _healthy(self, conn, created_at, returned_at, now):
+        """Reuse check on checkout; returns the stats key to bump if conn must be dropped"""
+        if conn.closed:
+            return 'closed_broken'
+        if now - created_at > self.max_lifetime:
+            return 'closed_expired'
+        if now - returned_at >= self.check_idle:
+            self._stats['health_checks'] += 1
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+                conn.rollback()
+            except Exception:
+                self._stats['health_check_failures'] += 1
+                return 'closed_broken'
+        return None
+
+    def getconn(self):
+        """Check out a connection, opening one if the pool has room"""
+        deadline = time.monotonic() + self.timeout
+        wait_started = None
+
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise DatabaseUnavailable('connection pool is closed')
+                    if self._idle:
+                        conn, created_at, returned_at = self._idle.pop()
+                        self._opening += 1      # hold the slot while it is checked
+                        break
+                    if self._size() < self.max_size:
+                        conn = None
+                        self._opening += 1
+                        break
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise DatabaseUnavailable(
+                            f'no database connection free within {self.timeout:g}s '
+                            f'({self.max_size} in use)'
+                        )
+                    if wait_started is None:
+                        wait_started = time.monotonic()
+                        self._stats['waits'] += 1
+                    self._cond.wait(remaining)
+
+            if conn is not None:
+                drop = self._healthy(conn, created_at, returned_at, time.monotonic())
+                if drop:
+                    self._close_quietly(conn)
+                    with self._cond:
+                        self._opening -= 1
+                        self._stats[drop] += 1
+                        self._cond.notify()
+                    continue
+            else:
+                try:
+                    conn = self.connect()
+                except Exception as e:
+                    with self._cond:
+                        self._opening -= 1
+                        self._stats['connect_errors'] += 1
+                        self._cond.notify()
+                    raise DatabaseUnavailable(f'could not open database connection: {e}') from e
+                created_at = time.monotonic()
+                with self._cond:
+                    self._stats['opened'] += 1
+
+            with self._cond:
+                self._opening -= 1
+                self._in_use[id(conn)] = created_at
+                self._stats['checkouts'] += 1
+                if wait_started is not None:
+                    waited = time.monotonic() - wait_started
+                    self._wait_seconds_total += waited
+                    self._wait_seconds_max = max(self._wait_seconds_max, waited)
+            return conn
+
+    def putconn(self, conn, discard: bool = False):
+        """Return a checked-out connection; broken or expired connections are closed"""
+        now = time.monotonic()
+        with self._cond:
+            created_at = self._in_use.pop(id(conn), None)
+        if created_at is None:
+            # Not ours (e.g. checked out before a fork); just close it
+            self._close_quietly(conn)
+            return
+
+        reason = 'closed_broken' if discard or conn.closed else None
+        if reason is None and conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except Exception:
+                reason = 'closed_broken'
+        if reason is None and now - created_at > self.max_lifetime:
+            reason = 'closed_expired'
+
+        if reason is not None:
+            self._close_quietly(conn)
+
+        trimmed = []
+        with self._cond:
+            if reason is not None:
+                self._stats[reason] += 1
+            elif self._closed:
+                trimmed.append(conn)
+            else:
+                self._idle.append((conn, created_at, now))
+                # Close connections that idled past max_idle, oldest first, down to min_size
+                while len(self._idle) > self.min_size and now - self._idle[0][2] > self.max_idle:
+                    trimmed.append(self._idle.popleft()[0])
+                    self._stats['closed_idle'] += 1
+            self._cond.notify()
+
+        for stale in trimmed:
+            self._close_quietly(stale)
+
+    def warm(self):
+        """Open connections until min_size are idle (best effort)"""
+        opened = []
+        try:
+            with self._cond:
+                wanted = min(self.min_size - len(self._idle), self.max_size - self._size())
+            for _ in range(max(0, wanted)):
+                opened.append(self.getconn())
+        finally:
+            for conn in opened:
+                self.putconn(conn)
+        return len(opened)
+
+    def close(self):
+        """Close idle connections and refuse further checkouts"""
+        with self._cond:
+            self._closed = True
+            idle = [entry[0] for entry in self._idle]
+            self._idle.clear()
+            self._cond.notify_all()
+        for conn in idle:
+            self._close_quietly(conn)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update(
+                pid=self.pid,
+                size=self._size(),
+                idle=len(self._idle),
+                in_use=len(self._in_use),
+                min_size=self.min_size,
+                max_size=self.max_size,
+                wait_seconds_total=round(self._wait_seconds_total, 4),
+                wait_seconds_max=round(self._wait_seconds_max, 4)
+            )
+        return stats
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# Pools inherited across a fork; kept referenced so their sockets (shared
+# with the parent) are never closed from the child
+_inherited_pools = []
+
+
+def get_pool() -> ConnectionPool:
+    """The process-wide pool, created on first use (and again after a fork)"""
+    global _pool
+    pid = os.getpid()
+    if _pool is not None and _pool.pid == pid:
+        return _pool
+    with _pool_lock:
+        if _pool is None or _pool.pid != pid:
+            if _pool is not None:
+                _inherited_pools.append(_pool)
+            _pool = ConnectionPool()
+        return _pool
+
+
+def warm_pool():
+    """Pre-open DB_POOL_MIN_SIZE connections (called per worker after fork)"""
+    try:
+        opened = get_pool().warm()
+        print(f"✓ Database pool warmed ({opened} connection(s))")
+    except DatabaseUnavailable as e:
+        print(f"⚠️ Warning: Could not warm database pool: {e}")
+
+
+def pool_stats():
+    return get_pool().stats()
+
+
+def try_advisory_lock(cursor, name: str) -> bool:
+    """
+    Take a transaction-scoped Postgres advisory lock named `name` without
+    waiting; True if this session now holds it (released at commit/rollback).
+    Lets one worker of many run a periodic job.
+    """
+    cursor.execute("SELECT pg_try_advisory_xact_lock(hashtext(%s))", (name,))
+    return bool(cursor.fetchone()[0])
+
+
+# ============================================================================
+# REQUEST-SCOPED CONNECTION
+# ============================================================================
+
+def _request_connection():
+    """The connection of the current app context, checked out on first use"""
+    conn = g.get('_db_conn')
+    if conn is not None and conn.closed:
+        # Lost mid-request (server restart, network); later blocks get a fresh one
+        get_pool().putconn(g.pop('_db_conn'), discard=True)
+        conn = None
+    if conn is None:
+        conn = get_pool().getconn()
+        g._db_conn = conn
+        g._db_connections = g.get('_db_connections', 0) + 1
+    g._db_uses = g.get('_db_uses', 0) + 1
+    return conn
+
+
+def request_db_stats():
+    """Pool checkouts and connection() blocks of the current request so far"""
+    if not has_app_context():
+        return {'connections': 0, 'uses': 0}
+    return {'connections': g.get('_db_connections', 0), 'uses': g.get('_db_uses', 0)}
+
+
+def _commit_request_connection(response):
+    """
+    Commit anything still open before the response goes out (connection()
+    blocks commit as they exit), so a failed commit is a 500, not a lost write
+    """
+    conn = g.get('_db_conn')
+    if conn is not None and not conn.closed:
+        if response.status_code >= 500:
+            conn.rollback()
+        else:
+            conn.commit()
+    response.headers['X-DB-Connections'] = str(g.get('_db_connections', 0))
+    return response
+
+
+def _release_request_connection(exc):
+    """teardown_appcontext: roll back anything left uncommitted and return the connection"""
+    conn = g.pop('_db_conn', None)
+    if conn is None:
+        return
+    discard = False
+    try:
+        if not conn.closed:
+            if exc is None:
+                conn.commit()
+            else:
+                conn.rollback()
+    except Exception as e:
+        print(f"❌ Request transaction could not be closed: {e}")
+        discard = True
+    get_pool().putconn(conn, discard=discard)
+
+
+def init_app(app):
+    """Share one pooled connection per request (see connection())"""
+    app.after_request(_commit_request_connection)
+    app.teardown_appcontext(_release_request_connection)
+
+
+def _end_block(conn, savepoint, ok):
+    """
+    Finish a request connection() block: commit it (outermost) or release its
+    savepoint (nested); roll back just its statements if it failed. A block
+    whose statement failed but whose caller swallowed the error is rolled
+    back too, instead of poisoning the rest of the request.
+    """
+    if conn.closed:
+        return
+    if ok and conn.get_transaction_status() == extensions.TRANSACTION_STATUS_INERROR:
+        print("⚠️ A statement failed inside a connection() block; rolling the block back")
+        ok = False
+
+    if savepoint is None:
+        if ok:
+            conn.commit()
+        else:
+            conn.rollback()
+        return
+    with conn.cursor() as cursor:
+        if not ok:
+            cursor.execute(f'ROLLBACK TO SAVEPOINT {savepoint}')
+        cursor.execute(f'RELEASE SAVEPOINT {savepoint}')
+
+
+@contextmanager
+def connection():
+    """
+    Pooled connection for one unit of work:
+
+        with connection() as conn:
+            cursor = conn.cursor()
+            ...
+
+    Inside a Flask app context every block shares the context's connection
+    (see init_app): it is checked out on first use and returned to the pool
+    at teardown. The outermost block commits when it exits cleanly, so the
+    session is not left idle in transaction (holding row locks) while the
+    request goes on to call Gemini or OpenWeather. A nested block runs under
+    a SAVEPOINT. A block that raises, or whose failed statement was caught
+    inside it, rolls back its own statements only; the request's other
+    writes are kept.
+
+    Outside an app context (CLI, background threads) each block checks out
+    its own connection, commits when the block exits cleanly, rolls back if
+    it raises, then returns the connection to the pool.
+
+    Raises DatabaseUnavailable when no connection can be had.
+    """
+    if has_app_context():
+        conn = _request_connection()
+        depth = g.get('_db_depth', 0)
+        savepoint = f'connection_block_{depth}' if depth else None
+        if savepoint:
+            with conn.cursor() as cursor:
+                cursor.execute(f'SAVEPOINT {savepoint}')
+        g._db_depth = depth + 1
+        try:
+            yield conn
+        except BaseException:
+            try:
+                _end_block(conn, savepoint, ok=False)
+            except Exception:
+                pass
+            raise
+        else:
+            _end_block(conn, savepoint, ok=True)
+        finally:
+            g._db_depth = depth
+        return
+
+    pool = get_pool()
+    conn = pool.getconn()
+    discard = False
+    try:
+        yield conn
+        if not conn.closed:
+            conn.commit()
+    except BaseException:
+        try:
+            if not conn.closed:
+                conn.rollback()
+        except Exception:
+            discard = True
+        raise
+    finally:
+        pool.putconn(conn, discard=discard)
@@ -0,0 +1,301 @@
+"""
+Incremental Feature Engine
+==========================
+Per-location rolling state backed by fixed-size NumPy ring buffers.
+
+Each new hourly row is pushed in O(1). The 128-feature vector listed in
+models/feature_names.txt is read straight from the buffers, with the same
+definitions as calculate_features_from_24h_data: lags, rolling mean/std,
+1h/3h changes and calendar features. No pandas is used.
+
+The buffer holds 25 rows per series. lag_24h needs the value 24 rows
+before the current one, and the 24h rolling window needs 24 rows. Serving
+reads the same 25 hours (HISTORY_HOURS in aqi_prediction_service), so on
+the hourly slide a location's state only pushes the new row.
+
+Parity check against the pandas implementation (from the repository root):
+    python -m app.feature_engine historical_data.json
+"""
+
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Optional, Sequence
+
+import numpy as np
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+POLLUTANTS = ['pm2_5', 'pm10', 'no2', 'so2', 'co', 'o3']
+SERIES = POLLUTANTS + ['aqi']   # 7 series; 'aqi' is indian_aqi
+LAG_HOURS = [1, 2, 3, 6, 12, 24]
+ROLLING_WINDOWS = [3, 6, 12, 24]
+CHANGE_HOURS = [1, 3]
+TEMPORAL_FEATURES = ['hour', 'day_of_week', 'day_of_month', 'month', 'is_weekend',
+                     'hour_sin', 'hour_cos', 'dow_sin', 'dow_cos']
+
+BUFFER_HOURS = max(LAG_HOURS + ROLLING_WINDOWS) + 1
+MAX_FEATURE_STATES = int(os.getenv('MAX_FEATURE_STATES', 1024))
+
+PARITY_RTOL = 1e-7
+PARITY_ATOL = 1e-6
+
+
+def _feature_layout() -> dict:
+    """Position of every known feature name in the raw feature vector"""
+    layout = {}
+    position = 0
+
+    def add(name):
+        nonlocal position
+        layout[name] = position
+        position += 1
+
+    for series in SERIES:
+        add('indian_aqi' if series == 'aqi' else f'components.{series}')
+    for lag in LAG_HOURS:
+        for series in SERIES:
+            add(f'{series}_lag_{lag}h')
+    for window in ROLLING_WINDOWS:
+        for series in SERIES:
+            add(f'{series}_rolling_mean_{window}h')
+    for window in ROLLING_WINDOWS:
+        for series in SERIES:
+            add(f'{series}_rolling_std_{window}h')
+    for hours in CHANGE_HOURS:
+        for series in SERIES:
+            add(f'{series}_change_{hours}h')
+    for name in TEMPORAL_FEATURES:
+        add(name)
+
+    return layout
+
+
+FEATURE_LAYOUT = _feature_layout()
+
+
+# ============================================================================
+# ROLLING STATE
+# ============================================================================
+
+class RollingFeatureState:
+    """Ring buffers of the last BUFFER_HOURS rows for the 7 series of one location"""
+
+    def __init__(self, feature_names: Sequence[str]):
+        unknown = [name for name in feature_names if name not in FEATURE_LAYOUT]
+        if unknown:
+            raise ValueError(f"Unsupported feature names: {unknown[:5]}")
+
+        self.feature_names = list(feature_names)
+        self._gather = np.array([FEATURE_LAYOUT[name] for name in feature_names], dtype=np.intp)
+        self._raw = np.empty(len(FEATURE_LAYOUT))
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.buffer = np.full((BUFFER_HOURS, len(SERIES)), np.nan)
+        self.head = 0               # slot the next row is written to
+        self.count = 0              # rows pushed since reset
+        self.last_timestamp = None
+        self.timestamps = deque(maxlen=BUFFER_HOURS)   # timestamps of the rows in the buffer
+
+    def push(self, timestamp: datetime, values: Sequence[float]):
+        """Append one hourly row: 6 pollutant values followed by indian_aqi"""
+        self.buffer[self.head] = values
+        self.head = (self.head + 1) % BUFFER_HOURS
+        self.count += 1
+        self.last_timestamp = timestamp
+        self.timestamps.append(timestamp)
+
+    def _back(self, rows_back: int) -> np.ndarray:
+        """Values `rows_back` rows before the latest row (NaN if not seen yet)"""
+        if rows_back >= self.count:
+            return np.full(len(SERIES), np.nan)
+        return self.buffer[(self.head - 1 - rows_back) % BUFFER_HOURS]
+
+    def _window(self, size: int) -> Optional[np.ndarray]:
+        """The latest `size` rows in chronological order, or None if fewer were seen"""
+        if size > self.count:
+            return None
+        return self.buffer[(self.head - size + np.arange(size)) % BUFFER_HOURS]
+
+    def features(self) -> np.ndarray:
+        """Feature vector for the latest row, ordered like feature_names"""
+        if self.count == 0:
+            raise ValueError("No rows pushed yet")
+
+        raw = self._raw
+        n = len(SERIES)
+        current = self._back(0)
+        raw[0:n] = current
+        offset = n
+
+        for lag in LAG_HOURS:
+            raw[offset:offset + n] = self._back(lag)
+            offset += n
+
+        windows = {size: self._window(size) for size in ROLLING_WINDOWS}
+        for size in ROLLING_WINDOWS:
+            window = windows[size]
+            raw[offset:offset + n] = np.nan if window is None else window.mean(axis=0)
+            offset += n
+        for size in ROLLING_WINDOWS:
+            window = windows[size]
+            raw[offset:offset + n] = np.nan if window is None else window.std(axis=0, ddof=1)
+            offset += n
+
+        for hours in CHANGE_HOURS:
+            raw[offset:offset + n] = current - self._back(hours)
+            offset += n
+
+        ts = self.last_timestamp
+        hour = ts.hour
+        day_of_week = ts.weekday()
+        raw[offset:offset + len(TEMPORAL_FEATURES)] = [
+            hour,
+            day_of_week,
+            ts.day,
+            ts.month,
+            int(day_of_week >= 5),
+            np.sin(2 * np.pi * hour / 24),
+            np.cos(2 * np.pi * hour / 24),
+            np.sin(2 * np.pi * day_of_week / 7),
+            np.cos(2 * np.pi * day_of_week / 7)
+        ]
+
+        return raw[self._gather].copy()
+
+    def continues(self, timestamps: Sequence[datetime], values: np.ndarray) -> int:
+        """
+        Index of the first row newer than last_timestamp if the block agrees
+        with the buffered rows up to it, else -1. Only rows still within
+        BUFFER_HOURS of the newest row after the push matter; those must
+        have the same timestamps and values in the block and the buffer. An
+        hour backfilled into the middle of the window, or a corrected value,
+        shifts the row-based lags and windows, so it forces a rebuild.
+        """
+        if self.last_timestamp is None or self.last_timestamp not in timestamps:
+            return -1
+        start = timestamps.index(self.last_timestamp) + 1
+        keep = max(0, BUFFER_HOURS - (len(timestamps) - start))   # older rows still in reach
+        overlap = min(start, keep)
+        if min(len(self.timestamps), keep) != overlap:
+            return -1
+        if overlap == 0:
+            return start
+        if list(self.timestamps)[-overlap:] != timestamps[start - overlap:start]:
+            return -1
+        if not np.array_equal(self._window(overlap), values[start - overlap:start], equal_nan=True):
+            return -1
+        return start
+
+    def sync(self, timestamps: Sequence[datetime], values: np.ndarray) -> int:
+        """
+        Bring the state up to date with an ordered block of hourly rows.
+        Only rows newer than last_timestamp are pushed when the block
+        continues the current state (see continues()); otherwise the state
+        is rebuilt from it. Returns the number of rows pushed.
+        """
+        timestamps = list(timestamps)
+        values = np.asarray(values, dtype=float)
+        start = self.continues(timestamps, values)
+        if start < 0:
+            self.reset()
+            start = 0
+
+        for idx in range(start, len(timestamps)):
+            self.push(timestamps[idx], values[idx])
+        return len(timestamps) - start
+
+
+# ============================================================================
+# PER-LOCATION REGISTRY
+# ============================================================================
+
+_FEATURE_STATES = OrderedDict()
+_FEATURE_STATES_LOCK = threading.Lock()
+
+
+def get_feature_state(latitude: float, longitude: float, feature_names: Sequence[str]) -> RollingFeatureState:
+    """Rolling state for a location, created on first use (LRU-bounded)"""
+    key = (latitude, longitude)
+    with _FEATURE_STATES_LOCK:
+        state = _FEATURE_STATES.get(key)
+        if state is None or state.feature_names != list(feature_names):
+            state = RollingFeatureState(feature_names)
+            _FEATURE_STATES[key] = state
+        _FEATURE_STATES.move_to_end(key)
+        while len(_FEATURE_STATES) > MAX_FEATURE_STATES:
+            _FEATURE_STATES.popitem(last=False)
+    return state
+
+
+# ============================================================================
+# PARITY CHECK
+# ============================================================================
+
+def _assert_close(actual, expected, feature_names, label):
+    if not np.allclose(actual, expected, rtol=PARITY_RTOL, atol=PARITY_ATOL, equal_nan=True):
+        bad = [feature_names[i] for i in np.flatnonzero(
+            ~np.isclose(actual, expected, rtol=PARITY_RTOL, atol=PARITY_ATOL, equal_nan=True))]
+        raise AssertionError(f"{label}: features differ from pandas: {bad[:10]}")
+
+
+def verify_against_pandas(path: str) -> int:
+    """
+    Stream a historical_data.json file through a RollingFeatureState and
+    compare every row with the pandas feature frame. Then slide a
+    BUFFER_HOURS-row window over the history the way serving does, sync()
+    one state with each window, and check that every slide pushes only the
+    new row and matches pandas run on that window. Returns rows checked.
+    """
+    import pandas as pd
+    from app.aqi_engine import convert_to_indian_aqi
+    from app.routes.aqi_prediction_service import build_feature_frame
+
+    with open(path, 'r') as f:
+        records = json.load(f)
+
+    rows = []
+    for record in records:
+        values = {p: record.get(f'components.{p}') for p in POLLUTANTS}
+        aqi = convert_to_indian_aqi({
+            'pm25': values['pm2_5'], 'pm10': values['pm10'], 'no2': values['no2'],
+            'so2': values['so2'], 'co': values['co'], 'o3': values['o3']
+        })['aqi']
+        rows.append({'hour_timestamp': datetime.fromtimestamp(record['dt']), **values,
+                     'indian_aqi': np.nan if aqi is None else aqi})
+
+    df = pd.DataFrame(rows).sort_values('hour_timestamp').reset_index(drop=True)
+    feature_names = list(FEATURE_LAYOUT)
+    expected = build_feature_frame(df)[feature_names].to_numpy(dtype=float)
+
+    state = RollingFeatureState(feature_names)
+    values = df[POLLUTANTS + ['indian_aqi']].to_numpy(dtype=float)
+    timestamps = list(df['hour_timestamp'].dt.to_pydatetime())
+    for idx, timestamp in enumerate(timestamps):
+        state.push(timestamp, values[idx])
+        _assert_close(state.features(), expected[idx], feature_names, f"Row {idx}")
+
+    state = RollingFeatureState(feature_names)
+    for end in range(BUFFER_HOURS, len(df) + 1):
+        window = slice(end - BUFFER_HOURS, end)
+        pushed = state.sync(timestamps[window], values[window])
+        if end > BUFFER_HOURS and pushed != 1:
+            raise AssertionError(f"Window ending at row {end - 1}: sync() pushed {pushed} rows, expected 1")
+        window_expected = build_feature_frame(df.iloc[window])[feature_names].to_numpy(dtype=float)[-1]
+        _assert_close(state.features(), window_expected, feature_names, f"Window ending at row {end - 1}")
+
+    slides = max(0, len(df) - BUFFER_HOURS + 1)
+    print(f"✓ {len(df)} rows and {slides} sliding {BUFFER_HOURS}h windows match the pandas features "
+          f"({len(feature_names)} features each)")
+    return len(df)
+
+
+if __name__ == '__main__':
+    verify_against_pandas(sys.argv[1] if len(sys.argv) > 1 else 'historical_data.json')
@@ -0,0 +1,189 @@
+"""
+Forecast Result Cache
+=====================
+In-process LRU cache for AQI forecasts.
+
+Keys are a snapped lat/lon grid cell plus the current hour bucket, and
+every entry expires exactly at the next hour boundary. Forecast inputs
+(hourly history + models) only change once per hour, so a hit can skip the
+DB read, the gap check, feature engineering and inference entirely.
+
+Each worker process has its own cache, so forecasts are also written to the
+shared forecast_snapshots table (migration 005), keyed by cell, hour and
+model version. A worker whose own cache misses reads the snapshot before
+computing, which is how the forecasts warmed by one worker
+(app/forecast_warmer.py) serve requests on every worker.
+"""
+
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+FORECAST_CACHE_MAX_ENTRIES = int(os.getenv('FORECAST_CACHE_MAX_ENTRIES', 2048))
+FORECAST_CACHE_CELL_DEGREES = float(os.getenv('FORECAST_CACHE_CELL_DEGREES', 0.01))  # ~1 km
+
+# Read and write forecast_snapshots on top of the in-process cache
+FORECAST_SHARED_CACHE_ENABLED = os.getenv('FORECAST_SHARED_CACHE_ENABLED', 'true').lower() == 'true'
+
+
+class ForecastCache:
+    """Bounded LRU cache whose entries expire at the end of their hour"""
+
+    def __init__(self, max_entries: int = FORECAST_CACHE_MAX_ENTRIES,
+                 cell_degrees: float = FORECAST_CACHE_CELL_DEGREES):
+        self.max_entries = max_entries
+        self.cell_degrees = cell_degrees
+        self._entries = OrderedDict()   # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def hour_bucket(now: datetime = None) -> datetime:
+        return (now or datetime.now()).replace(minute=0, second=0, microsecond=0)
+
+    def make_key(self, latitude: float, longitude: float, now: datetime = None) -> Tuple[int, int, datetime]:
+        """Snap coordinates to a grid cell and pair them with the current hour"""
+        return (
+            round(float(latitude) / self.cell_degrees),
+            round(float(longitude) / self.cell_degrees),
+            self.hour_bucket(now)
+        )
+
+    def get(self, key, now: datetime = None) -> Optional[Dict]:
+        now = now or datetime.now()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if now >= expires_at:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def contains(self, key, now: datetime = None) -> bool:
+        """Whether a live entry exists, without touching LRU order or hit stats"""
+        now = now or datetime.now()
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and now < entry[0]
+
+    def set(self, key, value: Dict):
+        expires_at = key[2] + timedelta(hours=1)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'cell_degrees': self.cell_degrees,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+
+
+# Shared instance used by the prediction service
+forecast_cache = ForecastCache()
+
+
+# ============================================================================
+# SHARED SNAPSHOTS (forecast_snapshots, migration 005)
+# ============================================================================
+
+def load_shared(keys: Iterable[Tuple[int, int, datetime]], model_version: str) -> Dict:
+    """
+    Snapshots stored by any worker for these cache keys and model version:
+    {key: forecast}. Empty when disabled or the table cannot be read.
+    """
+    keys = list(keys)
+    if not FORECAST_SHARED_CACHE_ENABLED or not keys:
+        return {}
+
+    from app.db import connection
+
+    try:
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT s.cell_lat, s.cell_lon, s.hour_bucket, s.forecast
+                FROM forecast_snapshots s
+                JOIN unnest(%s::integer[], %s::integer[], %s::timestamp[]) AS k(cell_lat, cell_lon, hour_bucket)
+                  USING (cell_lat, cell_lon, hour_bucket)
+                WHERE s.model_version = %s
+            """, ([key[0] for key in keys], [key[1] for key in keys], [key[2] for key in keys], model_version))
+            rows = cursor.fetchall()
+            cursor.close()
+    except Exception as e:
+        logger.warning(f"Shared forecast snapshots unavailable: {e}")
+        return {}
+
+    return {(cell_lat, cell_lon, hour_bucket): forecast for cell_lat, cell_lon, hour_bucket, forecast in rows}
+
+
+def save_shared(forecasts: Dict, model_version: str):
+    """Store {key: forecast} for the other workers (best effort)"""
+    if not FORECAST_SHARED_CACHE_ENABLED or not forecasts:
+        return
+
+    from app.db import connection
+
+    try:
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany("""
+                INSERT INTO forecast_snapshots (cell_lat, cell_lon, hour_bucket, model_version, forecast)
+                VALUES (%s, %s, %s, %s, %s)
+                ON CONFLICT (cell_lat, cell_lon, hour_bucket, model_version) DO UPDATE SET
+                    forecast = EXCLUDED.forecast,
+                    created_at = CURRENT_TIMESTAMP
+            """, [(key[0], key[1], key[2], model_version, json.dumps(forecast, default=float))
+                  for key, forecast in forecasts.items()])
+            cursor.close()
+    except Exception as e:
+        logger.warning(f"Could not store shared forecast snapshots: {e}")
+
+
+def delete_shared_before(hour_bucket: datetime) -> int:
+    """Drop snapshots of hours before `hour_bucket`; returns rows deleted"""
+    from app.db import connection
+
+    with connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM forecast_snapshots WHERE hour_bucket < %s", (hour_bucket,))
+        deleted = cursor.rowcount
+        cursor.close()
+    return deleted
@@ -0,0 +1,420 @@
+"""
+Hourly Forecast Warmer
+======================
+Background thread that precomputes forecasts shortly after every hour
+boundary, so the first visitor of the hour is served from the forecast
+cache instead of paying for the history fetch and inference.
+
+Warmed locations:
+  * the most-requested grid cells seen by the prediction endpoints
+  * the distinct home cities of registered users (aqi_login_data.city)
+
+Every gunicorn worker runs the thread, but one worker warms each hour:
+each worker flushes its request counts to forecast_demand, and the worker
+that inserts the hour's row into forecast_warm_rounds warms it (the others
+skip the round). The warmed forecasts go to forecast_snapshots, which every
+worker reads on a miss of its own in-process cache (app/forecast_cache.py),
+so the upstream budget is spent once per hour, not once per worker.
+Demand flushed by other workers since the previous round may only count
+from the next one.
+
+The budget counts real upstream requests: one per geocoded city and one
+per OpenWeather history range a cold cell is missing (a cell with two gaps
+costs two). Cells that would overrun it are skipped until the next hour.
+
+The shared tables come from migration 005. If they are missing, the first
+round logs it once and the warmer stops.
+
+Configuration (environment):
+    FORECAST_WARMER_ENABLED          start the thread from create_app (default true)
+    FORECAST_WARM_DELAY_MINUTES      minutes after the hour to start (default 3)
+    FORECAST_WARM_TOP_LOCATIONS      popular cells warmed per cycle (default 50)
+    FORECAST_WARM_CONCURRENCY        batches computed in parallel (default 4)
+    FORECAST_WARM_BATCH_SIZE         locations per batch prediction (default 10)
+    FORECAST_WARM_UPSTREAM_BUDGET    max upstream requests (geocoding + history
+                                     ranges) per hour, across all workers
+                                     (default 100)
+    FORECAST_DEMAND_DAYS             only cells requested in this many days
+                                     count as popular (default 7)
+"""
+
+import logging
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+FORECAST_WARMER_ENABLED = os.getenv('FORECAST_WARMER_ENABLED', 'true').lower() == 'true'
+FORECAST_WARM_DELAY_MINUTES = float(os.getenv('FORECAST_WARM_DELAY_MINUTES', 3))
+FORECAST_WARM_TOP_LOCATIONS = int(os.getenv('FORECAST_WARM_TOP_LOCATIONS', 50))
+FORECAST_WARM_CONCURRENCY = int(os.getenv('FORECAST_WARM_CONCURRENCY', 4))
+FORECAST_WARM_BATCH_SIZE = int(os.getenv('FORECAST_WARM_BATCH_SIZE', 10))
+FORECAST_WARM_UPSTREAM_BUDGET = int(os.getenv('FORECAST_WARM_UPSTREAM_BUDGET', 100))
+FORECAST_DEMAND_DAYS = int(os.getenv('FORECAST_DEMAND_DAYS', 7))
+
+MAX_TRACKED_LOCATIONS = 5000
+WARMER_TABLES = ('forecast_demand', 'forecast_warm_rounds', 'forecast_snapshots')
+
+
+# ============================================================================
+# DEMAND TRACKING
+# ============================================================================
+
+class LocationDemand:
+    """Request counts per forecast cache cell (LRU-bounded), plus counts not yet flushed"""
+
+    def __init__(self, max_locations: int = MAX_TRACKED_LOCATIONS):
+        self.max_locations = max_locations
+        self._counts = OrderedDict()   # cell -> [count, latitude, longitude]
+        self._unflushed = {}           # cell -> [count, latitude, longitude] since the last flush
+        self._lock = threading.Lock()
+
+    def record(self, latitude: float, longitude: float):
+        from app.forecast_cache import forecast_cache
+
+        cell = forecast_cache.make_key(latitude, longitude)[:2]
+        with self._lock:
+            for counts in (self._counts, self._unflushed):
+                entry = counts.get(cell)
+                if entry is None:
+                    counts[cell] = [1, float(latitude), float(longitude)]
+                else:
+                    entry[0] += 1
+            self._counts.move_to_end(cell)
+            while len(self._counts) > self.max_locations:
+                self._counts.popitem(last=False)
+            while len(self._unflushed) > self.max_locations:
+                self._unflushed.pop(next(iter(self._unflushed)))
+
+    def top(self, n: int) -> List[Tuple[float, float]]:
+        """Coordinates of the n most-requested cells"""
+        with self._lock:
+            ranked = sorted(self._counts.values(), key=lambda entry: entry[0], reverse=True)
+        return [(lat, lon) for _, lat, lon in ranked[:n]]
+
+    def drain(self) -> List[Tuple[int, int, int, float, float]]:
+        """Take the counts recorded since the last drain: [(cell_lat, cell_lon, count, lat, lon)]"""
+        with self._lock:
+            unflushed, self._unflushed = self._unflushed, {}
+        return [(cell[0], cell[1], count, lat, lon) for cell, (count, lat, lon) in unflushed.items()]
+
+    def restore(self, drained: List[Tuple[int, int, int, float, float]]):
+        """Put back counts whose flush failed"""
+        with self._lock:
+            for cell_lat, cell_lon, count, lat, lon in drained:
+                entry = self._unflushed.get((cell_lat, cell_lon))
+                if entry is None:
+                    self._unflushed[(cell_lat, cell_lon)] = [count, lat, lon]
+                else:
+                    entry[0] += count
+
+
+# Shared instance fed by the prediction routes
+location_demand = LocationDemand()
+
+
+class UpstreamBudget:
+    """Upstream requests one warm-up round may still make (shared by its batch threads)"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def take(self, calls: int) -> bool:
+        """Reserve `calls` requests; False (nothing reserved) if they do not fit"""
+        with self._lock:
+            if self.used + calls > self.limit:
+                return False
+            self.used += calls
+            return True
+
+
+# ============================================================================
+# WARMER
+# ============================================================================
+
+class ForecastWarmer:
+    """Precomputes forecasts for popular and home-city locations once per hour, in one worker"""
+
+    def __init__(self, delay_minutes: float = FORECAST_WARM_DELAY_MINUTES,
+                 top_locations: int = FORECAST_WARM_TOP_LOCATIONS,
+                 concurrency: int = FORECAST_WARM_CONCURRENCY,
+                 batch_size: int = FORECAST_WARM_BATCH_SIZE,
+                 upstream_budget: int = FORECAST_WARM_UPSTREAM_BUDGET):
+        self.delay_minutes = delay_minutes
+        self.top_locations = top_locations
+        self.concurrency = max(1, concurrency)
+        self.batch_size = max(1, batch_size)
+        self.upstream_budget = upstream_budget
+        self._city_coordinates = {}    # city (lower-case) -> (lat, lon) or None
+        self._schema_checked = False
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_run = None
+
+    # ---------------------------------------------------------------- shared state
+
+    @staticmethod
+    def missing_tables() -> List[str]:
+        """WARMER_TABLES that do not exist (migration 005 not applied)"""
+        from app.db import connection
+
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT name FROM unnest(%s::text[]) AS t(name) WHERE to_regclass(name) IS NULL",
+                           (list(WARMER_TABLES),))
+            missing = [row[0] for row in cursor.fetchall()]
+            cursor.close()
+        return missing
+
+    @staticmethod
+    def flush_demand() -> int:
+        """Add this worker's request counts since the last flush to forecast_demand"""
+        from app.db import connection
+
+        drained = location_demand.drain()
+        if not drained:
+            return 0
+        try:
+            with connection() as conn:
+                cursor = conn.cursor()
+                cursor.executemany("""
+                    INSERT INTO forecast_demand (cell_lat, cell_lon, requests, latitude, longitude)
+                    VALUES (%s, %s, %s, %s, %s)
+                    ON CONFLICT (cell_lat, cell_lon) DO UPDATE SET
+                        requests = forecast_demand.requests + EXCLUDED.requests,
+                        latitude = EXCLUDED.latitude,
+                        longitude = EXCLUDED.longitude,
+                        last_requested = CURRENT_TIMESTAMP
+                """, drained)
+                cursor.close()
+        except Exception as e:
+            location_demand.restore(drained)
+            logger.error(f"Error flushing forecast demand: {e}")
+            return 0
+        return len(drained)
+
+    @staticmethod
+    def claim_round(hour_bucket: datetime) -> bool:
+        """True if this worker is the one warming `hour_bucket` (first to insert its row)"""
+        from app.db import connection
+
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO forecast_warm_rounds (hour_bucket, worker)
+                VALUES (%s, %s)
+                ON CONFLICT (hour_bucket) DO NOTHING
+            """, (hour_bucket, f"{socket.gethostname()}:{os.getpid()}"))
+            claimed = cursor.rowcount == 1
+            if claimed:
+                cursor.execute("DELETE FROM forecast_warm_rounds WHERE hour_bucket < %s",
+                               (hour_bucket - timedelta(days=FORECAST_DEMAND_DAYS),))
+            cursor.close()
+        return claimed
+
+    def popular_locations(self) -> List[Tuple[float, float]]:
+        """Most-requested cells across all workers (this worker's own counts if unavailable)"""
+        from app.db import connection
+
+        try:
+            with connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT latitude, longitude
+                    FROM forecast_demand
+                    WHERE last_requested >= NOW() - make_interval(days => %s)
+                    ORDER BY requests DESC
+                    LIMIT %s
+                """, (FORECAST_DEMAND_DAYS, self.top_locations))
+                popular = [(float(lat), float(lon)) for lat, lon in cursor.fetchall()]
+                cursor.close()
+            return popular
+        except Exception as e:
+            logger.error(f"Error reading forecast demand: {e}")
+            return location_demand.top(self.top_locations)
+
+    # ---------------------------------------------------------------- targets
+
+    def get_user_cities(self) -> List[str]:
+        """Distinct home cities of registered users"""
+        from app.db import connection
+
+        try:
+            with connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT DISTINCT TRIM(city)
+                    FROM aqi_login_data
+                    WHERE city IS NOT NULL AND TRIM(city) <> ''
+                """)
+                cities = [row[0] for row in cursor.fetchall()]
+                cursor.close()
+            return cities
+        except Exception as e:
+            logger.error(f"Error reading user cities: {e}")
+            return []
+
+    def resolve_cities(self, cities: List[str], budget: UpstreamBudget) -> Tuple[List[Tuple[float, float]], int]:
+        """
+        Geocode cities, remembering results across cycles (cities do not move).
+        Returns (coordinates, geocoding calls made).
+        """
+        from app.routes.locationService import location_service
+
+        coordinates, calls = [], 0
+        for city in cities:
+            key = city.lower()
+            if key not in self._city_coordinates:
+                if not budget.take(1):
+                    continue
+                calls += 1
+                result = location_service.geocode_location(city)
+                self._city_coordinates[key] = (result['lat'], result['lon']) if result.get('success') else None
+
+            if self._city_coordinates[key] is not None:
+                coordinates.append(self._city_coordinates[key])
+        return coordinates, calls
+
+    def collect_targets(self, budget: UpstreamBudget) -> Tuple[List[Tuple[float, float]], int]:
+        """Unique cache cells to warm plus the geocoding calls spent finding them"""
+        from app.forecast_cache import forecast_cache
+
+        popular = self.popular_locations()
+        home_cities, calls = self.resolve_cities(self.get_user_cities(), budget)
+
+        targets, seen = [], set()
+        for lat, lon in popular + home_cities:
+            cell = forecast_cache.make_key(lat, lon)[:2]
+            if cell not in seen:
+                seen.add(cell)
+                targets.append((lat, lon))
+        return targets, calls
+
+    # ---------------------------------------------------------------- cycle
+
+    def run_once(self) -> Optional[Dict]:
+        """
+        Warm every target that is not already cached for the current hour;
+        None if another worker claimed the hour (or the warmer is disabled)
+        """
+        from app.forecast_cache import delete_shared_before, forecast_cache, load_shared
+        from app.routes.aqi_prediction_service import get_model_set
+
+        if not self._schema_checked:
+            missing = self.missing_tables()
+            self._schema_checked = True
+            if missing:
+                logger.warning(f"⚠️ Forecast warmer disabled: {', '.join(missing)} missing "
+                               f"(apply migration 005: python -m app.database.migrate)")
+                self.stop()
+                return None
+
+        start_time = time.time()
+        hour_bucket = forecast_cache.hour_bucket()
+        self.flush_demand()
+        if not self.claim_round(hour_bucket):
+            return None
+
+        budget = UpstreamBudget(self.upstream_budget)
+        targets, calls = self.collect_targets(budget)
+
+        # Cold cells may need upstream history fetches, charged to the budget per range
+        keys = {(lat, lon): forecast_cache.make_key(lat, lon, hour_bucket) for lat, lon in targets}
+        cold = [target for target in targets if not forecast_cache.contains(keys[target])]
+        shared = load_shared([keys[target] for target in cold], get_model_set().version)
+        cold = [target for target in cold if keys[target] not in shared]
+
+        batches = [
+            [{'latitude': lat, 'longitude': lon} for lat, lon in cold[i:i + self.batch_size]]
+            for i in range(0, len(cold), self.batch_size)
+        ]
+
+        warmed = failed = skipped = 0
+        if batches:
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='forecast-warm') as pool:
+                for results in pool.map(lambda batch: self._warm_batch(batch, budget), batches):
+                    for result in results:
+                        if result.get('success'):
+                            warmed += 1
+                        elif result.get('over_budget'):
+                            skipped += 1
+                        else:
+                            failed += 1
+
+        # Snapshots of earlier hours are never read again
+        expired = delete_shared_before(hour_bucket)
+
+        self.last_run = {
+            'finished_at': datetime.now().isoformat(),
+            'hour': hour_bucket.isoformat(),
+            'targets': len(targets),
+            'already_shared': len(shared),
+            'warmed': warmed,
+            'failed': failed,
+            'skipped_over_budget': skipped,
+            'geocoding_calls': calls,
+            'upstream_calls': budget.used,
+            'expired_snapshots': expired,
+            'duration_ms': int((time.time() - start_time) * 1000)
+        }
+        logger.info(f"🔥 Forecast warm-up: {self.last_run}")
+        return self.last_run
+
+    @staticmethod
+    def _warm_batch(locations: List[Dict], budget: UpstreamBudget) -> List[Dict]:
+        from app.routes.aqi_prediction_service import get_aqi_predictions_batch
+
+        try:
+            return get_aqi_predictions_batch(locations, upstream_budget=budget)
+        except Exception as e:
+            logger.error(f"❌ Forecast warm-up batch failed: {e}")
+            return [{'success': False, 'error': str(e)} for _ in locations]
+
+    # ---------------------------------------------------------------- thread
+
+    def seconds_until_next_run(self, now: Optional[datetime] = None) -> float:
+        now = now or datetime.now()
+        run_at = now.replace(minute=0, second=0, microsecond=0) + timedelta(minutes=self.delay_minutes)
+        if run_at <= now:
+            run_at += timedelta(hours=1)
+        return (run_at - now).total_seconds()
+
+    def _loop(self):
+        while not self._stop.wait(self.seconds_until_next_run()):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"❌ Forecast warm-up failed: {e}")
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='forecast-warmer', daemon=True)
+        self._thread.start()
+        logger.info(f"🔥 Forecast warmer started ({self.delay_minutes} min after each hour)")
+
+    def stop(self):
+        self._stop.set()
+
+
+forecast_warmer = ForecastWarmer()
+
+
+def start_forecast_warmer():
+    """Start the shared warmer thread if enabled (safe to call more than once)"""
+    if FORECAST_WARMER_ENABLED:
+        forecast_warmer.start()
+    return forecast_warmer
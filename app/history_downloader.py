@@ -0,0 +1,342 @@
+"""
+Historical Data Downloader
+==========================
+Downloads OpenWeather air-pollution history for many cities.
+
+The date range is split into fixed windows (one API call each) that are
+fetched concurrently. Every API key gets its own calls-per-minute budget,
+and calls rotate across keys. Each finished window is written to
+<out>/raw/<city>/<start>_<end>.json in the historical_data.json layout
+(flat "components.*" records) and checkpointed in <out>/manifest.json,
+so a rerun after a crash only fetches the windows that are still missing.
+
+Downloaded cities can then be loaded into aqi_hourly_data (via
+ingest_history) or into a per-city columnar feature store.
+
+Usage (from the repository root):
+    python -m app.history_downloader --city Delhi --city "Raichur=16.45,76.26" \\
+        --start 2021-01-01 --end 2024-01-01 --out history_download --sink db
+
+Point --base-url at a local HTTP server that answers
+GET ?lat&lon&start&end&appid with {"list": [...]} to run without the real API.
+
+Configuration (environment):
+    OPENWEATHER_API_KEYS             comma-separated keys (default OPENWEATHER_API_KEY)
+    OPENWEATHER_HISTORY_URL          history endpoint (default the OpenWeather URL)
+    HISTORY_CALLS_PER_MINUTE         per-key budget (default 60, the free-tier limit)
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+from app.routes.aqi_prediction_service import API_HISTORICAL_URL, API_KEY
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+API_KEYS = [k.strip() for k in os.getenv('OPENWEATHER_API_KEYS', API_KEY).split(',') if k.strip()]
+HISTORY_URL = os.getenv('OPENWEATHER_HISTORY_URL', API_HISTORICAL_URL)
+CALLS_PER_MINUTE = float(os.getenv('HISTORY_CALLS_PER_MINUTE', 60))
+
+DEFAULT_WINDOW_DAYS = 30
+DEFAULT_WORKERS = 4
+REQUEST_TIMEOUT = 30
+MAX_ATTEMPTS = 5
+MANIFEST_FILENAME = 'manifest.json'
+
+
+# ============================================================================
+# RATE LIMITING
+# ============================================================================
+
+class RateLimiter:
+    """Token bucket: `rate` calls per minute, bursts up to `burst`"""
+
+    def __init__(self, calls_per_minute: float, burst: int = 1):
+        self.interval = 60.0 / calls_per_minute
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) / self.interval)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) * self.interval
+            time.sleep(wait)
+
+
+class KeyPool:
+    """Rotates API keys, each behind its own RateLimiter"""
+
+    def __init__(self, keys: List[str], calls_per_minute: float = CALLS_PER_MINUTE):
+        if not keys:
+            raise ValueError("At least one API key is required")
+        self._limiters = [(key, RateLimiter(calls_per_minute)) for key in keys]
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> str:
+        """Block until a key has budget and return it"""
+        with self._lock:
+            key, limiter = self._limiters[self._next]
+            self._next = (self._next + 1) % len(self._limiters)
+        limiter.acquire()
+        return key
+
+
+# ============================================================================
+# WINDOWS & MANIFEST
+# ============================================================================
+
+def city_slug(name: str) -> str:
+    return re.sub(r'[^a-z0-9]+', '_', name.lower()).strip('_')
+
+
+def split_windows(start: int, end: int, window_seconds: int) -> List[Tuple[int, int]]:
+    """[start, end) cut into consecutive windows of at most window_seconds"""
+    return [(s, min(s + window_seconds, end)) for s in range(start, end, window_seconds)]
+
+
+class Manifest:
+    """Completed windows, persisted atomically after every update"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.data = {'cities': {}, 'windows': {}}
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self.data = json.load(f)
+
+    @staticmethod
+    def window_key(slug: str, start: int, end: int) -> str:
+        return f"{slug}/{start}_{end}"
+
+    def is_done(self, key: str) -> bool:
+        return key in self.data['windows']
+
+    def set_city(self, slug: str, name: str, latitude: float, longitude: float):
+        with self._lock:
+            self.data['cities'][slug] = {'name': name, 'lat': latitude, 'lon': longitude}
+            self._save()
+
+    def mark_done(self, key: str, path: str, rows: int):
+        with self._lock:
+            self.data['windows'][key] = {'file': path, 'rows': rows, 'completed_at': datetime.now().isoformat()}
+            self._save()
+
+    def city_files(self, slug: str) -> List[str]:
+        """Downloaded window files with data for one city, oldest first"""
+        return sorted(w['file'] for k, w in self.data['windows'].items()
+                      if k.startswith(slug + '/') and w['rows'])
+
+    def _save(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.data, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+# ============================================================================
+# DOWNLOAD
+# ============================================================================
+
+def flatten_record(record: Dict) -> Dict:
+    """One API list entry in the historical_data.json (json_normalize) layout"""
+    flat = {'dt': record.get('dt'), 'main.aqi': record.get('main', {}).get('aqi')}
+    for name, value in record.get('components', {}).items():
+        flat[f'components.{name}'] = value
+    return flat
+
+
+def fetch_window(keys: KeyPool, base_url: str, latitude: float, longitude: float,
+                 start: int, end: int) -> List[Dict]:
+    """One history call with retry/backoff on rate limiting, server errors and timeouts"""
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        params = {'lat': latitude, 'lon': longitude, 'start': start, 'end': end, 'appid': keys.acquire()}
+        try:
+            response = requests.get(base_url, params=params, timeout=REQUEST_TIMEOUT)
+            if response.status_code == 200:
+                return [flatten_record(r) for r in response.json().get('list', [])]
+            if response.status_code != 429 and response.status_code < 500:
+                raise RuntimeError(f"API error {response.status_code}: {response.text[:200]}")
+            reason = f"HTTP {response.status_code}"
+        except requests.RequestException as e:
+            reason = str(e)
+
+        if attempt == MAX_ATTEMPTS:
+            raise RuntimeError(f"Window {start}-{end} failed after {MAX_ATTEMPTS} attempts ({reason})")
+        backoff = 2 ** attempt
+        logger.warning(f"⚠️  Window {start}-{end} {reason}, retrying in {backoff}s")
+        time.sleep(backoff)
+
+
+def resolve_city(spec: str) -> Tuple[str, float, float]:
+    """'Name=lat,lon' as given, or a plain name geocoded with LocationService"""
+    if '=' in spec:
+        name, coords = spec.split('=', 1)
+        lat, lon = (float(v) for v in coords.split(','))
+        return name.strip(), lat, lon
+
+    from app.routes.locationService import location_service
+
+    result = location_service.geocode_location(spec)
+    if not result.get('success'):
+        raise ValueError(f"Could not geocode {spec!r}")
+    return spec, result['lat'], result['lon']
+
+
+def download(cities: List[str], start: datetime, end: datetime, out_dir: str,
+             window_days: int = DEFAULT_WINDOW_DAYS, workers: int = DEFAULT_WORKERS,
+             base_url: str = HISTORY_URL, keys: Optional[KeyPool] = None) -> Dict:
+    """Fetch every missing window for every city; returns counts for the run"""
+    keys = keys or KeyPool(API_KEYS)
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = Manifest(os.path.join(out_dir, MANIFEST_FILENAME))
+
+    start_unix = int(start.replace(tzinfo=timezone.utc).timestamp())
+    end_unix = int(end.replace(tzinfo=timezone.utc).timestamp())
+    windows = split_windows(start_unix, end_unix, window_days * 86400)
+
+    tasks = []
+    for spec in cities:
+        name, lat, lon = resolve_city(spec)
+        slug = city_slug(name)
+        manifest.set_city(slug, name, lat, lon)
+        os.makedirs(os.path.join(out_dir, 'raw', slug), exist_ok=True)
+        for w_start, w_end in windows:
+            key = Manifest.window_key(slug, w_start, w_end)
+            if not manifest.is_done(key):
+                tasks.append((key, slug, lat, lon, w_start, w_end))
+
+    skipped = len(cities) * len(windows) - len(tasks)
+    print(f"📡 {len(tasks)} windows to fetch ({skipped} already done) with {workers} workers")
+
+    def run(task):
+        key, slug, lat, lon, w_start, w_end = task
+        records = fetch_window(keys, base_url, lat, lon, w_start, w_end)
+        path = os.path.join(out_dir, 'raw', slug, f'{w_start}_{w_end}.json')
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(records, f)
+        os.replace(tmp_path, path)
+        manifest.mark_done(key, path, len(records))
+        return len(records)
+
+    started = time.perf_counter()
+    fetched, rows, failed = 0, 0, []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run, task): task[0] for task in tasks}
+        for future in as_completed(futures):
+            try:
+                rows += future.result()
+                fetched += 1
+            except Exception as e:
+                failed.append(futures[future])
+                logger.error(f"❌ {futures[future]}: {e}")
+
+    summary = {
+        'windows_fetched': fetched,
+        'windows_skipped': skipped,
+        'windows_failed': failed,
+        'rows': rows,
+        'seconds': round(time.perf_counter() - started, 2)
+    }
+    print(f"✓ Fetched {fetched} windows ({rows} rows) in {summary['seconds']}s"
+          + (f", {len(failed)} failed - rerun to resume" if failed else ""))
+    return summary
+
+
+# ============================================================================
+# SINKS
+# ============================================================================
+
+def load_into_database(out_dir: str):
+    """Upsert every downloaded city into aqi_hourly_data"""
+    from app.ingest_history import ingest_files
+
+    manifest = Manifest(os.path.join(out_dir, MANIFEST_FILENAME))
+    for slug, city in manifest.data['cities'].items():
+        files = manifest.city_files(slug)
+        if files:
+            result = ingest_files(files, city['lat'], city['lon'], city['name'])
+            print(f"✓ {city['name']}: {result['rows_upserted']} rows upserted into aqi_hourly_data")
+
+
+def load_into_feature_store(out_dir: str, store_dir: str):
+    """Sync one feature store per city (<store_dir>/<city>) with its downloaded history"""
+    import pandas as pd
+    from app.feature_store import FeatureStore, load_raw_history
+
+    manifest = Manifest(os.path.join(out_dir, MANIFEST_FILENAME))
+    for slug, city in manifest.data['cities'].items():
+        files = manifest.city_files(slug)
+        if not files:
+            continue
+        history = (pd.concat([load_raw_history(path) for path in files], ignore_index=True)
+                   .drop_duplicates('datetime', keep='last')
+                   .sort_values('datetime')
+                   .reset_index(drop=True))
+        print(f"{city['name']}:")
+        FeatureStore(os.path.join(store_dir, slug)).sync(history)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    parser = argparse.ArgumentParser(description='Download OpenWeather pollution history for many cities')
+    parser.add_argument('--city', action='append', default=[], help='"Name" (geocoded) or "Name=lat,lon"; repeatable')
+    parser.add_argument('--cities-file', help='File with one city spec per line')
+    parser.add_argument('--start', required=True, help='Start date, YYYY-MM-DD (UTC)')
+    parser.add_argument('--end', required=True, help='End date, YYYY-MM-DD (UTC, exclusive)')
+    parser.add_argument('--out', default='history_download', help='Output/manifest directory (default: %(default)s)')
+    parser.add_argument('--window-days', type=int, default=DEFAULT_WINDOW_DAYS, help='Days per API call (default: %(default)s)')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Concurrent requests (default: %(default)s)')
+    parser.add_argument('--base-url', default=HISTORY_URL, help='History endpoint (e.g. a local stub)')
+    parser.add_argument('--calls-per-minute', type=float, default=CALLS_PER_MINUTE, help='Budget per API key (default: %(default)s)')
+    parser.add_argument('--sink', choices=['none', 'db', 'feature-store'], default='none', help='Where to load the downloaded data')
+    parser.add_argument('--store', default='feature_store', help='Feature store root for --sink feature-store')
+    args = parser.parse_args()
+
+    cities = list(args.city)
+    if args.cities_file:
+        with open(args.cities_file, 'r') as f:
+            cities += [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    if not cities:
+        parser.error('no cities given (use --city or --cities-file)')
+
+    download(
+        cities,
+        datetime.strptime(args.start, '%Y-%m-%d'),
+        datetime.strptime(args.end, '%Y-%m-%d'),
+        args.out,
+        window_days=args.window_days,
+        workers=args.workers,
+        base_url=args.base_url,
+        keys=KeyPool(API_KEYS, args.calls_per_minute)
+    )
+
+    if args.sink == 'db':
+        load_into_database(args.out)
+    elif args.sink == 'feature-store':
+        load_into_feature_store(args.out, args.store)
@@ -0,0 +1,271 @@
+"""
+Historical Data Ingestion
+=========================
+Bulk loader for aqi_hourly_data.
+
+Reads historical_data.json-shaped files (a JSON array of flat
+"components.*" records) or raw OpenWeather history responses
+({"list": [{"dt": ..., "components": {...}}]}) as a stream, so file size
+is not bounded by memory. Records are converted to Indian AQI in
+NumPy batches, COPY'd into a temporary staging table and merged into
+aqi_hourly_data with a single set-based upsert.
+
+Usage (from the repository root):
+    python -m app.ingest_history historical_data.json --lat 28.61 --lon 77.21 --name Delhi
+"""
+
+import argparse
+import io
+import json
+import logging
+import re
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.aqi_engine import POLLUTANTS, convert_to_indian_aqi_batch, indian_aqi_category_batch
+from app.db import get_db_connection
+from app.database.partitions import ensure_partitions
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+BATCH_ROWS = 50000              # records converted and COPY'd at a time
+READ_CHUNK_CHARS = 1 << 20      # JSON text read per step
+DATA_SOURCE = 'history_import'
+
+# OpenWeather component name for each engine pollutant key
+COMPONENT_NAMES = {'pm25': 'pm2_5', 'pm10': 'pm10', 'no2': 'no2', 'so2': 'so2', 'co': 'co', 'o3': 'o3'}
+EXTRA_COMPONENTS = ['no', 'nh3']
+
+STAGING_COLUMNS = [
+    'latitude', 'longitude', 'location_name',
+    'hour_timestamp', 'unix_timestamp',
+    'pm2_5', 'pm10', 'no2', 'so2', 'co', 'o3', 'no', 'nh3',
+    'indian_aqi', 'dominant_pollutant', 'aqi_category',
+    'sub_index_pm25', 'sub_index_pm10', 'sub_index_no2',
+    'sub_index_so2', 'sub_index_co', 'sub_index_o3'
+]
+UPSERT_KEY = ['latitude', 'longitude', 'hour_timestamp']
+
+
+# ============================================================================
+# STREAMING JSON READER
+# ============================================================================
+
+_LIST_KEY = re.compile(r'"list"\s*:\s*\[')
+
+
+def iter_json_records(path: str, chunk_chars: int = READ_CHUNK_CHARS) -> Iterator[Dict]:
+    """
+    Yield the objects of a top-level JSON array, or of the "list" array of
+    an OpenWeather response, without loading the whole file.
+    """
+    decoder = json.JSONDecoder()
+
+    with open(path, 'r') as f:
+        buffer = f.read(chunk_chars)
+        eof = not buffer
+
+        # Find where the record array starts
+        while True:
+            stripped = buffer.lstrip()
+            if stripped.startswith('['):
+                pos = len(buffer) - len(stripped) + 1
+                break
+            match = _LIST_KEY.search(buffer)
+            if match:
+                pos = match.end()
+                break
+            if eof:
+                raise ValueError(f"{path}: no JSON array or \"list\" key found")
+            more = f.read(chunk_chars)
+            eof = not more
+            buffer += more
+
+        while True:
+            # Skip whitespace and separators between records
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+
+            if pos < len(buffer) and buffer[pos] == ']':
+                return
+
+            try:
+                if pos >= len(buffer):
+                    raise json.JSONDecodeError('need more data', buffer, pos)
+                record, pos = decoder.raw_decode(buffer, pos)
+                yield record
+            except json.JSONDecodeError:
+                if eof:
+                    raise ValueError(f"{path}: truncated JSON near offset {pos}")
+                more = f.read(chunk_chars)
+                eof = not more
+                buffer = buffer[pos:] + more
+                pos = 0
+
+
+def normalize_record(record: Dict) -> Tuple[int, Dict[str, Optional[float]]]:
+    """(unix dt, {component: value}) for flat 'components.x' or nested 'components' records"""
+    nested = record.get('components')
+    if isinstance(nested, dict):
+        return record['dt'], nested
+    return record['dt'], {key[len('components.'):]: value
+                          for key, value in record.items() if key.startswith('components.')}
+
+
+# ============================================================================
+# BATCH CONVERSION
+# ============================================================================
+
+def build_batch(records: List[Tuple[int, Dict]], latitude: float, longitude: float,
+                location_name: Optional[str]) -> pd.DataFrame:
+    """Rows for the staging table, with Indian AQI computed for the whole batch"""
+    dts = np.array([dt for dt, _ in records], dtype=np.int64)
+    components = {
+        name: np.array([c.get(name) for _, c in records], dtype=float)
+        for name in list(COMPONENT_NAMES.values()) + EXTRA_COMPONENTS
+    }
+
+    aqi = convert_to_indian_aqi_batch({key: components[name] for key, name in COMPONENT_NAMES.items()})
+
+    def as_int(values):
+        return pd.array(values, dtype='Float64').astype('Int64')  # NaN -> NULL in the COPY
+
+    frame = {
+        'latitude': latitude,
+        'longitude': longitude,
+        'location_name': location_name,
+        # Same local-hour bucketing as the prediction service
+        'hour_timestamp': [datetime.fromtimestamp(dt).replace(minute=0, second=0, microsecond=0) for dt in dts],
+        'unix_timestamp': dts
+    }
+    for name in list(COMPONENT_NAMES.values()) + EXTRA_COMPONENTS:
+        frame[name] = components[name]
+    frame['indian_aqi'] = as_int(aqi['aqi'])
+    frame['dominant_pollutant'] = aqi['dominant_pollutant']
+    frame['aqi_category'] = np.where(np.isnan(aqi['aqi']), None, indian_aqi_category_batch(aqi['aqi']))
+    for pollutant in POLLUTANTS:
+        frame[f'sub_index_{pollutant}'] = as_int(aqi['sub_indices'][pollutant])
+
+    return pd.DataFrame(frame, columns=STAGING_COLUMNS)
+
+
+# ============================================================================
+# DATABASE LOAD
+# ============================================================================
+
+def _create_staging_table(cursor):
+    cursor.execute(f"""
+        CREATE TEMP TABLE aqi_hourly_staging ON COMMIT DROP AS
+        SELECT {', '.join(STAGING_COLUMNS)}
+        FROM aqi_hourly_data
+        WITH NO DATA
+    """)
+
+
+def _copy_batch(cursor, batch: pd.DataFrame):
+    buffer = io.StringIO()
+    batch.to_csv(buffer, index=False, header=False, na_rep='')
+    buffer.seek(0)
+    cursor.copy_expert(
+        f"COPY aqi_hourly_staging ({', '.join(STAGING_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+        buffer
+    )
+
+
+def _merge_staging(cursor, data_source: str) -> int:
+    """One set-based upsert from staging; the latest record wins per key"""
+    # Historical files can reach back before the partitions the app keeps
+    cursor.execute("SELECT min(hour_timestamp), max(hour_timestamp) FROM aqi_hourly_staging")
+    first_hour, last_hour = cursor.fetchone()
+    if first_hour is not None:
+        ensure_partitions(cursor, first_hour, last_hour)
+
+    update_columns = [c for c in STAGING_COLUMNS if c not in UPSERT_KEY]
+    cursor.execute(f"""
+        INSERT INTO aqi_hourly_data ({', '.join(STAGING_COLUMNS)}, data_source)
+        SELECT DISTINCT ON ({', '.join(UPSERT_KEY)})
+               {', '.join(STAGING_COLUMNS)}, %s
+        FROM aqi_hourly_staging
+        ORDER BY {', '.join(UPSERT_KEY)}, unix_timestamp DESC
+        ON CONFLICT ({', '.join(UPSERT_KEY)}) DO UPDATE SET
+            {', '.join(f'{c} = COALESCE(EXCLUDED.{c}, aqi_hourly_data.{c})' for c in update_columns)}
+    """, (data_source,))
+    return cursor.rowcount
+
+
+def _refresh_rollups(cursor, latitude: float, longitude: float):
+    """Recompute the daily/weekly rollup buckets covered by the staged hours"""
+    cursor.execute("""
+        SELECT aqi_refresh_rollups(%s, %s, min(hour_timestamp), max(hour_timestamp))
+        FROM aqi_hourly_staging
+        HAVING count(*) > 0
+    """, (latitude, longitude))
+
+
+def ingest_files(paths: List[str], latitude: float, longitude: float, location_name: Optional[str] = None,
+                 batch_rows: int = BATCH_ROWS, data_source: str = DATA_SOURCE) -> Dict:
+    """Stream files into aqi_hourly_data in one transaction; returns row counts and throughput"""
+    start = time.perf_counter()
+    connection = get_db_connection()
+    if not connection:
+        raise RuntimeError("Database connection failed")
+
+    rows_read = 0
+    try:
+        cursor = connection.cursor()
+        _create_staging_table(cursor)
+
+        pending = []
+        for path in paths:
+            for record in iter_json_records(path):
+                pending.append(normalize_record(record))
+                if len(pending) >= batch_rows:
+                    _copy_batch(cursor, build_batch(pending, latitude, longitude, location_name))
+                    rows_read += len(pending)
+                    pending = []
+            logger.info(f"✓ Staged {path}")
+        if pending:
+            _copy_batch(cursor, build_batch(pending, latitude, longitude, location_name))
+            rows_read += len(pending)
+
+        rows_upserted = _merge_staging(cursor, data_source)
+        _refresh_rollups(cursor, latitude, longitude)
+        connection.commit()
+        cursor.close()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+    seconds = time.perf_counter() - start
+    return {
+        'rows_read': rows_read,
+        'rows_upserted': rows_upserted,
+        'seconds': round(seconds, 2),
+        'rows_per_minute': int(rows_read / seconds * 60) if seconds else rows_read
+    }
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    parser = argparse.ArgumentParser(description='Bulk-load historical pollution data into aqi_hourly_data')
+    parser.add_argument('files', nargs='+', help='historical_data.json-style files or OpenWeather history responses')
+    parser.add_argument('--lat', type=float, required=True, help='Latitude the readings belong to')
+    parser.add_argument('--lon', type=float, required=True, help='Longitude the readings belong to')
+    parser.add_argument('--name', default=None, help='Location name stored with the rows')
+    parser.add_argument('--batch-rows', type=int, default=BATCH_ROWS, help='Rows per COPY batch (default: %(default)s)')
+    args = parser.parse_args()
+
+    result = ingest_files(args.files, args.lat, args.lon, args.name, args.batch_rows)
+    print(f"✓ Ingested {result['rows_read']} rows ({result['rows_upserted']} upserted) in {result['seconds']}s "
+          f"- {result['rows_per_minute']:,} rows/min")
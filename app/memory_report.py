@@ -0,0 +1,54 @@
+"""
+Process Memory Report
+=====================
+Reads RSS / shared / private memory of the current process from
+/proc/self/smaps_rollup (Linux). Used at startup to show how much of the
+model weights gunicorn workers share after a preloaded, memory-mapped load.
+"""
+
+import os
+from typing import Dict
+
+SMAPS_ROLLUP_PATH = '/proc/self/smaps_rollup'
+STATUS_PATH = '/proc/self/status'
+
+
+def process_memory() -> Dict[str, float]:
+    """Memory of this process in MB: rss, pss, shared and private (empty if unavailable)"""
+    fields = {}
+    try:
+        with open(SMAPS_ROLLUP_PATH, 'r') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1])
+    except OSError:
+        # Older kernels: only the total RSS is available
+        try:
+            with open(STATUS_PATH, 'r') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        return {'rss_mb': round(int(line.split()[1]) / 1024, 1)}
+        except OSError:
+            pass
+        return {}
+
+    shared = fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0)
+    private = fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)
+    return {
+        'rss_mb': round(fields.get('Rss', 0) / 1024, 1),
+        'pss_mb': round(fields.get('Pss', 0) / 1024, 1),
+        'shared_mb': round(shared / 1024, 1),
+        'private_mb': round(private / 1024, 1)
+    }
+
+
+def log_memory(label: str) -> Dict[str, float]:
+    """Print a one-line memory report for this process"""
+    memory = process_memory()
+    if memory:
+        details = ', '.join(f"{key[:-3]}={value} MB" for key, value in memory.items())
+        print(f"🧠 [pid {os.getpid()}] {label}: {details}")
+    else:
+        print(f"🧠 [pid {os.getpid()}] {label}: memory report unavailable on this platform")
+    return memory
@@ -0,0 +1,468 @@
+"""
+Model Registry
+==============
+Versioned forecaster directories with an atomic "current" pointer, and a
+per-process holder that hot-swaps the loaded models.
+
+Layout:
+    app/models/
+        CURRENT                     name of the active version (one line)
+        <version>/
+            manifest.json           files, sizes, features, metrics summary
+            aqi_rf_model_{h}h.pkl, aqi_rf_model_multi.pkl
+            flat/...                flat-array exports (tree_inference)
+            feature_names.txt
+            model_metrics.json
+
+Without a CURRENT file the models in app/models/ itself are served as the
+'unversioned' set, so existing deployments keep working.
+
+Every worker runs a watcher thread that polls CURRENT. When it changes, the
+new version is loaded in that thread while the old one keeps serving, then
+the active ModelSet reference is replaced in one assignment. Requests take
+one ModelSet at the start and use it throughout, so a swap never mixes
+versions within a request.
+
+Publish a version (from the repository root):
+    python -m app.model_registry publish v20250101-020000
+    python -m app.model_registry list
+"""
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import joblib
+import numpy as np
+import pandas as pd
+
+try:
+    from app.tree_inference import (FLAT_ARRAYS, FlatForest, flat_model_exists,
+                                    flat_model_is_current, flat_model_path)
+    from app.memory_report import process_memory
+except ImportError:  # run from app/ alongside train_model.py
+    from tree_inference import (FLAT_ARRAYS, FlatForest, flat_model_exists,
+                                flat_model_is_current, flat_model_path)
+    from memory_report import process_memory
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+CURRENT_POINTER = 'CURRENT'
+MANIFEST_FILENAME = 'manifest.json'
+FEATURE_NAMES_FILENAME = 'feature_names.txt'
+METRICS_FILENAME = 'model_metrics.json'
+UNVERSIONED = 'unversioned'
+
+PREDICTION_HORIZONS = list(range(1, 13))
+MULTI_OUTPUT_MODEL_NAME = 'aqi_rf_model_multi'
+
+MODEL_RELOAD_POLL_SECONDS = float(os.getenv('MODEL_RELOAD_POLL_SECONDS', 30))
+
+_SKLEARN_TREE_ARRAYS = ('children_left', 'children_right', 'feature', 'threshold', 'value',
+                        'impurity', 'n_node_samples', 'weighted_n_node_samples')
+
+
+# ============================================================================
+# VERSIONS & POINTER
+# ============================================================================
+
+def read_current(models_dir: str) -> Optional[str]:
+    path = os.path.join(models_dir, CURRENT_POINTER)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return f.read().strip() or None
+
+
+def list_versions(models_dir: str) -> List[str]:
+    """Versions with a manifest, oldest first"""
+    if not os.path.isdir(models_dir):
+        return []
+    return sorted(
+        name for name in os.listdir(models_dir)
+        if os.path.exists(os.path.join(models_dir, name, MANIFEST_FILENAME))
+    )
+
+
+def write_manifest(version_dir: str, version: str, extra: Optional[Dict] = None) -> Dict:
+    """Describe a finished version directory in manifest.json"""
+    files = []
+    for root, _, names in os.walk(version_dir):
+        for name in sorted(names):
+            if name == MANIFEST_FILENAME:
+                continue
+            path = os.path.join(root, name)
+            files.append({'path': os.path.relpath(path, version_dir), 'bytes': os.path.getsize(path)})
+
+    manifest = {
+        'version': version,
+        'created_at': datetime.now().isoformat(),
+        'multi_output': os.path.exists(os.path.join(version_dir, f'{MULTI_OUTPUT_MODEL_NAME}.pkl'))
+                        or flat_model_exists(version_dir, MULTI_OUTPUT_MODEL_NAME),
+        'horizons': [h for h in PREDICTION_HORIZONS
+                     if os.path.exists(os.path.join(version_dir, f'aqi_rf_model_{h}h.pkl'))
+                     or flat_model_exists(version_dir, f'aqi_rf_model_{h}h')],
+        'files': files,
+        'total_bytes': sum(f['bytes'] for f in files)
+    }
+
+    feature_names_path = os.path.join(version_dir, FEATURE_NAMES_FILENAME)
+    if os.path.exists(feature_names_path):
+        with open(feature_names_path, 'r') as f:
+            manifest['features'] = sum(1 for line in f if line.strip())
+
+    metrics_path = os.path.join(version_dir, METRICS_FILENAME)
+    if os.path.exists(metrics_path):
+        with open(metrics_path, 'r') as f:
+            metrics = json.load(f)
+        manifest['mean_test_mae'] = float(np.mean([m['test_mae'] for m in metrics])) if metrics else None
+    if extra:
+        manifest.update(extra)
+
+    tmp_path = os.path.join(version_dir, MANIFEST_FILENAME + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(version_dir, MANIFEST_FILENAME))
+    return manifest
+
+
+def require_manifest(models_dir: str, version: str):
+    if not os.path.exists(os.path.join(models_dir, version, MANIFEST_FILENAME)):
+        raise FileNotFoundError(f"{version} has no {MANIFEST_FILENAME} in {models_dir}")
+
+
+def set_current(models_dir: str, version: str):
+    """Point CURRENT at a version; the rename makes the switch atomic for readers"""
+    require_manifest(models_dir, version)
+    tmp_path = os.path.join(models_dir, CURRENT_POINTER + '.tmp')
+    with open(tmp_path, 'w') as f:
+        f.write(version + '\n')
+    os.replace(tmp_path, os.path.join(models_dir, CURRENT_POINTER))
+
+
+# ============================================================================
+# LOADED MODEL SET
+# ============================================================================
+
+def _model_bytes(model) -> int:
+    """Bytes of the arrays behind a flat or sklearn forest"""
+    if isinstance(model, FlatForest):
+        return int(sum(getattr(model, name).nbytes for name in FLAT_ARRAYS))
+    return int(sum(getattr(est.tree_, name).nbytes
+                   for est in getattr(model, 'estimators_', []) for name in _SKLEARN_TREE_ARRAYS))
+
+
+def _as_model_input(model, X):
+    """sklearn models fitted on a DataFrame expect named columns; flat forests take arrays"""
+    if isinstance(X, np.ndarray) and getattr(model, 'feature_names_in_', None) is not None:
+        return pd.DataFrame(X, columns=model.feature_names_in_)
+    return X
+
+
+class ModelSet:
+    """One loaded version: the multi-output forest or per-horizon forests, plus feature names"""
+
+    def __init__(self, version: str, models_dir: str, multi_output, horizon_models: Dict,
+                 feature_names: List[str], load_seconds: float, rss_delta_mb: Optional[float]):
+        self.version = version
+        self.models_dir = models_dir
+        self.multi_output = multi_output
+        self.horizon_models = horizon_models
+        self.feature_names = feature_names
+        self.loaded_at = datetime.now().isoformat()
+        self.load_seconds = load_seconds
+        self.rss_delta_mb = rss_delta_mb
+
+    def predict_all_horizons(self, X) -> np.ndarray:
+        """
+        Predict every horizon (1h..12h) for each row of X in one pass.
+
+        Returns an array of shape (n_rows, 12); column i is the forecast for
+        i+1 hours ahead. Horizons without a trained model are NaN. Works with
+        both flat-array forests and sklearn models.
+        """
+        if self.multi_output is not None:
+            model_input = _as_model_input(self.multi_output, X)
+            return np.asarray(self.multi_output.predict(model_input), dtype=float).reshape(len(X), -1)
+
+        predictions = np.full((len(X), len(PREDICTION_HORIZONS)), np.nan)
+        for idx, hours_ahead in enumerate(PREDICTION_HORIZONS):
+            if hours_ahead in self.horizon_models:
+                model = self.horizon_models[hours_ahead]
+                predictions[:, idx] = model.predict(_as_model_input(model, X))
+        return predictions
+
+    def models(self) -> List:
+        return [self.multi_output] if self.multi_output is not None else list(self.horizon_models.values())
+
+    def validate(self):
+        """
+        Raise ValueError unless every model takes feature_names in order and
+        one all-zero row predicts finite values for the trained horizons.
+        """
+        for model in self.models():
+            if model.n_features_in_ != len(self.feature_names):
+                raise ValueError(f"{self.version}: a model expects {model.n_features_in_} features, "
+                                 f"{FEATURE_NAMES_FILENAME} lists {len(self.feature_names)}")
+            names = getattr(model, 'feature_names_in_', None)
+            if names is not None and list(names) != self.feature_names:
+                raise ValueError(f"{self.version}: model feature order differs from {FEATURE_NAMES_FILENAME}")
+
+        predictions = self.predict_all_horizons(np.zeros((1, len(self.feature_names))))
+        trained = [idx for idx, hours_ahead in enumerate(PREDICTION_HORIZONS)
+                   if self.multi_output is not None or hours_ahead in self.horizon_models]
+        if predictions.shape != (1, len(PREDICTION_HORIZONS)) or not np.isfinite(predictions[0, trained]).all():
+            raise ValueError(f"{self.version}: test prediction returned {predictions.shape} / non-finite values")
+
+    def pickled_models(self) -> int:
+        """Models loaded from sklearn pickles (private to this process) instead of flat exports"""
+        return sum(not isinstance(m, FlatForest) for m in self.models())
+
+    def storage_report(self) -> str:
+        """One line for the startup report: where the weights live and whether workers share them"""
+        models = self.models()
+        pickled = self.pickled_models()
+        if pickled:
+            return (f"{pickled}/{len(models)} model(s) of version {self.version} loaded from pickles "
+                    f"into private memory, not shared between workers "
+                    f"(export flat models: python -m app.tree_inference <models dir>)")
+        if all(isinstance(getattr(m, FLAT_ARRAYS[0]), np.memmap) for m in models):
+            return f"version {self.version}: flat arrays, memory-mapped (shared through the page cache)"
+        return f"version {self.version}: flat arrays in private memory (MODEL_MMAP_MODE is off)"
+
+    def status(self) -> Dict:
+        models = self.models()
+        return {
+            'version': self.version,
+            'models_dir': self.models_dir,
+            'kind': 'multi_output' if self.multi_output is not None else 'per_horizon',
+            'models_loaded': len(models),
+            'flat': all(isinstance(m, FlatForest) for m in models),
+            'pickled_models': self.pickled_models(),
+            'features': len(self.feature_names),
+            'loaded_at': self.loaded_at,
+            'load_seconds': round(self.load_seconds, 3),
+            'model_bytes': sum(_model_bytes(m) for m in models),
+            'rss_delta_mb': self.rss_delta_mb
+        }
+
+
+def load_model_set(models_dir: str, version: Optional[str] = None, use_flat: bool = True,
+                   use_multi_output: bool = True, mmap_mode: Optional[str] = 'r') -> ModelSet:
+    """
+    Load a version (or the unversioned models in models_dir). Flat exports
+    are preferred and memory-mapped (mmap_mode), so forked workers share
+    one copy of those arrays through the page cache. Pickled sklearn forests
+    are not shared: Tree.__setstate__ copies the node arrays into private
+    memory, so each process that loads them holds its own copy. An export
+    made from an older version of its pickle is skipped in favour of the
+    pickle (see tree_inference.flat_model_is_current).
+    """
+    start = time.perf_counter()
+    rss_before = process_memory().get('rss_mb')
+    version_dir = os.path.join(models_dir, version) if version else models_dir
+
+    def load(model_name):
+        if use_flat and flat_model_exists(version_dir, model_name):
+            if flat_model_is_current(version_dir, model_name):
+                return FlatForest.load(flat_model_path(version_dir, model_name), mmap_mode=mmap_mode)
+            logger.warning(f"  ⚠️  Flat export of {model_name} does not match its pickle; loading the pickle "
+                           f"(re-export: python -m app.tree_inference {version_dir})")
+        model_path = os.path.join(version_dir, f'{model_name}.pkl')
+        if os.path.exists(model_path):
+            # No mmap_mode: the trees would copy the mapped arrays anyway
+            return joblib.load(model_path)
+        return None
+
+    multi_output, horizon_models = None, {}
+    if use_multi_output:
+        # One forest predicts every horizon - no need for the 12 separate pickles
+        multi_output = load(MULTI_OUTPUT_MODEL_NAME)
+    if multi_output is None:
+        for hours_ahead in PREDICTION_HORIZONS:
+            model = load(f'aqi_rf_model_{hours_ahead}h')
+            if model is not None:
+                horizon_models[hours_ahead] = model
+            else:
+                logger.warning(f"  ⚠️  Model not found: aqi_rf_model_{hours_ahead}h ({version or UNVERSIONED})")
+    if multi_output is None and not horizon_models:
+        raise FileNotFoundError(f"No forecast models in {version_dir}")
+
+    feature_names_path = os.path.join(version_dir, FEATURE_NAMES_FILENAME)
+    if not os.path.exists(feature_names_path):
+        logger.error(f"Feature names file not found: {feature_names_path}")
+        raise FileNotFoundError("Feature names file missing")
+    with open(feature_names_path, 'r') as f:
+        feature_names = [line.strip() for line in f]
+
+    rss_after = process_memory().get('rss_mb')
+    model_set = ModelSet(
+        version or UNVERSIONED, version_dir, multi_output, horizon_models, feature_names,
+        load_seconds=time.perf_counter() - start,
+        rss_delta_mb=round(rss_after - rss_before, 1) if rss_before is not None and rss_after is not None else None
+    )
+    kind = 'multi-output model' if multi_output is not None else f'{len(horizon_models)} horizon models'
+    logger.info(f"✅ Loaded {kind} version {model_set.version} "
+                f"({len(feature_names)} features, {model_set.load_seconds:.2f}s)")
+    if model_set.pickled_models():
+        logger.warning(f"  ⚠️  {model_set.storage_report()}")
+    return model_set
+
+
+# ============================================================================
+# PER-PROCESS REGISTRY
+# ============================================================================
+
+class ModelRegistry:
+    """Holds the active ModelSet and swaps in new versions from a background thread"""
+
+    def __init__(self, models_dir: str, loader: Callable[[Optional[str]], ModelSet],
+                 poll_seconds: float = MODEL_RELOAD_POLL_SECONDS,
+                 on_swap: Optional[Callable[[ModelSet], None]] = None):
+        self.models_dir = models_dir
+        self.loader = loader
+        self.on_swap = on_swap
+        self.poll_seconds = poll_seconds
+        self._active: Optional[ModelSet] = None
+        self._load_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last_error: Optional[str] = None
+        self.swaps = 0
+
+    @property
+    def active(self) -> Optional[ModelSet]:
+        """The loaded set, or None before the first load (never triggers one)"""
+        return self._active
+
+    def get(self) -> ModelSet:
+        """The active set, loading the current version on first use"""
+        model_set = self._active
+        if model_set is None:
+            with self._load_lock:
+                if self._active is None:
+                    self._active = self.loader(read_current(self.models_dir))
+                model_set = self._active
+        return model_set
+
+    def reload(self, force: bool = False) -> bool:
+        """Load the version CURRENT names (if it differs) and swap it in; True if swapped"""
+        with self._load_lock:
+            version = read_current(self.models_dir)
+            active = self._active
+            if not force and active is not None and active.version == (version or UNVERSIONED):
+                return False
+            try:
+                model_set = self.loader(version)
+                model_set.validate()
+            except Exception as e:
+                # Keep serving the old version
+                self.last_error = f"{version}: {e}"
+                logger.error(f"❌ Model reload failed for {version}: {e}")
+                return False
+            self._swap_in(model_set)
+
+        self._announce(model_set, active)
+        return True
+
+    def activate(self, version: str) -> ModelSet:
+        """
+        Load and validate `version` in this worker, then publish it as
+        CURRENT and swap it in. CURRENT is written only after the load
+        succeeds, so a version that fails never reaches the other workers
+        (or a restarted one). Raises on failure; the old set keeps serving.
+        """
+        require_manifest(self.models_dir, version)
+        with self._load_lock:
+            active = self._active
+            try:
+                model_set = self.loader(version)
+                model_set.validate()
+            except Exception as e:
+                self.last_error = f"{version}: {e}"
+                logger.error(f"❌ Model activation failed for {version}: {e}")
+                raise
+            set_current(self.models_dir, version)
+            self._swap_in(model_set)
+
+        self._announce(model_set, active)
+        return model_set
+
+    def _swap_in(self, model_set: ModelSet):
+        # A single reference assignment; in-flight requests keep the set they hold
+        self._active = model_set
+        self.last_error = None
+        self.swaps += 1
+
+    def _announce(self, model_set: ModelSet, previous: Optional[ModelSet]):
+        logger.info(f"🔁 Serving model version {model_set.version}"
+                    + (f" (was {previous.version})" if previous is not None else ""))
+        if self.on_swap is not None:
+            self.on_swap(model_set)
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                self.reload()
+            except Exception as e:
+                logger.error(f"❌ Model watcher error: {e}")
+
+    def start(self):
+        """Start the CURRENT watcher thread (once per worker process)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name='model-registry', daemon=True)
+        self._thread.start()
+        logger.info(f"👀 Watching {os.path.join(self.models_dir, CURRENT_POINTER)} every {self.poll_seconds:.0f}s")
+
+    def stop(self):
+        self._stop.set()
+
+    def status(self) -> Dict:
+        active = self._active
+        return {
+            'active': active.status() if active is not None else None,
+            'current_pointer': read_current(self.models_dir),
+            'available_versions': list_versions(self.models_dir),
+            'swaps': self.swaps,
+            'last_error': self.last_error,
+            'watching': self._thread is not None and self._thread.is_alive(),
+            'process_memory': process_memory()
+        }
+
+
+if __name__ == '__main__':
+    default_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models')
+
+    parser = argparse.ArgumentParser(description='Manage versioned forecast models')
+    parser.add_argument('--models-dir', default=default_dir, help='Models directory (default: %(default)s)')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('list', help='List versions and the current pointer')
+    publish = sub.add_parser('publish', help='Write the manifest if missing and make a version current')
+    publish.add_argument('version')
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        current = read_current(args.models_dir)
+        for version in list_versions(args.models_dir):
+            print(f"{'*' if version == current else ' '} {version}")
+        if current is None:
+            print(f"(no {CURRENT_POINTER} pointer - serving the unversioned models)")
+    else:
+        version_dir = os.path.join(args.models_dir, args.version)
+        if not os.path.exists(os.path.join(version_dir, MANIFEST_FILENAME)):
+            write_manifest(version_dir, args.version)
+        # Refuse to point the workers at a version that does not load
+        load_model_set(args.models_dir, args.version).validate()
+        set_current(args.models_dir, args.version)
+        print(f"✓ {CURRENT_POINTER} -> {args.version}; workers pick it up within {MODEL_RELOAD_POLL_SECONDS:.0f}s")
@@ -0,0 +1,308 @@
+"""
+Forecaster Hyperparameter Search
+================================
+Successive-halving search over Random Forest configurations, scored with
+rolling-origin (expanding window) time-series folds instead of one
+shuffle=False split.
+
+Each candidate is a multi-output forest over all 12 horizons (the model
+serving prefers). For every candidate the search records:
+  * validation MAE (mean over folds and horizons)
+  * single-row inference latency p50/p99 of the exported flat forest,
+    which is what serving evaluates per request
+  * model size (flat arrays in memory, and the pickle)
+
+Rung r trains each fold on the most recent eta^-(R-r) share of its
+training window; after every rung only the best 1/eta of the candidates
+(ranked by MAE among those within the latency budget) move on. All
+(candidate, fold) fits of a rung run in a process pool over the shared
+memory-mapped feature matrix used by train_parallel.py.
+
+Usage (from the app/ directory, like train_model.py):
+    python model_search.py --folds 4 --eta 3 --p99-budget-ms 5 --processes 4
+
+Writes models/model_search.json with every rung, the Pareto front
+(MAE vs p99 latency vs size) and the recommended configuration.
+"""
+
+import argparse
+import io
+import itertools
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+
+from feature_store import load_training_frame
+from train_model import (
+    DATA_FILE, FEATURE_STORE_DIR, MAX_DEPTH, MAX_FEATURES, MAX_LEAF_NODES, MIN_IMPURITY_DECREASE,
+    MIN_SAMPLES_LEAF, MIN_SAMPLES_SPLIT, MODELS_DIR, N_ESTIMATORS, PREDICTION_HORIZONS, RANDOM_STATE,
+    get_feature_columns, prepare_multi_horizon_data
+)
+from train_parallel import DEFAULT_PROCESSES, write_shared_matrix
+from tree_inference import FLAT_ARRAYS, FlatForest
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+SEARCH_SPACE = {
+    'n_estimators': [50, 100, N_ESTIMATORS],
+    'max_leaf_nodes': [50, MAX_LEAF_NODES, 400],
+    'max_features': [0.5, MAX_FEATURES],
+    'max_depth': [12, MAX_DEPTH]
+}
+
+DEFAULT_FOLDS = 4
+DEFAULT_ETA = 3
+LATENCY_ROWS = 300              # single-row predictions timed per fit
+SEARCH_SHARED_DIR = os.path.join(MODELS_DIR, '_search')
+REPORT_FILENAME = 'model_search.json'
+
+
+# ============================================================================
+# FOLDS & CANDIDATES
+# ============================================================================
+
+def rolling_origin_folds(n_rows: int, n_folds: int, gap: int = max(PREDICTION_HORIZONS)) -> List[Dict]:
+    """
+    Expanding-window folds: fold k trains on rows [0, train_end) and validates
+    on the next block. `gap` rows are skipped between the two so training
+    targets (up to 12h ahead) never overlap the validation window.
+    """
+    block = n_rows // (n_folds + 1)
+    folds = []
+    for k in range(n_folds):
+        train_end = block * (k + 1)
+        val_start = train_end + gap
+        val_end = min(val_start + block, n_rows)
+        if val_end > val_start:
+            folds.append({'fold': k, 'train_end': train_end, 'val_start': val_start, 'val_end': val_end})
+    return folds
+
+
+def candidate_grid(space: Dict[str, list] = SEARCH_SPACE) -> List[Dict]:
+    names = sorted(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[n] for n in names))]
+
+
+def candidate_id(params: Dict) -> str:
+    return ','.join(f"{k}={params[k]}" for k in sorted(params))
+
+
+def build_candidate_forest(params: Dict, n_jobs: int = 1) -> RandomForestRegressor:
+    """build_random_forest with the searched parameters overridden"""
+    config = {
+        'n_estimators': N_ESTIMATORS,
+        'max_depth': MAX_DEPTH,
+        'min_samples_split': MIN_SAMPLES_SPLIT,
+        'min_samples_leaf': MIN_SAMPLES_LEAF,
+        'max_features': MAX_FEATURES,
+        'max_leaf_nodes': MAX_LEAF_NODES,
+        'min_impurity_decrease': MIN_IMPURITY_DECREASE
+    }
+    config.update(params)
+    return RandomForestRegressor(random_state=RANDOM_STATE, n_jobs=n_jobs, verbose=0, **config)
+
+
+# ============================================================================
+# WORKER
+# ============================================================================
+
+def _evaluate_worker(params, fold, sample_fraction, X_path, Y_path, tree_jobs):
+    """Process-pool task: fit one candidate on one fold, measure MAE, latency, size"""
+    X = np.load(X_path, mmap_mode='r')
+    Y = np.load(Y_path, mmap_mode='r')
+
+    # Most recent share of the training window (the halving resource)
+    train_start = int(fold['train_end'] * (1 - sample_fraction))
+    X_train, Y_train = X[train_start:fold['train_end']], Y[train_start:fold['train_end']]
+    X_val, Y_val = X[fold['val_start']:fold['val_end']], Y[fold['val_start']:fold['val_end']]
+
+    start = time.perf_counter()
+    model = build_candidate_forest(params, tree_jobs)
+    model.fit(X_train, Y_train)
+    fit_seconds = time.perf_counter() - start
+
+    mae = float(np.mean(np.abs(model.predict(X_val) - Y_val)))
+
+    flat = FlatForest.from_sklearn(model)
+    rows = np.asarray(X_val[:LATENCY_ROWS], dtype=np.float32)
+    timings = []
+    for row in rows:
+        t0 = time.perf_counter()
+        flat.predict(row)
+        timings.append((time.perf_counter() - t0) * 1000)
+
+    pickle_buffer = io.BytesIO()
+    joblib.dump(model, pickle_buffer)
+
+    return {
+        'fold': fold['fold'],
+        'mae': mae,
+        'fit_seconds': fit_seconds,
+        'latency_ms': timings,
+        'flat_bytes': int(sum(getattr(flat, name).nbytes for name in FLAT_ARRAYS)),
+        'pickle_bytes': pickle_buffer.getbuffer().nbytes,
+        'n_nodes': int(len(flat.feature))
+    }
+
+
+# ============================================================================
+# SEARCH
+# ============================================================================
+
+def pareto_front(candidates: List[Dict]) -> List[str]:
+    """Ids of candidates no other candidate beats on MAE, p99 latency and size at once"""
+    objectives = [(c['mae_mean'], c['latency_p99_ms'], c['flat_bytes']) for c in candidates]
+    front = []
+    for i, a in enumerate(objectives):
+        dominated = any(
+            all(b_k <= a_k for a_k, b_k in zip(a, b)) and any(b_k < a_k for a_k, b_k in zip(a, b))
+            for j, b in enumerate(objectives) if j != i
+        )
+        if not dominated:
+            front.append(candidates[i]['id'])
+    return front
+
+
+def _summarize(params: Dict, results: List[Dict], p99_budget_ms: Optional[float]) -> Dict:
+    timings = np.concatenate([r['latency_ms'] for r in results])
+    summary = {
+        'id': candidate_id(params),
+        'params': params,
+        'mae_mean': float(np.mean([r['mae'] for r in results])),
+        'mae_per_fold': [round(r['mae'], 3) for r in sorted(results, key=lambda r: r['fold'])],
+        'latency_p50_ms': float(np.percentile(timings, 50)),
+        'latency_p99_ms': float(np.percentile(timings, 99)),
+        'flat_bytes': max(r['flat_bytes'] for r in results),
+        'pickle_bytes': max(r['pickle_bytes'] for r in results),
+        'n_nodes': max(r['n_nodes'] for r in results),
+        'fit_seconds': float(sum(r['fit_seconds'] for r in results))
+    }
+    summary['meets_budget'] = p99_budget_ms is None or summary['latency_p99_ms'] <= p99_budget_ms
+    return summary
+
+
+def successive_halving(df: pd.DataFrame, candidates: List[Dict], n_folds: int = DEFAULT_FOLDS,
+                       eta: int = DEFAULT_ETA, p99_budget_ms: Optional[float] = None,
+                       processes: int = DEFAULT_PROCESSES, tree_jobs: int = 1) -> Dict:
+    """Run the search and return the report (also written to models/model_search.json)"""
+    feature_cols = get_feature_columns(df)
+    folds = rolling_origin_folds(len(df), n_folds)
+    # Enough rungs for the field to shrink to one finalist
+    n_rungs = int(np.log(len(candidates)) / np.log(eta) + 1e-9) + 1
+
+    print("\n" + "=" * 70)
+    print(f"MODEL SEARCH: {len(candidates)} candidates, {len(folds)} folds, {n_rungs} rungs (eta={eta})")
+    print("=" * 70)
+
+    X_path, Y_path = write_shared_matrix(df, feature_cols, SEARCH_SHARED_DIR)
+    rungs = []
+    survivors = candidates
+    try:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            for rung in range(n_rungs):
+                sample_fraction = float(eta ** (rung - n_rungs + 1))
+                start = time.perf_counter()
+
+                futures = {
+                    (candidate_id(params), fold['fold']): pool.submit(
+                        _evaluate_worker, params, fold, sample_fraction, X_path, Y_path, tree_jobs)
+                    for params in survivors for fold in folds
+                }
+                summaries = [
+                    _summarize(params, [futures[(candidate_id(params), f['fold'])].result() for f in folds], p99_budget_ms)
+                    for params in survivors
+                ]
+                summaries.sort(key=lambda s: (not s['meets_budget'], s['mae_mean']))
+
+                rungs.append({
+                    'rung': rung,
+                    'sample_fraction': sample_fraction,
+                    'seconds': round(time.perf_counter() - start, 2),
+                    'candidates': summaries,
+                    'pareto_front': pareto_front(summaries)
+                })
+                print(f"\nRung {rung}: {len(summaries)} candidates on {sample_fraction:.0%} of each training window "
+                      f"({rungs[-1]['seconds']:.1f}s)")
+                for s in summaries[:5]:
+                    print(f"  MAE {s['mae_mean']:7.2f}  p99 {s['latency_p99_ms']:6.2f} ms  "
+                          f"{s['flat_bytes'] / 1e6:6.1f} MB  {'' if s['meets_budget'] else '(over budget) '}{s['id']}")
+
+                keep = max(1, len(summaries) // eta)
+                survivors = [s['params'] for s in summaries[:keep]]
+    finally:
+        shutil.rmtree(SEARCH_SHARED_DIR, ignore_errors=True)
+
+    final = rungs[-1]['candidates']
+    within_budget = [s for s in final if s['meets_budget']]
+    recommended = (within_budget or final)[0]
+
+    report = {
+        'created_at': pd.Timestamp.now().isoformat(),
+        'samples': len(df),
+        'features': len(feature_cols),
+        'folds': folds,
+        'eta': eta,
+        'p99_budget_ms': p99_budget_ms,
+        'search_space': sorted({k for c in candidates for k in c}),
+        'rungs': rungs,
+        'recommended': recommended
+    }
+
+    report_path = os.path.join(MODELS_DIR, REPORT_FILENAME)
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print("\n" + "=" * 70)
+    print("SEARCH COMPLETE")
+    print("=" * 70)
+    print(f"  Recommended: {recommended['id']}")
+    print(f"  MAE {recommended['mae_mean']:.2f}, p99 {recommended['latency_p99_ms']:.2f} ms, "
+          f"{recommended['flat_bytes'] / 1e6:.1f} MB flat")
+    if not within_budget and p99_budget_ms is not None:
+        print(f"  ⚠️  No finalist met the {p99_budget_ms} ms p99 budget")
+    print(f"  Pareto front (last rung): {len(rungs[-1]['pareto_front'])} candidates")
+    print(f"✓ Saved report to {report_path}")
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Rolling-origin successive-halving search for the forecaster')
+    parser.add_argument('--data', default=DATA_FILE, help='Training CSV (default: %(default)s)')
+    parser.add_argument('--feature-store', default=FEATURE_STORE_DIR,
+                        help='Load features from this columnar store instead of recomputing them')
+    parser.add_argument('--space', help='JSON file mapping parameter -> list of values (default: built-in grid)')
+    parser.add_argument('--folds', type=int, default=DEFAULT_FOLDS, help='Rolling-origin folds (default: %(default)s)')
+    parser.add_argument('--eta', type=int, default=DEFAULT_ETA, help='Halving rate (default: %(default)s)')
+    parser.add_argument('--p99-budget-ms', type=float, default=None, help='Single-row p99 latency budget')
+    parser.add_argument('--processes', type=int, default=DEFAULT_PROCESSES,
+                        help='Fits run at the same time (default: %(default)s)')
+    parser.add_argument('--tree-jobs', type=int, default=1, help='n_jobs inside each forest (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    if args.feature_store:
+        df = load_training_frame(args.data, args.feature_store)
+    else:
+        print(f"\nLoading data from {args.data}...")
+        df = prepare_multi_horizon_data(pd.read_csv(args.data))
+
+    space = SEARCH_SPACE
+    if args.space:
+        with open(args.space, 'r') as f:
+            space = json.load(f)
+
+    return successive_halving(df, candidate_grid(space), args.folds, args.eta,
+                              args.p99_budget_ms, args.processes, args.tree_jobs)
+
+
+if __name__ == '__main__':
+    main()
@@ -69,87 +69,8 @@ def load_model_to_memory():
 # INDIAN AQI CALCULATION
 # ============================================================================
 
-def convert_to_indian_aqi(pollutant_values: Dict[str, float]) -> Dict:
-    """Convert pollutant concentrations to Indian CPCB AQI"""
-    
-    indian_breakpoints = {
-        'pm25': [(0, 30, 0, 50), (31, 60, 51, 100), (61, 90, 101, 200),
-                 (91, 120, 201, 300), (121, 250, 301, 400), (251, 380, 401, 500)],
-        'pm10': [(0, 50, 0, 50), (51, 100, 51, 100), (101, 250, 101, 200),
-                 (251, 350, 201, 300), (351, 430, 301, 400), (431, 550, 401, 500)],
-        'no2': [(0, 40, 0, 50), (41, 80, 51, 100), (81, 180, 101, 200),
-                (181, 280, 201, 300), (281, 400, 301, 400), (401, 550, 401, 500)],
-        'so2': [(0, 40, 0, 50), (41, 80, 51, 100), (81, 380, 101, 200),
-                (381, 800, 201, 300), (801, 1600, 301, 400), (1601, 2100, 401, 500)],
-        'co': [(0, 1.0, 0, 50), (1.1, 2.0, 51, 100), (2.1, 10, 101, 200),
-               (10.1, 17, 201, 300), (17.1, 34, 301, 400), (34.1, 46, 401, 500)],
-        'o3': [(0, 50, 0, 50), (51, 100, 51, 100), (101, 168, 101, 200),
-               (169, 208, 201, 300), (209, 748, 301, 400), (749, 1000, 401, 500)]
-    }
-    
-    def calculate_sub_index(pollutant: str, concentration: float) -> Optional[int]:
-        if pollutant not in indian_breakpoints or concentration is None:
-            return None
-        
-        breakpoints = indian_breakpoints[pollutant]
-        for bp_lo, bp_hi, aqi_lo, aqi_hi in breakpoints:
-            if bp_lo <= concentration <= bp_hi:
-                if (bp_hi - bp_lo) == 0:
-                    return aqi_lo
-                aqi = ((aqi_hi - aqi_lo) / (bp_hi - bp_lo)) * (concentration - bp_lo) + aqi_lo
-                return round(aqi)
-        
-        if concentration > breakpoints[-1][1]:
-            return 500
-        elif concentration < breakpoints[0][0]:
-            return 0
-        return None
-    
-    sub_indices = {}
-    
-    for pollutant in ['pm25', 'pm10', 'no2', 'so2']:
-        if pollutant in pollutant_values and pollutant_values[pollutant] is not None:
-            sub_indices[pollutant] = calculate_sub_index(pollutant, pollutant_values[pollutant])
-    
-    # CO: Convert from µg/m³ to mg/m³
-    if 'co' in pollutant_values and pollutant_values['co'] is not None:
-        co_value = pollutant_values['co'] / 1000.0
-        sub_indices['co'] = calculate_sub_index('co', co_value)
-    
-    if 'o3' in pollutant_values and pollutant_values['o3'] is not None:
-        sub_indices['o3'] = calculate_sub_index('o3', pollutant_values['o3'])
-    
-    sub_indices = {k: v for k, v in sub_indices.items() if v is not None}
-    
-    if not sub_indices:
-        return {'aqi': None, 'dominant_pollutant': None, 'sub_indices': {}}
-    
-    dominant_pollutant = max(sub_indices, key=sub_indices.get)
-    overall_aqi = sub_indices[dominant_pollutant]
-    
-    return {
-        'aqi': overall_aqi,
-        'dominant_pollutant': dominant_pollutant,
-        'sub_indices': sub_indices
-    }
-
-
-def get_aqi_category(aqi: float) -> str:
-    """Get AQI category based on Indian standards"""
-    if aqi is None:
-        return "Unknown"
-    if aqi <= 50:
-        return "Good"
-    elif aqi <= 100:
-        return "Satisfactory"
-    elif aqi <= 200:
-        return "Moderate"
-    elif aqi <= 300:
-        return "Poor"
-    elif aqi <= 400:
-        return "Very Poor"
-    else:
-        return "Severe"
+# Breakpoint tables and category scale live in the shared engine
+from app.aqi_engine import convert_to_indian_aqi, indian_aqi_category as get_aqi_category
 
 
 # ============================================================================
@@ -0,0 +1,310 @@
+"""
+Incremental Model Retraining
+============================
+Nightly job that teaches the forecasters the hours serving has stored in
+aqi_hourly_data since the last model version.
+
+  1. Read rows newer than the feature store's last hour for one location
+     and append the contiguous run to the columnar feature store.
+  2. Warm-start the current version's forests: keep their trees and grow
+     TREES_PER_RETRAIN new ones fitted only on rows after the version's
+     `trained_through` hour (at least MIN_WINDOW_ROWS). The oldest trees
+     are dropped beyond MAX_TREES, so the forest tracks recent data and
+     its size stays bounded.
+  3. Write a new versioned directory models/<version>/ with the pickles,
+     flat exports, feature_names.txt, model_metrics.json, retrain.json and
+     the registry manifest; --publish also points models/CURRENT at it.
+
+Each run fits on the new rows only, so its cost follows the amount of new
+data, not the total history. Without a previous version (or with --full)
+the forests are trained from scratch on the whole store.
+
+Usage (from the app/ directory, like train_model.py):
+    python retrain_models.py --lat 28.6139 --lon 77.2090
+"""
+
+import argparse
+import json
+import os
+import shutil
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+
+from feature_store import DEFAULT_STORE_DIR, FeatureStore, RAW_COLUMNS
+from train_model import (
+    FEATURE_STORE_DIR, MODELS_DIR, MULTI_OUTPUT_MODEL_FILENAME, PREDICTION_HORIZONS, TEST_SIZE,
+    build_random_forest, get_feature_columns
+)
+from tree_inference import export_models_dir
+from model_registry import read_current, set_current, write_manifest
+
+try:
+    from app.db import get_db_connection
+except ImportError:  # run from app/ alongside train_model.py
+    from db import get_db_connection
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+TREES_PER_RETRAIN = int(os.getenv('RETRAIN_TREES', 50))
+MAX_TREES = int(os.getenv('RETRAIN_MAX_TREES', 400))
+MIN_WINDOW_ROWS = int(os.getenv('RETRAIN_MIN_WINDOW_ROWS', 24 * 14))
+VALIDATION_ROWS = int(os.getenv('RETRAIN_VALIDATION_ROWS', 48))
+
+COORDINATE_TOLERANCE = 0.01         # degrees; matches the stored rounding
+MAX_FILL_HOURS = 3                  # interpolate gaps up to this long
+
+RETRAIN_INFO_FILENAME = 'retrain.json'
+METRICS_FILENAME = 'model_metrics.json'
+FEATURE_NAMES_FILENAME = 'feature_names.txt'
+
+
+# ============================================================================
+# VERSIONS
+# ============================================================================
+
+def list_versions(models_dir: str = MODELS_DIR) -> List[str]:
+    """Version directories (models/<version>/ with a retrain.json), oldest first"""
+    if not os.path.isdir(models_dir):
+        return []
+    return sorted(
+        name for name in os.listdir(models_dir)
+        if os.path.exists(os.path.join(models_dir, name, RETRAIN_INFO_FILENAME))
+    )
+
+
+def new_version_name() -> str:
+    return datetime.now().strftime('v%Y%m%d-%H%M%S')
+
+
+def read_retrain_info(version_dir: str) -> Dict:
+    with open(os.path.join(version_dir, RETRAIN_INFO_FILENAME), 'r') as f:
+        return json.load(f)
+
+
+# ============================================================================
+# NEW DATA
+# ============================================================================
+
+def fetch_new_history(latitude: float, longitude: float, since: datetime) -> pd.DataFrame:
+    """aqi_hourly_data rows after `since` for one location, in the feature store's raw layout"""
+    connection = get_db_connection()
+    if not connection:
+        raise RuntimeError("Database connection failed")
+    try:
+        cursor = connection.cursor()
+        cursor.execute("""
+            SELECT DISTINCT ON (hour_timestamp)
+                   hour_timestamp, pm2_5, pm10, no2, so2, co, o3, indian_aqi
+            FROM aqi_hourly_data
+            WHERE ABS(latitude - %s) < %s
+              AND ABS(longitude - %s) < %s
+              AND hour_timestamp > %s
+              AND indian_aqi IS NOT NULL
+            ORDER BY hour_timestamp, unix_timestamp DESC
+        """, (latitude, COORDINATE_TOLERANCE, longitude, COORDINATE_TOLERANCE, since))
+        rows = cursor.fetchall()
+        cursor.close()
+    finally:
+        connection.close()
+
+    # SELECT order matches RAW_COLUMNS (feature_engine.POLLUTANTS + indian_aqi)
+    df = pd.DataFrame(rows, columns=['datetime'] + RAW_COLUMNS)
+    df['datetime'] = pd.to_datetime(df['datetime'])
+    return df.astype({c: float for c in RAW_COLUMNS})
+
+
+def contiguous_hours(new_rows: pd.DataFrame, last_stored: pd.Timestamp) -> pd.DataFrame:
+    """
+    New rows on an unbroken hourly grid right after the stored history.
+    Short gaps are interpolated; the run stops at the first longer gap,
+    since lag features assume one row per hour.
+    """
+    if new_rows.empty:
+        return new_rows
+
+    grid = pd.date_range(last_stored + pd.Timedelta(hours=1), new_rows['datetime'].max(), freq='h')
+    df = new_rows.set_index('datetime').reindex(grid)
+    df = df.interpolate(limit=MAX_FILL_HOURS, limit_area='inside')
+
+    missing = df.isna().any(axis=1).to_numpy()
+    if missing.any():
+        df = df.iloc[:int(np.argmax(missing))]
+    return df.rename_axis('datetime').reset_index()
+
+
+# ============================================================================
+# TRAINING
+# ============================================================================
+
+def _metrics(hours_ahead, y_train, y_train_pred, y_test, y_test_pred) -> Dict:
+    return {
+        'hours_ahead': hours_ahead,
+        'train_mae': float(mean_absolute_error(y_train, y_train_pred)),
+        'test_mae': float(mean_absolute_error(y_test, y_test_pred)),
+        'test_rmse': float(np.sqrt(mean_squared_error(y_test, y_test_pred))),
+        'test_r2': float(r2_score(y_test, y_test_pred)) if len(y_test) > 1 else None,
+        'train_samples': len(y_train),
+        'test_samples': len(y_test)
+    }
+
+
+def grow_forest(model, X, y, n_new_trees: int = TREES_PER_RETRAIN, max_trees: int = MAX_TREES):
+    """Add n_new_trees fitted on (X, y) with warm_start, then keep the newest max_trees"""
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + n_new_trees, n_jobs=-1)
+    model.fit(X, y)
+    if len(model.estimators_) > max_trees:
+        model.estimators_ = model.estimators_[-max_trees:]
+        model.n_estimators = max_trees
+    model.set_params(warm_start=False)
+    return model
+
+
+def split_window(df: pd.DataFrame, trained_through: Optional[pd.Timestamp]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    (fit rows, validation rows). Full runs use the TEST_SIZE chronological
+    split of train_model.py. Incremental runs hold out the newest
+    VALIDATION_ROWS and fit the rows after trained_through (at least
+    MIN_WINDOW_ROWS).
+    """
+    if trained_through is None:
+        n_test = int(np.ceil(len(df) * TEST_SIZE))
+        return df.iloc[:-n_test], df.iloc[-n_test:]
+
+    validation = df.iloc[-VALIDATION_ROWS:]
+    candidates = df.iloc[:-VALIDATION_ROWS]
+    window = candidates[candidates['datetime'] > trained_through]
+    if len(window) < MIN_WINDOW_ROWS:
+        window = candidates.iloc[-MIN_WINDOW_ROWS:]
+    return window, validation
+
+
+def retrain(latitude: float, longitude: float, store_dir: str = DEFAULT_STORE_DIR,
+            models_dir: str = MODELS_DIR, full: bool = False, publish: bool = False) -> Optional[str]:
+    """Run one retraining cycle; returns the new version name (None if there was nothing new)"""
+    run_start = time.perf_counter()
+    store = FeatureStore(store_dir)
+    meta = store.meta()
+    if meta is None:
+        raise FileNotFoundError(f"No feature store at {store.path} - build it with feature_store.py first")
+
+    # 1. New hours from serving
+    last_stored = pd.Timestamp(meta['last_datetime'])
+    new_rows = contiguous_hours(fetch_new_history(latitude, longitude, last_stored.to_pydatetime()), last_stored)
+    print(f"📥 {len(new_rows)} new contiguous hours after {last_stored}")
+    if len(new_rows):
+        store.append(new_rows)
+
+    # 2. Base version: the served one if it came from this job, else the newest
+    versions = list_versions(models_dir)
+    current = read_current(models_dir)
+    base_version = None if full or not versions else (current if current in versions else versions[-1])
+    base_dir = os.path.join(models_dir, base_version) if base_version else None
+    trained_through = pd.Timestamp(read_retrain_info(base_dir)['trained_through']) if base_dir else None
+
+    df = store.training_frame()
+    if trained_through is not None and df['datetime'].max() <= trained_through:
+        print("✓ No new training rows since the current version - nothing to do")
+        return None
+
+    fit_rows, validation_rows = split_window(df, trained_through)
+    feature_cols = get_feature_columns(df)
+    target_cols = [f'target_aqi_{h}h' for h in PREDICTION_HORIZONS]
+    X_fit, X_val = fit_rows[feature_cols], validation_rows[feature_cols]
+
+    version = new_version_name()
+    tmp_dir = os.path.join(models_dir, f'.{version}.tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    print(f"\n{'=' * 70}")
+    print(f"{'INCREMENTAL' if base_dir else 'FULL'} RETRAIN -> {version} "
+          f"({len(fit_rows)} fit rows, {len(validation_rows)} validation rows)")
+    print(f"{'=' * 70}")
+
+    try:
+        # 3. Per-horizon forests
+        all_metrics = []
+        for hours_ahead in PREDICTION_HORIZONS:
+            model_name = f'aqi_rf_model_{hours_ahead}h.pkl'
+            y_fit, y_val = fit_rows[f'target_aqi_{hours_ahead}h'], validation_rows[f'target_aqi_{hours_ahead}h']
+
+            if base_dir and os.path.exists(os.path.join(base_dir, model_name)):
+                model = grow_forest(joblib.load(os.path.join(base_dir, model_name)), X_fit, y_fit)
+            else:
+                model = build_random_forest()
+                model.fit(X_fit, y_fit)
+
+            metrics = _metrics(hours_ahead, y_fit, model.predict(X_fit), y_val, model.predict(X_val))
+            metrics['n_trees'] = len(model.estimators_)
+            all_metrics.append(metrics)
+            joblib.dump(model, os.path.join(tmp_dir, model_name))
+            print(f"✓ {hours_ahead:2d}h: {metrics['n_trees']} trees, validation MAE {metrics['test_mae']:.2f}")
+
+        # Multi-output forest, when the base version has one (or on a full run)
+        multi_path = os.path.join(base_dir, MULTI_OUTPUT_MODEL_FILENAME) if base_dir else None
+        if multi_path is None or os.path.exists(multi_path):
+            if multi_path:
+                multi = grow_forest(joblib.load(multi_path), X_fit, fit_rows[target_cols])
+            else:
+                multi = build_random_forest()
+                multi.fit(X_fit, fit_rows[target_cols])
+            joblib.dump(multi, os.path.join(tmp_dir, MULTI_OUTPUT_MODEL_FILENAME))
+            print(f"✓ multi-output: {len(multi.estimators_)} trees")
+
+        with open(os.path.join(tmp_dir, FEATURE_NAMES_FILENAME), 'w') as f:
+            for feat in feature_cols:
+                f.write(f"{feat}\n")
+        with open(os.path.join(tmp_dir, METRICS_FILENAME), 'w') as f:
+            json.dump(all_metrics, f, indent=2)
+
+        export_models_dir(tmp_dir)
+
+        with open(os.path.join(tmp_dir, RETRAIN_INFO_FILENAME), 'w') as f:
+            json.dump({
+                'version': version,
+                'base_version': base_version,
+                'mode': 'incremental' if base_dir else 'full',
+                'trained_through': fit_rows['datetime'].max().isoformat(),
+                'data_through': df['datetime'].max().isoformat(),
+                'fit_rows': len(fit_rows),
+                'validation_rows': len(validation_rows),
+                'new_hours_ingested': len(new_rows),
+                'location': {'lat': latitude, 'lon': longitude},
+                'seconds': round(time.perf_counter() - run_start, 2),
+                'created_at': datetime.now().isoformat()
+            }, f, indent=2)
+
+        write_manifest(tmp_dir, version, {'base_version': base_version})
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    # Publish the finished directory in one rename
+    os.replace(tmp_dir, os.path.join(models_dir, version))
+    print(f"\n✓ Wrote {os.path.join(models_dir, version)} in {time.perf_counter() - run_start:.1f}s")
+
+    if publish:
+        set_current(models_dir, version)
+        print(f"✓ Published {version} - serving workers hot-reload it")
+    return version
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Retrain the forecasters on new aqi_hourly_data rows')
+    parser.add_argument('--lat', type=float, required=True, help='Latitude of the training location')
+    parser.add_argument('--lon', type=float, required=True, help='Longitude of the training location')
+    parser.add_argument('--feature-store', default=FEATURE_STORE_DIR or DEFAULT_STORE_DIR,
+                        help='Columnar feature store directory (default: %(default)s)')
+    parser.add_argument('--models-dir', default=MODELS_DIR, help='Models directory (default: %(default)s)')
+    parser.add_argument('--full', action='store_true', help='Train from scratch instead of warm-starting')
+    parser.add_argument('--publish', action='store_true', help='Point models/CURRENT at the new version')
+    args = parser.parse_args()
+
+    retrain(args.lat, args.lon, args.feature_store, args.models_dir, args.full, args.publish)
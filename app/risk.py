@@ -1,10 +1,66 @@
-import pandas as pd
-import numpy as np
+"""
+Health Risk Index
+=================
+Research-backed 0-100 risk score for one person at a given AQI, and a
+synthetic dataset generator for training the health-risk model.
+
+calculate_risk_index scores one person; calculate_risk_index_batch scores
+column arrays with the same rules (deterministically when no jitter is
+given; served by POST /api/risk/batch). generate_dataset / iter_dataset_chunks
+draw every column with a seeded NumPy Generator, so millions of rows can
+be produced (and streamed to CSV in chunks) without a Python loop.
+
+Usage (from the app/ directory):
+    python risk.py                               # 10k rows -> aqi_health_risk_dataset.csv
+    python risk.py --rows 10000000 --seed 42     # written in chunks
+    python risk.py --benchmark
+"""
+
+import argparse
 import random
+import time
+from typing import Dict, Iterator, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+DATASET_COLUMNS = [
+    'age', 'sex', 'aqi', 'pre_existing_condition', 'current_symptoms',
+    'exposure_hours', 'season', 'activity_level', 'risk_index'
+]
+DEFAULT_OUTPUT = 'aqi_health_risk_dataset.csv'
+DEFAULT_CHUNK_ROWS = 1_000_000
+JITTER = 5   # ± random variation added for realism
+
+# Pre-existing conditions (0-8) by age bucket: <18, <60, 60+
+CONDITION_AGE_BINS = [18, 60]
+CONDITION_CHOICES = [
+    ([0, 1, 2, 3, 4, 5], [40, 30, 15, 10, 4, 1]),
+    ([0, 1, 2, 3, 4, 5, 6], [30, 25, 20, 15, 7, 2, 1]),
+    ([0, 1, 2, 3, 4, 5, 6, 7, 8], [10, 15, 20, 20, 15, 10, 5, 3, 2]),
+]
+
+# Symptoms (0-8) correlate with AQI: <100, <200, <300, 300+
+SYMPTOM_AQI_BINS = [100, 200, 300]
+SYMPTOM_CHOICES = [
+    ([0, 1, 2], [80, 15, 5]),
+    ([0, 1, 2, 3, 4], [30, 30, 20, 15, 5]),
+    ([2, 3, 4, 5, 6], [20, 25, 30, 20, 5]),
+    ([4, 5, 6, 7, 8], [15, 25, 30, 20, 10]),
+]
+
+
+# ============================================================================
+# RISK SCORING
+# ============================================================================
 
 def calculate_risk_index(age, sex, aqi, condition, symptoms, exposure, season, activity):
     """Calculate risk index based on research-backed logic"""
-    
+
     # AQI contribution (0-40)
     if aqi <= 50: aqi_risk = 0
     elif aqi <= 100: aqi_risk = 5
@@ -12,7 +68,7 @@ def calculate_risk_index(age, sex, aqi, condition, symptoms, exposure, season, a
     elif aqi <= 200: aqi_risk = 25
     elif aqi <= 300: aqi_risk = 35
     else: aqi_risk = 40
-    
+
     # Age vulnerability (0-20)
     if age < 5: age_risk = 20
     elif age < 15: age_risk = 15
@@ -20,84 +76,216 @@ def calculate_risk_index(age, sex, aqi, condition, symptoms, exposure, season, a
     elif age < 60: age_risk = 8
     elif age < 75: age_risk = 15
     else: age_risk = 20
-    
+
     # Pre-existing condition (0-25)
     condition_risk = condition * 2.5
-    
+
     # Current symptoms (0-15)
     symptom_risk = symptoms * 1.5
-    
+
     # Exposure (0-10)
     exposure_base = min(exposure / 12 * 10, 10)
     activity_multiplier = 1 + (activity * 0.3)
     exposure_risk = min(exposure_base * activity_multiplier, 10)
-    
+
     # Total risk
     total_risk = aqi_risk + age_risk + condition_risk + symptom_risk + exposure_risk
-    
+
     # Add small random variation (±5) for realism
-    total_risk += random.uniform(-5, 5)
-    
+    total_risk += random.uniform(-JITTER, JITTER)
+
     # Clamp between 0-100
     return int(max(0, min(100, total_risk)))
 
-def generate_dataset(n_samples=10000):
+
+def calculate_risk_index_batch(age, sex, aqi, condition, symptoms, exposure, season, activity,
+                               jitter: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Vectorized calculate_risk_index over column arrays. `jitter` holds the
+    per-row random variation; None scores without it. Returns int64 scores.
+    """
+    age = np.asarray(age)
+    aqi = np.asarray(aqi)
+
+    aqi_risk = np.select(
+        [aqi <= 50, aqi <= 100, aqi <= 150, aqi <= 200, aqi <= 300],
+        [0, 5, 15, 25, 35], default=40
+    )
+    age_risk = np.select(
+        [age < 5, age < 15, age < 30, age < 60, age < 75],
+        [20, 15, 5, 8, 15], default=20
+    )
+    condition_risk = np.asarray(condition) * 2.5
+    symptom_risk = np.asarray(symptoms) * 1.5
+
+    exposure_base = np.minimum(np.asarray(exposure) / 12 * 10, 10)
+    activity_multiplier = 1 + (np.asarray(activity) * 0.3)
+    exposure_risk = np.minimum(exposure_base * activity_multiplier, 10)
+
+    # Same summation order as the scalar version, so results match bit for bit
+    total_risk = aqi_risk + age_risk + condition_risk + symptom_risk + exposure_risk
+    if jitter is not None:
+        total_risk = total_risk + jitter
+
+    return np.clip(total_risk, 0, 100).astype(np.int64)
+
+
+# ============================================================================
+# SYNTHETIC DATASET
+# ============================================================================
+
+def _choice_by_bucket(rng: np.random.Generator, buckets: np.ndarray, choices: Sequence) -> np.ndarray:
+    """Draw from choices[b] (values, weights) for every row in bucket b"""
+    out = np.empty(len(buckets), dtype=np.int64)
+    for bucket, (values, weights) in enumerate(choices):
+        mask = buckets == bucket
+        p = np.asarray(weights, dtype=float)
+        out[mask] = rng.choice(values, size=int(mask.sum()), p=p / p.sum())
+    return out
+
+
+def _generate_chunk(rng: np.random.Generator, n_samples: int) -> pd.DataFrame:
+    # Generate features with realistic distributions
+    age = (rng.beta(2, 2, n_samples) * 100).astype(np.int64)          # More people in middle ages
+    sex = rng.integers(0, 2, n_samples)
+    aqi = np.minimum(rng.gamma(2, 50, n_samples).astype(np.int64), 500)  # Skewed low, capped at 500
+
+    # Pre-existing conditions more common in elderly; symptoms correlate with AQI
+    condition = _choice_by_bucket(rng, np.digitize(age, CONDITION_AGE_BINS), CONDITION_CHOICES)
+    symptoms = _choice_by_bucket(rng, np.digitize(aqi, SYMPTOM_AQI_BINS), SYMPTOM_CHOICES)
+
+    exposure = np.round(rng.uniform(0.5, 12.0, n_samples), 1)
+    season = rng.integers(0, 4, n_samples)
+    activity = rng.integers(0, 3, n_samples)
+
+    risk = calculate_risk_index_batch(age, sex, aqi, condition, symptoms, exposure, season, activity,
+                                      jitter=rng.uniform(-JITTER, JITTER, n_samples))
+
+    return pd.DataFrame(dict(zip(DATASET_COLUMNS, [
+        age, sex, aqi, condition, symptoms, exposure, season, activity, risk
+    ])))
+
+
+def iter_dataset_chunks(n_samples: int, chunk_rows: int = DEFAULT_CHUNK_ROWS,
+                        seed: Optional[int] = None) -> Iterator[pd.DataFrame]:
+    """
+    Yield the synthetic dataset in DataFrames of at most chunk_rows rows.
+    A given (seed, chunk_rows) always produces the same rows.
+    """
+    rng = np.random.default_rng(seed)
+    for start in range(0, n_samples, chunk_rows):
+        yield _generate_chunk(rng, min(chunk_rows, n_samples - start))
+
+
+def generate_dataset(n_samples: int = 10000, seed: Optional[int] = None) -> pd.DataFrame:
     """Generate synthetic dataset"""
-    
+    return _generate_chunk(np.random.default_rng(seed), n_samples)
+
+
+def write_dataset(path: str, n_samples: int, chunk_rows: int = DEFAULT_CHUNK_ROWS,
+                  seed: Optional[int] = None) -> int:
+    """Stream the dataset to CSV chunk by chunk; memory stays bounded by chunk_rows"""
+    written = 0
+    for chunk in iter_dataset_chunks(n_samples, chunk_rows, seed):
+        chunk.to_csv(path, mode='w' if written == 0 else 'a', header=written == 0, index=False)
+        written += len(chunk)
+    return written
+
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def _legacy_generate_dataset(n_samples: int) -> pd.DataFrame:
+    """Original per-row generator, kept as the benchmark baseline"""
     data = []
-    
     for _ in range(n_samples):
-        # Generate features with realistic distributions
-        age = int(np.random.beta(2, 2) * 100)  # More people in middle ages
+        age = int(np.random.beta(2, 2) * 100)
         sex = random.randint(0, 1)
-        aqi = int(np.random.gamma(2, 50))  # Skewed towards lower values, but can be high
-        aqi = min(aqi, 500)  # Cap at 500
-        
-        # Pre-existing conditions more common in elderly
-        if age < 18:
-            condition = random.choices([0,1,2,3,4,5], weights=[40,30,15,10,4,1])[0]
-        elif age < 60:
-            condition = random.choices([0,1,2,3,4,5,6], weights=[30,25,20,15,7,2,1])[0]
-        else:
-            condition = random.choices([0,1,2,3,4,5,6,7,8], weights=[10,15,20,20,15,10,5,3,2])[0]
-        
-        # Symptoms correlate with AQI
-        if aqi < 100:
-            symptoms = random.choices([0,1,2], weights=[80,15,5])[0]
-        elif aqi < 200:
-            symptoms = random.choices([0,1,2,3,4], weights=[30,30,20,15,5])[0]
-        elif aqi < 300:
-            symptoms = random.choices([2,3,4,5,6], weights=[20,25,30,20,5])[0]
-        else:
-            symptoms = random.choices([4,5,6,7,8], weights=[15,25,30,20,10])[0]
-        
+        aqi = min(int(np.random.gamma(2, 50)), 500)
+
+        bucket = int(np.digitize(age, CONDITION_AGE_BINS))
+        condition = random.choices(*CONDITION_CHOICES[bucket])[0]
+        bucket = int(np.digitize(aqi, SYMPTOM_AQI_BINS))
+        symptoms = random.choices(*SYMPTOM_CHOICES[bucket])[0]
+
         exposure = round(random.uniform(0.5, 12.0), 1)
         season = random.randint(0, 3)
         activity = random.randint(0, 2)
-        
-        # Calculate risk index
-        risk = calculate_risk_index(age, sex, aqi, condition, symptoms, 
-                                    exposure, season, activity)
-        
-        data.append([age, sex, aqi, condition, symptoms, exposure, 
-                     season, activity, risk])
-    
-    # Create DataFrame
-    df = pd.DataFrame(data, columns=[
-        'age', 'sex', 'aqi', 'pre_existing_condition', 'current_symptoms',
-        'exposure_hours', 'season', 'activity_level', 'risk_index'
-    ])
-    
-    return df
-
-# Generate dataset
-df = generate_dataset(10000)
-
-# Save to CSV
-df.to_csv('aqi_health_risk_dataset.csv', index=False)
-
-print(f"Dataset created with {len(df)} samples")
-print("\nFirst 5 rows:")
-print(df.head())
-print("\nDataset statistics:")
-print(df.describe())
\ No newline at end of file
+
+        risk = calculate_risk_index(age, sex, aqi, condition, symptoms, exposure, season, activity)
+        data.append([age, sex, aqi, condition, symptoms, exposure, season, activity, risk])
+    return pd.DataFrame(data, columns=DATASET_COLUMNS)
+
+
+def run_scoring_benchmark(n_rows: int = 1_000_000) -> Dict[str, float]:
+    """Rows per second of deterministic batch scoring vs the per-person function"""
+    df = generate_dataset(n_rows, seed=1)
+    columns = [df[c].to_numpy() for c in DATASET_COLUMNS[:-1]]
+    n_scalar = min(n_rows, 100_000)
+    rows = df[DATASET_COLUMNS[:-1]].head(n_scalar).itertuples(index=False)
+
+    start = time.perf_counter()
+    for row in rows:
+        calculate_risk_index(*row)
+    scalar_rate = n_scalar / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    calculate_risk_index_batch(*columns)
+    batch_rate = n_rows / (time.perf_counter() - start)
+
+    print(f"  {'scalar score':<12} {n_scalar:>11,} rows {scalar_rate:>14,.0f} rows/s")
+    print(f"  {'batch score':<12} {n_rows:>11,} rows {batch_rate:>14,.0f} rows/s ({batch_rate / scalar_rate:.0f}x)")
+    return {'scalar': scalar_rate, 'batch': batch_rate}
+
+
+def run_benchmark(sizes: Sequence[int] = (10_000, 1_000_000, 10_000_000),
+                  chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Dict[int, float]:
+    """Check batch scoring against the scalar version, then print scoring and generation rows/s"""
+    df = generate_dataset(20000, seed=0)
+    random.seed(0)
+    jitter = np.array([random.uniform(-JITTER, JITTER) for _ in range(len(df))])
+    random.seed(0)
+    expected = [calculate_risk_index(*row) for row in df[DATASET_COLUMNS[:-1]].itertuples(index=False)]
+    batch = calculate_risk_index_batch(*(df[c].to_numpy() for c in DATASET_COLUMNS[:-1]), jitter=jitter)
+    if not np.array_equal(batch, expected):
+        raise AssertionError("calculate_risk_index_batch does not match calculate_risk_index")
+    print(f"✓ {len(df)} rows: batch risk scores match the scalar implementation")
+    run_scoring_benchmark()
+
+    start = time.perf_counter()
+    _legacy_generate_dataset(sizes[0])
+    legacy_rate = sizes[0] / (time.perf_counter() - start)
+    print(f"  {'legacy loop':<12} {sizes[0]:>11,} rows {legacy_rate:>14,.0f} rows/s")
+
+    results = {}
+    for n_samples in sizes:
+        start = time.perf_counter()
+        for _ in iter_dataset_chunks(n_samples, chunk_rows, seed=0):
+            pass
+        results[n_samples] = n_samples / (time.perf_counter() - start)
+        print(f"  {'vectorized':<12} {n_samples:>11,} rows {results[n_samples]:>14,.0f} rows/s "
+              f"({results[n_samples] / legacy_rate:.0f}x)")
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate the synthetic health-risk dataset')
+    parser.add_argument('--rows', type=int, default=10000, help='Rows to generate (default: %(default)s)')
+    parser.add_argument('--out', default=DEFAULT_OUTPUT, help='Output CSV (default: %(default)s)')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS, help='Rows per chunk (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=None, help='RNG seed for a reproducible dataset')
+    parser.add_argument('--benchmark', action='store_true', help='Benchmark at 10k, 1M and 10M rows instead')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        run_benchmark(chunk_rows=args.chunk_rows)
+    else:
+        written = write_dataset(args.out, args.rows, args.chunk_rows, args.seed)
+        print(f"Dataset created with {written} samples")
+        if written <= args.chunk_rows:
+            df = pd.read_csv(args.out)
+            print("\nFirst 5 rows:")
+            print(df.head())
+            print("\nDataset statistics:")
+            print(df.describe())
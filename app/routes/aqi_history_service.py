@@ -0,0 +1,158 @@
+"""
+AQI History Service
+===================
+Historical AQI series for charts at hourly, daily or weekly resolution.
+
+Hourly points come from aqi_hourly_data; daily and weekly points come from
+the aqi_daily_rollup / aqi_weekly_rollup tables (migration 003), which are
+refreshed whenever hours are stored. With resolution 'auto' the finest
+resolution whose point count fits the caller's budget is used, so a one-year
+chart reads ~365 daily or ~53 weekly rows instead of ~8,760 hours.
+"""
+
+import logging
+import math
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from app.aqi_engine import indian_aqi_category
+from app.db import connection, get_db_cursor
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+# Points returned when the caller gives no budget, and the most any request may ask for
+DEFAULT_HISTORY_POINTS = int(os.getenv('DEFAULT_HISTORY_POINTS', 400))
+MAX_HISTORY_POINTS = int(os.getenv('MAX_HISTORY_POINTS', 2000))
+
+# Stored locations within this many degrees of the requested point are used
+HISTORY_MATCH_DEGREES = float(os.getenv('HISTORY_MATCH_DEGREES', 0.05))
+
+# Finest first; 'auto' walks this list until the point count fits the budget
+RESOLUTIONS = {
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1),
+    'week': timedelta(weeks=1)
+}
+
+ROLLUP_TABLES = {
+    'day': 'aqi_daily_rollup',
+    'week': 'aqi_weekly_rollup'
+}
+
+POLLUTANT_COLUMNS = ['pm2_5', 'pm10', 'no2', 'so2', 'co', 'o3']
+
+
+def expected_points(resolution: str, from_time: datetime, to_time: datetime) -> int:
+    """Upper bound on buckets of `resolution` touching [from_time, to_time)"""
+    return math.ceil((to_time - from_time) / RESOLUTIONS[resolution]) + 1
+
+
+def choose_resolution(from_time: datetime, to_time: datetime, max_points: int) -> str:
+    """Finest resolution within max_points (weekly if even that is over)"""
+    for resolution in RESOLUTIONS:
+        if expected_points(resolution, from_time, to_time) <= max_points:
+            return resolution
+    return 'week'
+
+
+# ============================================================================
+# DATABASE FUNCTIONS
+# ============================================================================
+
+def find_stored_location(cursor, latitude: float, longitude: float) -> Optional[Tuple[float, float]]:
+    """Nearest location with rollups within HISTORY_MATCH_DEGREES, or None"""
+    cursor.execute("""
+        SELECT latitude, longitude
+        FROM aqi_weekly_rollup
+        WHERE latitude BETWEEN %s AND %s
+          AND longitude BETWEEN %s AND %s
+        GROUP BY latitude, longitude
+        ORDER BY (latitude - %s) ^ 2 + (longitude - %s) ^ 2
+        LIMIT 1
+    """, (latitude - HISTORY_MATCH_DEGREES, latitude + HISTORY_MATCH_DEGREES,
+          longitude - HISTORY_MATCH_DEGREES, longitude + HISTORY_MATCH_DEGREES,
+          latitude, longitude))
+    row = cursor.fetchone()
+    return (row['latitude'], row['longitude']) if row else None
+
+
+def _read_points(cursor, resolution: str, latitude: float, longitude: float,
+                 from_time: datetime, to_time: datetime) -> List[Dict]:
+    if resolution == 'hour':
+        cursor.execute("""
+            SELECT hour_timestamp AS bucket_start, 1 AS hours,
+                   indian_aqi AS aqi_min, indian_aqi AS aqi_max, indian_aqi AS aqi_mean,
+                   pm2_5 AS pm2_5_mean, pm10 AS pm10_mean, no2 AS no2_mean,
+                   so2 AS so2_mean, co AS co_mean, o3 AS o3_mean
+            FROM aqi_hourly_data
+            WHERE latitude = %s AND longitude = %s
+              AND hour_timestamp >= %s AND hour_timestamp < %s
+            ORDER BY hour_timestamp
+        """, (latitude, longitude, from_time, to_time))
+    else:
+        # Buckets that overlap the range: the first one may start before from_time
+        cursor.execute(f"""
+            SELECT bucket_start, hours, aqi_min, aqi_max, aqi_mean,
+                   pm2_5_mean, pm10_mean, no2_mean, so2_mean, co_mean, o3_mean
+            FROM {ROLLUP_TABLES[resolution]}
+            WHERE latitude = %s AND longitude = %s
+              AND bucket_start > %s AND bucket_start < %s
+            ORDER BY bucket_start
+        """, (latitude, longitude, from_time - RESOLUTIONS[resolution], to_time))
+    return cursor.fetchall()
+
+
+def _format_point(row: Dict) -> Dict:
+    aqi_mean = float(row['aqi_mean']) if row['aqi_mean'] is not None else None   # avg() is NUMERIC
+    return {
+        'timestamp': row['bucket_start'].strftime('%Y-%m-%d %H:%M:%S'),
+        'aqi': round(aqi_mean, 2) if aqi_mean is not None else None,
+        'aqi_min': row['aqi_min'],
+        'aqi_max': row['aqi_max'],
+        'category': indian_aqi_category(aqi_mean),
+        'hours': row['hours'],
+        'pollutants': {
+            pollutant: round(float(row[f'{pollutant}_mean']), 2) if row[f'{pollutant}_mean'] is not None else None
+            for pollutant in POLLUTANT_COLUMNS
+        }
+    }
+
+
+def get_aqi_history(latitude: float, longitude: float, from_time: datetime, to_time: datetime,
+                    resolution: str = 'auto', max_points: int = DEFAULT_HISTORY_POINTS) -> Dict:
+    """
+    AQI series for [from_time, to_time) at the given resolution ('hour',
+    'day', 'week' or 'auto'). Each point has the bucket's mean/min/max AQI
+    and mean pollutant concentrations.
+    """
+    if resolution == 'auto':
+        resolution = choose_resolution(from_time, to_time, max_points)
+
+    with connection() as conn:
+        cursor = get_db_cursor(conn, dict_cursor=True)
+        location = find_stored_location(cursor, latitude, longitude)
+        rows = _read_points(cursor, resolution, *location, from_time, to_time) if location else []
+        cursor.close()
+
+    if location is None:
+        logger.info(f"No stored history near ({latitude}, {longitude})")
+
+    return {
+        'success': True,
+        'location': {
+            'latitude': latitude,
+            'longitude': longitude,
+            'stored_latitude': location[0] if location else None,
+            'stored_longitude': location[1] if location else None
+        },
+        'resolution': resolution,
+        'from': from_time.strftime('%Y-%m-%d %H:%M:%S'),
+        'to': to_time.strftime('%Y-%m-%d %H:%M:%S'),
+        'count': len(rows),
+        'points': [_format_point(row) for row in rows]
+    }
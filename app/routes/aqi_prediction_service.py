@@ -1,23 +1,28 @@
 """
 AQI Prediction Service - Integrated with Flask App
 ===================================================
-Multi-horizon prediction using 12 trained models.
+Multi-horizon prediction using one multi-output model (or 12 per-horizon models).
 Returns 24-hour data: 12 hours historical + 12 hours predicted.
 """
 
 import requests
 import psycopg2
 from psycopg2.extras import RealDictCursor
-from app.db import get_db_connection
+from app.db import connection, get_db_cursor, request_db_stats, DatabaseUnavailable
 from datetime import datetime, timedelta
 import time
 import logging
 import json
+import copy
 import numpy as np
 import pandas as pd
-import joblib
 from typing import Dict, List, Optional
 import os
+from app.model_registry import ModelRegistry, ModelSet, load_model_set
+from app.feature_engine import BUFFER_HOURS, RollingFeatureState, get_feature_state
+from app.forecast_cache import forecast_cache, load_shared, save_shared
+from app.singleflight import SingleFlight
+from app.aqi_engine import POLLUTANTS, convert_to_indian_aqi, convert_to_indian_aqi_batch, indian_aqi_category, us_aqi_category
 
 logger = logging.getLogger(__name__)
 
@@ -40,192 +45,205 @@ DB_CONFIG = {
 
 # Model Configuration - All 12 models
 MODELS_DIR = os.getenv('MODELS_DIR', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'models'))
-FEATURE_NAMES_PATH = os.path.join(MODELS_DIR, 'feature_names.txt')
 
-# ============================================================================
-# GLOBAL MODEL CACHE
-# ============================================================================
+# Prefer the single multi-output forest over the 12 per-horizon forests when it exists
+USE_MULTI_OUTPUT_MODEL = os.getenv('USE_MULTI_OUTPUT_MODEL', 'true').lower() == 'true'
 
-_MULTI_MODELS_CACHE = {}
-_FEATURE_NAMES = None
+# Serve exported flat-array forests (python -m app.tree_inference) instead of sklearn pickles
+USE_FLAT_MODELS = os.getenv('USE_FLAT_MODELS', 'true').lower() == 'true'
 
+# Memory-map flat model arrays ('r') so forked gunicorn workers share one copy; '' loads into private memory
+MODEL_MMAP_MODE = os.getenv('MODEL_MMAP_MODE', 'r') or None
 
-def load_multi_horizon_models():
-    """Load all 12 models into memory"""
-    global _MULTI_MODELS_CACHE, _FEATURE_NAMES
-    
-    if not _MULTI_MODELS_CACHE:
-        logger.info("🔄 Loading multi-horizon models into memory...")
-        
-        try:
-            # Load each model (1h through 12h)
-            for hours_ahead in range(1, 13):
-                model_path = os.path.join(MODELS_DIR, f'aqi_rf_model_{hours_ahead}h.pkl')
-                if os.path.exists(model_path):
-                    model = joblib.load(model_path)
-                    _MULTI_MODELS_CACHE[hours_ahead] = model
-                    logger.info(f"  ✓ Loaded model for {hours_ahead}h ahead")
-                else:
-                    logger.warning(f"  ⚠️  Model not found: {model_path}")
-            
-            # Load feature names
-            if os.path.exists(FEATURE_NAMES_PATH):
-                with open(FEATURE_NAMES_PATH, 'r') as f:
-                    _FEATURE_NAMES = [line.strip() for line in f]
-                logger.info(f"✓ Loaded {len(_FEATURE_NAMES)} features")
-            else:
-                logger.error(f"Feature names file not found: {FEATURE_NAMES_PATH}")
-                raise FileNotFoundError("Feature names file missing")
-            
-            logger.info(f"✅ All {len(_MULTI_MODELS_CACHE)} models loaded successfully")
-            
-        except Exception as e:
-            logger.error(f"❌ Failed to load models: {e}")
-            raise
-    
-    return _MULTI_MODELS_CACHE, _FEATURE_NAMES
+# Build serving features from per-location ring buffers instead of pandas
+USE_INCREMENTAL_FEATURES = os.getenv('USE_INCREMENTAL_FEATURES', 'true').lower() == 'true'
+SERIES_COLUMNS = ['pm2_5', 'pm10', 'no2', 'so2', 'co', 'o3', 'indian_aqi']
 
+PREDICTION_HORIZONS = list(range(1, 13))
+
+# Collapses concurrent cache misses for the same forecast cell
+forecast_singleflight = SingleFlight('forecast')
 
 # ============================================================================
-# INDIAN AQI CALCULATION
+# MODEL REGISTRY
 # ============================================================================
 
-def convert_to_indian_aqi(pollutant_values: Dict[str, float]) -> Dict:
-    """Convert pollutant concentrations to Indian CPCB AQI"""
-    
-    indian_breakpoints = {
-        'pm25': [(0, 30, 0, 50), (31, 60, 51, 100), (61, 90, 101, 200),
-                 (91, 120, 201, 300), (121, 250, 301, 400), (251, 380, 401, 500)],
-        'pm10': [(0, 50, 0, 50), (51, 100, 51, 100), (101, 250, 101, 200),
-                 (251, 350, 201, 300), (351, 430, 301, 400), (431, 550, 401, 500)],
-        'no2': [(0, 40, 0, 50), (41, 80, 51, 100), (81, 180, 101, 200),
-                (181, 280, 201, 300), (281, 400, 301, 400), (401, 550, 401, 500)],
-        'so2': [(0, 40, 0, 50), (41, 80, 51, 100), (81, 380, 101, 200),
-                (381, 800, 201, 300), (801, 1600, 301, 400), (1601, 2100, 401, 500)],
-        'co': [(0, 1.0, 0, 50), (1.1, 2.0, 51, 100), (2.1, 10, 101, 200),
-               (10.1, 17, 201, 300), (17.1, 34, 301, 400), (34.1, 46, 401, 500)],
-        'o3': [(0, 50, 0, 50), (51, 100, 51, 100), (101, 168, 101, 200),
-               (169, 208, 201, 300), (209, 748, 301, 400), (749, 1000, 401, 500)]
-    }
-    
-    def calculate_sub_index(pollutant: str, concentration: float) -> Optional[int]:
-        if pollutant not in indian_breakpoints or concentration is None:
-            return None
-        
-        breakpoints = indian_breakpoints[pollutant]
-        for bp_lo, bp_hi, aqi_lo, aqi_hi in breakpoints:
-            if bp_lo <= concentration <= bp_hi:
-                if (bp_hi - bp_lo) == 0:
-                    return aqi_lo
-                aqi = ((aqi_hi - aqi_lo) / (bp_hi - bp_lo)) * (concentration - bp_lo) + aqi_lo
-                return round(aqi)
-        
-        if concentration > breakpoints[-1][1]:
-            return 500
-        elif concentration < breakpoints[0][0]:
-            return 0
-        return None
-    
-    sub_indices = {}
-    
-    for pollutant in ['pm25', 'pm10', 'no2', 'so2']:
-        if pollutant in pollutant_values and pollutant_values[pollutant] is not None:
-            sub_indices[pollutant] = calculate_sub_index(pollutant, pollutant_values[pollutant])
-    
-    # CO: Convert from µg/m³ to mg/m³
-    if 'co' in pollutant_values and pollutant_values['co'] is not None:
-        co_value = pollutant_values['co'] / 1000.0
-        sub_indices['co'] = calculate_sub_index('co', co_value)
-    
-    if 'o3' in pollutant_values and pollutant_values['o3'] is not None:
-        sub_indices['o3'] = calculate_sub_index('o3', pollutant_values['o3'])
-    
-    sub_indices = {k: v for k, v in sub_indices.items() if v is not None}
-    
-    if not sub_indices:
-        return {'aqi': None, 'dominant_pollutant': None, 'sub_indices': {}}
-    
-    dominant_pollutant = max(sub_indices, key=sub_indices.get)
-    overall_aqi = sub_indices[dominant_pollutant]
-    
-    return {
-        'aqi': overall_aqi,
-        'dominant_pollutant': dominant_pollutant,
-        'sub_indices': sub_indices
-    }
+def _load_model_set(version: Optional[str]) -> ModelSet:
+    """
+    Load a model version (None = the unversioned models in MODELS_DIR).
+    Flat-array exports are memory-mapped read-only (MODEL_MMAP_MODE), so the
+    OS page cache holds one copy of those arrays for all worker processes;
+    models only available as pickles are loaded into each process's own memory.
+    """
+    logger.info(f"🔄 Loading model version {version or 'unversioned'} into memory...")
+    return load_model_set(MODELS_DIR, version, use_flat=USE_FLAT_MODELS,
+                          use_multi_output=USE_MULTI_OUTPUT_MODEL, mmap_mode=MODEL_MMAP_MODE)
 
 
-def get_aqi_category(aqi: float) -> str:
-    """Get AQI category"""
-    if aqi is None:
-        return "Unknown"
-    if aqi <= 50:
-        return "Good"
-    elif aqi <= 100:
-        return "Satisfactory"
-    elif aqi <= 200:
-        return "Moderate"
-    elif aqi <= 300:
-        return "Poor"
-    elif aqi <= 400:
-        return "Very Poor"
-    else:
-        return "Severe"
+# Active models for this process; new versions are swapped in by a watcher thread.
+# Cached forecasts came from the old version, so a swap drops them.
+model_registry = ModelRegistry(MODELS_DIR, _load_model_set, on_swap=lambda model_set: forecast_cache.clear())
+
+
+def get_model_set() -> ModelSet:
+    """The active model version. Take it once per request so a swap never mixes versions."""
+    return model_registry.get()
+
+
+def load_multi_horizon_models():
+    """Load the active models into memory; returns (per-horizon models, feature names)"""
+    try:
+        model_set = get_model_set()
+    except Exception as e:
+        logger.error(f"❌ Failed to load models: {e}")
+        raise
+    return model_set.horizon_models, model_set.feature_names
+
+
+def predict_all_horizons(X, model_set: Optional[ModelSet] = None) -> np.ndarray:
+    """Predict every horizon (1h..12h) for each row of X; see ModelSet.predict_all_horizons"""
+    return (model_set or get_model_set()).predict_all_horizons(X)
 
 
 # ============================================================================
 # DATABASE FUNCTIONS
 # ============================================================================
 
-def get_db_connection_old():
-    """Get database connection (legacy)"""
-    from app.db import get_db_connection as connect
-    return connect()
+# Stored hours behind each forecast: lag_24h needs 25 rows, and matching the
+# feature engine's buffer lets a location's rolling state slide by one row
+HISTORY_HOURS = BUFFER_HOURS
+
+# Hours checked for gaps: the history window plus the current hour
+GAP_CHECK_HOURS = HISTORY_HOURS + 1
+
+
+def split_history_window(rows: List[Dict], from_time: datetime):
+    """
+    Split rows of a generate_series window query into the stored
+    HISTORY_HOURS of history (DataFrame) and the list of hours with no
+    stored row.
+    """
+    present = [row for row in rows if not row['is_missing']]
+    missing_hours = [pd.Timestamp(row['hour_timestamp']).to_pydatetime() for row in rows if row['is_missing']]
+    
+    if not present:
+        return pd.DataFrame(), missing_hours
+    
+    df = pd.DataFrame(present).drop(columns=['is_missing'])
+    df['hour_timestamp'] = pd.to_datetime(df['hour_timestamp'])
+    df = df[df['hour_timestamp'] < pd.Timestamp(from_time + timedelta(hours=HISTORY_HOURS))].reset_index(drop=True)
+    return df, missing_hours
 
 
-def get_24h_data_from_db(latitude: float, longitude: float, from_time: datetime) -> pd.DataFrame:
-    """Get 24 hours of data from database"""
+def get_24h_data_from_db(latitude: float, longitude: float, from_time: datetime):
+    """
+    Get HISTORY_HOURS of data from database together with the missing hours.
+    
+    One query: generate_series over the gap-check window LEFT JOIN the
+    stored rows. Returns (DataFrame of stored rows, [missing hour, ...]).
+    """
+    all_hours = [from_time + timedelta(hours=i) for i in range(GAP_CHECK_HOURS)]
     try:
-        connection = get_db_connection()
-        if not connection:
-            return pd.DataFrame()
-            
-        from app.db import get_db_cursor
-        cursor = get_db_cursor(connection, dict_cursor=True)
-        
         query = """
             SELECT 
-                hour_timestamp,
-                pm2_5, pm10, no2, so2, co, o3,
-                indian_aqi, dominant_pollutant
-            FROM aqi_hourly_data
-            WHERE latitude = %s 
-              AND longitude = %s
-              AND hour_timestamp >= %s
-              AND hour_timestamp < %s + INTERVAL '24 hours'
-            ORDER BY hour_timestamp ASC
+                h.hour_timestamp,
+                d.pm2_5, d.pm10, d.no2, d.so2, d.co, d.o3,
+                d.indian_aqi, d.dominant_pollutant,
+                d.hour_timestamp IS NULL AS is_missing
+            FROM generate_series(%s::timestamp,
+                                 %s::timestamp + (%s - 1) * INTERVAL '1 hour',
+                                 INTERVAL '1 hour') AS h(hour_timestamp)
+            LEFT JOIN aqi_hourly_data d
+              ON d.latitude = %s 
+             AND d.longitude = %s
+             AND d.hour_timestamp = h.hour_timestamp
+            ORDER BY h.hour_timestamp ASC
         """
         
-        cursor.execute(query, (latitude, longitude, from_time, from_time))
-        data = cursor.fetchall()
-        cursor.close()
-        connection.close()
+        with connection() as conn:
+            cursor = get_db_cursor(conn, dict_cursor=True)
+            cursor.execute(query, (from_time, from_time, GAP_CHECK_HOURS, latitude, longitude))
+            data = cursor.fetchall()
+            cursor.close()
         
-        if data:
-            df = pd.DataFrame(data)
-            df['hour_timestamp'] = pd.to_datetime(df['hour_timestamp'])
-            return df
-        return pd.DataFrame()
+        return split_history_window(data, from_time)
         
     except Exception as e:
         logger.error(f"Error fetching data from database: {e}")
-        return pd.DataFrame()
+        return pd.DataFrame(), all_hours
+
+
+def get_24h_data_for_locations(locations: List[tuple], from_time: datetime):
+    """
+    Get HISTORY_HOURS of data for many (latitude, longitude) pairs in one query.
+    Returns ({index in locations: DataFrame}, {index in locations: [missing hour, ...]}).
+    """
+    if not locations:
+        return {}, {}
+    
+    all_hours = [from_time + timedelta(hours=i) for i in range(GAP_CHECK_HOURS)]
+    unknown = ({}, {idx: list(all_hours) for idx in range(len(locations))})
+    try:
+        query = """
+            SELECT 
+                req.idx,
+                h.hour_timestamp,
+                d.pm2_5, d.pm10, d.no2, d.so2, d.co, d.o3,
+                d.indian_aqi, d.dominant_pollutant,
+                d.hour_timestamp IS NULL AS is_missing
+            FROM unnest(%s::int[], %s::float8[], %s::float8[]) AS req(idx, lat, lon)
+            CROSS JOIN generate_series(%s::timestamp,
+                                       %s::timestamp + (%s - 1) * INTERVAL '1 hour',
+                                       INTERVAL '1 hour') AS h(hour_timestamp)
+            LEFT JOIN aqi_hourly_data d
+              ON d.latitude = req.lat
+             AND d.longitude = req.lon
+             AND d.hour_timestamp = h.hour_timestamp
+            ORDER BY req.idx, h.hour_timestamp ASC
+        """
+        
+        with connection() as conn:
+            cursor = get_db_cursor(conn, dict_cursor=True)
+            cursor.execute(query, (
+                list(range(len(locations))),
+                [float(lat) for lat, _ in locations],
+                [float(lon) for _, lon in locations],
+                from_time, from_time, GAP_CHECK_HOURS
+            ))
+            data = cursor.fetchall()
+            cursor.close()
+        
+        rows_by_location = {}
+        for row in data:
+            rows_by_location.setdefault(row.pop('idx'), []).append(row)
+        
+        frames, missing = {}, {}
+        for idx, rows in rows_by_location.items():
+            df, missing[idx] = split_history_window(rows, from_time)
+            if not df.empty:
+                frames[idx] = df
+        return frames, missing
+        
+    except Exception as e:
+        logger.error(f"Error fetching batch data from database: {e}")
+        return unknown
+
 
+def missing_hour_ranges(missing_hours: List[datetime]) -> List[tuple]:
+    """Collapse missing hours into contiguous [start, end) ranges"""
+    ranges = []
+    for hour in sorted(missing_hours):
+        if ranges and ranges[-1][1] == hour:
+            ranges[-1][1] = hour + timedelta(hours=1)
+        else:
+            ranges.append([hour, hour + timedelta(hours=1)])
+    return [tuple(r) for r in ranges]
 
-def store_hourly_data(connection, latitude: float, longitude: float, hourly_records: List[Dict]):
-    """Store hourly data in database"""
+
+def store_hourly_data(conn, latitude: float, longitude: float, hourly_records: List[Dict]):
+    """Store hourly data in database (committed by the caller's connection() block)"""
     try:
-        cursor = connection.cursor()
+        cursor = conn.cursor()
         
         insert_query = """
             INSERT INTO aqi_hourly_data (
@@ -252,15 +270,27 @@ def store_hourly_data(connection, latitude: float, longitude: float, hourly_reco
         """
         
         cursor.executemany(insert_query, hourly_records)
-        connection.commit()
+        
+        # Recompute the daily/weekly rollup buckets these hours fall into.
+        # Rollups are derived data, so the refresh runs under a savepoint: if
+        # it fails (e.g. migration 003 not applied yet) the raw hours are kept
+        hours = [record['hour_timestamp'] for record in hourly_records]
+        cursor.execute("SAVEPOINT refresh_rollups")
+        try:
+            cursor.execute("SELECT aqi_refresh_rollups(%s, %s, %s, %s)",
+                           (latitude, longitude, min(hours), max(hours)))
+            cursor.execute("RELEASE SAVEPOINT refresh_rollups")
+        except Exception as e:
+            cursor.execute("ROLLBACK TO SAVEPOINT refresh_rollups")
+            logger.warning(f"Rollups not refreshed for ({latitude}, {longitude}): {e}")
         cursor.close()
         
         logger.info(f"✓ Stored {len(hourly_records)} hourly records")
         return True
         
     except Exception as e:
+        # The caller's connection() block rolls the failed statements back
         logger.error(f"Error storing data: {e}")
-        connection.rollback()
         return False
 
 
@@ -293,21 +323,20 @@ def fetch_historical_data_from_api(latitude: float, longitude: float, start_time
             
             logger.info(f"✓ API returned {len(api_list)} records")
             
+            components_list = [record.get('components', {}) for record in api_list]
+            aqi_batch = convert_to_indian_aqi_batch({
+                pollutant: [components.get('pm2_5' if pollutant == 'pm25' else pollutant) for components in components_list]
+                for pollutant in POLLUTANTS
+            })
+            
+            def as_int(value):
+                return None if np.isnan(value) else int(value)
+            
             hourly_records = []
-            for record in api_list:
-                components = record.get('components', {})
+            for idx, record in enumerate(api_list):
+                components = components_list[idx]
                 dt = record.get('dt')
-                
-                pollutant_values = {
-                    'pm25': components.get('pm2_5'),
-                    'pm10': components.get('pm10'),
-                    'no2': components.get('no2'),
-                    'so2': components.get('so2'),
-                    'co': components.get('co'),
-                    'o3': components.get('o3')
-                }
-                
-                aqi_data = convert_to_indian_aqi(pollutant_values)
+                aqi = as_int(aqi_batch['aqi'][idx])
                 
                 hourly_records.append({
                     'latitude': latitude,
@@ -323,15 +352,15 @@ def fetch_historical_data_from_api(latitude: float, longitude: float, start_time
                     'o3': components.get('o3'),
                     'no': components.get('no'),
                     'nh3': components.get('nh3'),
-                    'indian_aqi': aqi_data['aqi'],
-                    'dominant_pollutant': aqi_data['dominant_pollutant'],
-                    'aqi_category': get_aqi_category(aqi_data['aqi']),
-                    'sub_index_pm25': aqi_data['sub_indices'].get('pm25'),
-                    'sub_index_pm10': aqi_data['sub_indices'].get('pm10'),
-                    'sub_index_no2': aqi_data['sub_indices'].get('no2'),
-                    'sub_index_so2': aqi_data['sub_indices'].get('so2'),
-                    'sub_index_co': aqi_data['sub_indices'].get('co'),
-                    'sub_index_o3': aqi_data['sub_indices'].get('o3')
+                    'indian_aqi': aqi,
+                    'dominant_pollutant': aqi_batch['dominant_pollutant'][idx],
+                    'aqi_category': indian_aqi_category(aqi),
+                    'sub_index_pm25': as_int(aqi_batch['sub_indices']['pm25'][idx]),
+                    'sub_index_pm10': as_int(aqi_batch['sub_indices']['pm10'][idx]),
+                    'sub_index_no2': as_int(aqi_batch['sub_indices']['no2'][idx]),
+                    'sub_index_so2': as_int(aqi_batch['sub_indices']['so2'][idx]),
+                    'sub_index_co': as_int(aqi_batch['sub_indices']['co'][idx]),
+                    'sub_index_o3': as_int(aqi_batch['sub_indices']['o3'][idx])
                 })
             
             return hourly_records
@@ -355,6 +384,12 @@ def calculate_features_from_24h_data(df_24h: pd.DataFrame) -> pd.DataFrame:
     if len(df_24h) < 12:
         logger.warning(f"Only {len(df_24h)} hours available")
     
+    return build_feature_frame(df_24h).iloc[[-1]]
+
+
+def build_feature_frame(df_24h: pd.DataFrame) -> pd.DataFrame:
+    """Calculate ML features for every row (pandas reference implementation)"""
+    
     df = df_24h.copy()
     df = df.sort_values('hour_timestamp').reset_index(drop=True)
     
@@ -427,41 +462,78 @@ def calculate_features_from_24h_data(df_24h: pd.DataFrame) -> pd.DataFrame:
     # Add all new columns at once using pd.concat to avoid fragmentation
     df = pd.concat([df, pd.DataFrame(new_columns, index=df.index)], axis=1)
     
-    return df.iloc[[-1]]
+    return df
+
+
+def calculate_feature_vector(df_24h: pd.DataFrame, feature_names: List[str],
+                             latitude: float = None, longitude: float = None) -> np.ndarray:
+    """
+    Feature vector for the latest row using the incremental ring-buffer engine.
+    With coordinates, the location's rolling state is reused and only new
+    hourly rows are pushed.
+    """
+    timestamps = df_24h['hour_timestamp'].tolist()
+    values = df_24h[SERIES_COLUMNS].to_numpy(dtype=float, na_value=np.nan)
+    
+    if latitude is None or longitude is None:
+        state = RollingFeatureState(feature_names)
+    else:
+        state = get_feature_state(latitude, longitude, feature_names)
+    
+    with state.lock:
+        state.sync(timestamps, values)
+        return state.features()
 
 
 # ============================================================================
 # PREDICTION ENGINE
 # ============================================================================
 
-def predict_next_12_hours_multi_model(df_24h: pd.DataFrame) -> List[Dict]:
-    """Predict next 12 hours using 12 separate models"""
+def build_model_input(df_24h: pd.DataFrame, feature_names: List[str],
+                      latitude: float = None, longitude: float = None):
+    """Single-row model input for the latest hour of df_24h (sorted by hour_timestamp)"""
     
-    models, feature_names = load_multi_horizon_models()
+    if USE_INCREMENTAL_FEATURES:
+        # Ring-buffer features, missing values filled with 0 like the pandas path
+        X = calculate_feature_vector(df_24h, feature_names, latitude, longitude)
+        return np.where(np.isnan(X), 0.0, X).reshape(1, -1)
     
     # Calculate features
     features_df = calculate_features_from_24h_data(df_24h)
     
     # Select features
     X = features_df[feature_names]
-    X = X.bfill().ffill().fillna(0)
+    return X.bfill().ffill().fillna(0)
+
+
+def format_horizon_predictions(current_time, horizon_predictions) -> List[Dict]:
+    """Turn one row of predict_all_horizons output into the hourly forecast list"""
     
     predictions = []
-    current_time = df_24h['hour_timestamp'].max()
-    
-    # Use each model
-    for hours_ahead in range(1, 13):
-        if hours_ahead in models:
-            model = models[hours_ahead]
-            predicted_aqi = model.predict(X)[0]
-            prediction_time = current_time + timedelta(hours=hours_ahead)
-            
-            predictions.append({
-                'hour': hours_ahead,
-                'timestamp': prediction_time.strftime('%Y-%m-%d %H:%M:%S'),
-                'aqi': round(predicted_aqi, 2),
-                'category': get_aqi_category(predicted_aqi)
-            })
+    for hours_ahead, predicted_aqi in zip(PREDICTION_HORIZONS, horizon_predictions):
+        if np.isnan(predicted_aqi):
+            continue
+        prediction_time = current_time + timedelta(hours=hours_ahead)
+        
+        predictions.append({
+            'hour': hours_ahead,
+            'timestamp': prediction_time.strftime('%Y-%m-%d %H:%M:%S'),
+            'aqi': round(float(predicted_aqi), 2),
+            'category': indian_aqi_category(predicted_aqi)
+        })
+    return predictions
+
+
+def predict_next_12_hours_multi_model(df_24h: pd.DataFrame, latitude: float = None,
+                                      longitude: float = None) -> List[Dict]:
+    """Predict next 12 hours for all horizons in a single model pass"""
+    
+    model_set = get_model_set()
+    df_24h = df_24h.sort_values('hour_timestamp')
+    
+    X = build_model_input(df_24h, model_set.feature_names, latitude, longitude)
+    horizon_predictions = model_set.predict_all_horizons(X)[0]
+    predictions = format_horizon_predictions(df_24h['hour_timestamp'].max(), horizon_predictions)
     
     logger.info(f"✓ Generated {len(predictions)} hourly predictions")
     return predictions
@@ -472,40 +544,71 @@ def predict_next_12_hours_multi_model(df_24h: pd.DataFrame) -> List[Dict]:
 # ============================================================================
 
 def get_aqi_prediction(latitude: float, longitude: float, location_name: str = None, current_aqi: float = None) -> Dict:
-    """Main prediction service"""
+    """Main prediction service (served from the hourly forecast cache when possible)"""
     
     logger.info(f"🔍 Prediction request for ({latitude}, {longitude})")
     start_time = time.time()
     
+    cache_key = forecast_cache.make_key(latitude, longitude)
+    forecast = forecast_cache.get(cache_key)
+    cache_hit = forecast is not None
+    
+    if forecast is None:
+        # Concurrent misses for the same cell share one computation
+        forecast = forecast_singleflight.do(cache_key, compute_and_cache_forecast, cache_key, latitude, longitude)
+    else:
+        logger.info(f"⚡ Forecast cache hit for cell {cache_key[:2]}")
+    
+    if not forecast['success']:
+        return forecast
+    
+    result = apply_request_overrides(forecast, latitude, longitude, location_name, current_aqi)
+    processing_time = int((time.time() - start_time) * 1000)
+    result['metadata']['processing_time_ms'] = processing_time
+    result['metadata']['cache_hit'] = cache_hit
+    result['metadata']['db_connections'] = request_db_stats()['connections']
+    
+    logger.info(f"✅ Prediction completed in {processing_time}ms")
+    return result
+
+
+def compute_and_cache_forecast(cache_key, latitude: float, longitude: float) -> Dict:
+    """Compute a forecast for a cache cell and store it (run once per in-flight key)"""
+    # A flight that finished just before this one started may have filled the cache
+    if forecast_cache.contains(cache_key):
+        forecast = forecast_cache.get(cache_key)
+        if forecast is not None:
+            return forecast
+    
+    # Another worker (or the hourly warmer) may have computed it already
+    model_version = get_model_set().version
+    forecast = load_shared([cache_key], model_version).get(cache_key)
+    if forecast is not None:
+        logger.info(f"⚡ Shared forecast snapshot for cell {cache_key[:2]}")
+        forecast_cache.set(cache_key, forecast)
+        return forecast
+    
+    forecast = compute_aqi_forecast(latitude, longitude, cache_key[2])
+    if forecast['success']:
+        forecast_cache.set(cache_key, forecast)
+        save_shared({cache_key: forecast}, model_version)
+    return forecast
+
+
+def compute_aqi_forecast(latitude: float, longitude: float, now: datetime) -> Dict:
+    """Build the forecast for the hour starting at `now` (no per-request overrides)"""
+    
     try:
         # Define time range
-        now = datetime.now().replace(minute=0, second=0, microsecond=0)
-        from_time = now - timedelta(hours=24)
-        
-        # Check database
-        df_db = get_24h_data_from_db(latitude, longitude, from_time)
+        from_time = now - timedelta(hours=HISTORY_HOURS)
         
-        # Find missing hours
-        existing_hours = set(df_db['hour_timestamp']) if not df_db.empty else set()
-        all_hours = [from_time + timedelta(hours=i) for i in range(25)]
-        missing_hours = [h for h in all_hours if h not in existing_hours]
+        # Check database (stored rows + missing-hour mask in one query)
+        df_db, missing_hours = get_24h_data_from_db(latitude, longitude, from_time)
         
-        # Fetch missing data
-        if missing_hours:
-            logger.info(f"📡 Fetching {len(missing_hours)} missing hours from API")
-            api_start = min(missing_hours)
-            api_end = max(missing_hours) + timedelta(hours=1)
-            
-            hourly_data = fetch_historical_data_from_api(latitude, longitude, api_start, api_end)
-            
-            if hourly_data:
-                connection = get_db_connection()
-                if connection:
-                    store_hourly_data(connection, latitude, longitude, hourly_data)
-                    connection.close()
-                
-                # Re-fetch
-                df_db = get_24h_data_from_db(latitude, longitude, from_time)
+        # Fill missing hours from the API
+        if fill_missing_hours(latitude, longitude, missing_hours):
+            # Re-fetch
+            df_db, _ = get_24h_data_from_db(latitude, longitude, from_time)
         
         # Verify data
         if len(df_db) < 12:
@@ -516,57 +619,219 @@ def get_aqi_prediction(latitude: float, longitude: float, location_name: str = N
             }
         
         # Predict
-        predictions = predict_next_12_hours_multi_model(df_db)
-        
-        # Prepare response
-        df_last_12h = df_db.tail(12).copy()
-        
-        historical_data = []
-        for _, row in df_last_12h.iterrows():
-            historical_data.append({
-                'timestamp': row['hour_timestamp'].strftime('%Y-%m-%d %H:%M:%S'),
-                'aqi': round(row['indian_aqi'], 2) if row['indian_aqi'] else None,
-                'category': get_aqi_category(row['indian_aqi']),
-                'type': 'actual'
-            })
-        
-        current = df_db.iloc[-1]
-        processing_time = int((time.time() - start_time) * 1000)
+        predictions = predict_next_12_hours_multi_model(df_db, latitude, longitude)
         
-        # Use passed current_aqi if available (from WAQI), otherwise use database value (from OpenWeather)
-        if current_aqi is not None:
-            logger.info(f"✓ Using provided current AQI: {current_aqi} (from WAQI)")
-            current_aqi_value = current_aqi
-        else:
-            logger.info(f"✓ Using database current AQI: {current['indian_aqi']} (from OpenWeather)")
-            current_aqi_value = current['indian_aqi']
-        
-        result = {
-            'success': True,
-            'location': {
-                'name': location_name,
-                'latitude': latitude,
-                'longitude': longitude
-            },
-            'current': {
-                'timestamp': current['hour_timestamp'].strftime('%Y-%m-%d %H:%M:%S'),
-                'aqi': round(current_aqi_value, 2) if current_aqi_value else None,
-                'category': get_aqi_category(current_aqi_value)
-            },
-            'historical_data': historical_data,
-            'forecast_data': predictions,
-            'metadata': {
-                'processing_time_ms': processing_time,
-                'data_points_used': len(df_db)
-            }
-        }
-        
-        logger.info(f"✅ Prediction completed in {processing_time}ms")
-        return result
+        return build_forecast_result(df_db, predictions, latitude, longitude)
         
     except Exception as e:
         logger.error(f"❌ Prediction error: {e}")
         return {
             'success': False,
             'error': str(e)
-        }
\ No newline at end of file
+        }
+
+
+def fill_missing_hours(latitude: float, longitude: float, missing_hours: List[datetime]) -> bool:
+    """Fetch and store only the contiguous missing ranges; True if anything was stored"""
+    
+    if not missing_hours:
+        return False
+    
+    ranges = missing_hour_ranges(missing_hours)
+    logger.info(f"📡 Fetching {len(missing_hours)} missing hours from API in {len(ranges)} range(s)")
+    
+    hourly_data = []
+    for api_start, api_end in ranges:
+        hourly_data.extend(fetch_historical_data_from_api(latitude, longitude, api_start, api_end))
+    
+    if not hourly_data:
+        return False
+    
+    try:
+        with connection() as conn:
+            store_hourly_data(conn, latitude, longitude, hourly_data)
+    except DatabaseUnavailable as e:
+        logger.error(f"Could not store fetched hours: {e}")
+    return True
+
+
+def build_forecast_result(df_db: pd.DataFrame, predictions: List[Dict], latitude: float, longitude: float) -> Dict:
+    """Assemble the cacheable forecast response (last 12h actual + 12h predicted)"""
+    
+    # Prepare response
+    df_last_12h = df_db.tail(12).copy()
+    
+    historical_data = []
+    for _, row in df_last_12h.iterrows():
+        historical_data.append({
+            'timestamp': row['hour_timestamp'].strftime('%Y-%m-%d %H:%M:%S'),
+            'aqi': round(row['indian_aqi'], 2) if row['indian_aqi'] else None,
+            'category': indian_aqi_category(row['indian_aqi']),
+            'type': 'actual'
+        })
+    
+    current = df_db.iloc[-1]
+    
+    return {
+        'success': True,
+        'location': {
+            'name': None,
+            'latitude': latitude,
+            'longitude': longitude
+        },
+        'current': {
+            'timestamp': current['hour_timestamp'].strftime('%Y-%m-%d %H:%M:%S'),
+            'aqi': round(current['indian_aqi'], 2) if current['indian_aqi'] else None,
+            'category': indian_aqi_category(current['indian_aqi'])
+        },
+        'historical_data': historical_data,
+        'forecast_data': predictions,
+        'metadata': {
+            'data_points_used': len(df_db)
+        }
+    }
+
+
+def apply_request_overrides(forecast: Dict, latitude: float, longitude: float,
+                            location_name: str = None, current_aqi: float = None) -> Dict:
+    """Copy a (possibly cached) forecast and apply the caller's location and WAQI current AQI"""
+    
+    result = copy.deepcopy(forecast)
+    result['location'] = {
+        'name': location_name,
+        'latitude': latitude,
+        'longitude': longitude
+    }
+    
+    # Use passed current_aqi if available (from WAQI), otherwise use database value (from OpenWeather)
+    if current_aqi is not None:
+        logger.info(f"✓ Using provided current AQI: {current_aqi} (from WAQI)")
+        result['current']['aqi'] = round(current_aqi, 2) if current_aqi else None
+        # WAQI reports the US EPA scale, so categorise it on that scale
+        result['current']['category'] = us_aqi_category(current_aqi)
+    else:
+        logger.info(f"✓ Using database current AQI: {result['current']['aqi']} (from OpenWeather)")
+    
+    return result
+
+
+# ============================================================================
+# BATCH PREDICTION SERVICE
+# ============================================================================
+
+def get_aqi_predictions_batch(locations: List[Dict], upstream_budget=None) -> List[Dict]:
+    """
+    Forecast many locations at once.
+    
+    Each location is a dict with 'latitude', 'longitude' and optional
+    'name' / 'current_aqi'. History for every uncached location is read in
+    one SQL query, and all feature rows are predicted in one model pass.
+    Results are returned in input order; a location with a non-finite
+    coordinate gets an error result instead of failing the batch.
+    
+    upstream_budget (optional, e.g. forecast_warmer.UpstreamBudget) is asked
+    to take() one call per OpenWeather range request a location needs; a
+    location it refuses gets an 'over_budget' error result and is not cached.
+    """
+    start_time = time.time()
+    now = forecast_cache.hour_bucket()
+    from_time = now - timedelta(hours=HISTORY_HOURS)
+    
+    forecasts = [None] * len(locations)
+    cache_keys = [None] * len(locations)
+    for idx, loc in enumerate(locations):
+        if np.isfinite(loc['latitude']) and np.isfinite(loc['longitude']):
+            cache_keys[idx] = forecast_cache.make_key(loc['latitude'], loc['longitude'], now)
+        else:
+            forecasts[idx] = {
+                'success': False,
+                'error': 'Invalid coordinates',
+                'message': 'latitude and longitude must be finite numbers'
+            }
+    
+    cache_hits = 0
+    for idx, key in enumerate(cache_keys):
+        if key is not None:
+            forecasts[idx] = forecast_cache.get(key)
+            cache_hits += forecasts[idx] is not None
+    
+    pending = [idx for idx, forecast in enumerate(forecasts) if forecast is None]
+    
+    # Cells this worker has not cached may have snapshots from another worker
+    shared = {}
+    if pending:
+        model_set = get_model_set()
+        shared = load_shared([cache_keys[idx] for idx in pending], model_set.version)
+        for idx in pending:
+            if cache_keys[idx] in shared:
+                forecasts[idx] = shared[cache_keys[idx]]
+                forecast_cache.set(cache_keys[idx], forecasts[idx])
+        pending = [idx for idx in pending if forecasts[idx] is None]
+    
+    if pending:
+        coords = [(locations[idx]['latitude'], locations[idx]['longitude']) for idx in pending]
+        frames, missing = get_24h_data_for_locations(coords, from_time)
+        
+        # Gaps still need API calls per location (one per missing range); re-read those in one query
+        refetch, over_budget = [], set()
+        for pos, (lat, lon) in enumerate(coords):
+            missing_hours = missing.get(pos, [])
+            if (missing_hours and upstream_budget is not None
+                    and not upstream_budget.take(len(missing_hour_ranges(missing_hours)))):
+                over_budget.add(pos)
+                continue
+            if fill_missing_hours(lat, lon, missing_hours):
+                refetch.append(pos)
+        if refetch:
+            refreshed, _ = get_24h_data_for_locations([coords[pos] for pos in refetch], from_time)
+            for new_pos, pos in enumerate(refetch):
+                if new_pos in refreshed:
+                    frames[pos] = refreshed[new_pos]
+        
+        # One feature row per location with enough history
+        ready, rows = [], []
+        for pos, idx in enumerate(pending):
+            if pos in over_budget:
+                forecasts[idx] = {'success': False, 'error': 'Upstream budget exhausted', 'over_budget': True}
+                continue
+            df_db = frames.get(pos)
+            if df_db is None or len(df_db) < 12:
+                forecasts[idx] = {
+                    'success': False,
+                    'error': 'Insufficient data',
+                    'message': f'Only {0 if df_db is None else len(df_db)} hours available'
+                }
+                continue
+            
+            lat, lon = coords[pos]
+            df_db = df_db.sort_values('hour_timestamp')
+            try:
+                rows.append(np.asarray(build_model_input(df_db, model_set.feature_names, lat, lon), dtype=float))
+                ready.append((idx, df_db))
+            except Exception as e:
+                logger.error(f"❌ Feature error for ({lat}, {lon}): {e}")
+                forecasts[idx] = {'success': False, 'error': str(e)}
+        
+        if ready:
+            horizon_matrix = model_set.predict_all_horizons(np.vstack(rows))
+            
+            computed = {}
+            for (idx, df_db), horizon_predictions in zip(ready, horizon_matrix):
+                lat, lon = locations[idx]['latitude'], locations[idx]['longitude']
+                predictions = format_horizon_predictions(df_db['hour_timestamp'].max(), horizon_predictions)
+                forecasts[idx] = build_forecast_result(df_db, predictions, lat, lon)
+                forecast_cache.set(cache_keys[idx], forecasts[idx])
+                computed[cache_keys[idx]] = forecasts[idx]
+            save_shared(computed, model_set.version)
+    
+    results = []
+    for loc, forecast in zip(locations, forecasts):
+        if forecast['success']:
+            forecast = apply_request_overrides(forecast, loc['latitude'], loc['longitude'],
+                                               loc.get('name'), loc.get('current_aqi'))
+        results.append(forecast)
+    
+    processing_time = int((time.time() - start_time) * 1000)
+    logger.info(f"✅ Batch prediction for {len(locations)} locations "
+                f"({cache_hits} cached, {len(shared)} shared) in {processing_time}ms")
+    return results
@@ -1,21 +1,29 @@
 from flask import Blueprint, render_template, request, session, flash, redirect, url_for, jsonify
-import mysql.connector
 from flask_mail import Message
 from app import mail
+from app.db import connection, get_db_cursor
 from datetime import datetime, timedelta
 import random
 
 auth = Blueprint('auth', __name__)
 
-# Database connection
-mycon_obj = mysql.connector.connect(
-    host='localhost',
-    user='root',
-    password='admin123',
-    database='college_placement_database'
-)
 
-cursor_auth = mycon_obj.cursor(dictionary=True)
+def fetch_one(query, params):
+    """First row of a query as a dict (None if no rows), on a pooled connection"""
+    with connection() as conn:
+        cursor = get_db_cursor(conn, dict_cursor=True)
+        cursor.execute(query, params)
+        row = cursor.fetchone()
+        cursor.close()
+    return row
+
+
+def execute(query, params):
+    """Run a write on a pooled connection; committed when it succeeds"""
+    with connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        cursor.close()
 
 # Constants
 OTP_EXPIRY = 60
@@ -26,11 +34,10 @@ STALE_ACCOUNT_SECONDS = 3600
 def cleanup_stale_unverified():
     cutoff = datetime.now() - timedelta(seconds=STALE_ACCOUNT_SECONDS)
     try:
-        cursor_auth.execute(
-            "DELETE FROM aqi_login_data WHERE is_verified=0 AND otp_created_at IS NOT NULL AND otp_created_at < %s",
+        execute(
+            "DELETE FROM aqi_login_data WHERE is_verified = FALSE AND otp_created_at IS NOT NULL AND otp_created_at < %s",
             (cutoff,)
         )
-        mycon_obj.commit()
     except Exception:
         pass
 
@@ -73,14 +80,12 @@ def signup():
             return redirect(url_for('auth.login_signup_page'))
 
         # Check if email already exists
-        cursor_auth.execute('SELECT email, is_verified FROM aqi_login_data WHERE email=%s', (email,))
-        existing_user = cursor_auth.fetchone()
+        existing_user = fetch_one('SELECT email, is_verified FROM aqi_login_data WHERE email=%s', (email,))
 
         if existing_user:
-            if existing_user['is_verified'] == 0:
+            if not existing_user['is_verified']:
                 # Delete unverified account and allow re-signup
-                cursor_auth.execute("DELETE FROM aqi_login_data WHERE email=%s", (email,))
-                mycon_obj.commit()
+                execute("DELETE FROM aqi_login_data WHERE email=%s", (email,))
                 flash('Previous attempt was incomplete. Please try again.', "info")
             else:
                 flash("Email already registered. Please login.", "warning")
@@ -101,11 +106,10 @@ def signup():
             mail.send(msg)
 
             # Insert into database
-            cursor_auth.execute(
-                "INSERT INTO aqi_login_data (username, email, password, role, otp, otp_created_at, is_verified) VALUES (%s, %s, %s, %s, %s, %s, %s)",
-                (username, email, password, role, otp, now, 0)
+            execute(
+                "INSERT INTO aqi_login_data (username, email, password, role, otp, otp_created_at, is_verified) VALUES (%s, %s, %s, %s, %s, %s, FALSE)",
+                (username, email, password, role, otp, now)
             )
-            mycon_obj.commit()
 
             session['user_email'] = email
             flash("OTP sent to your email. Please verify.", "success")
@@ -134,16 +138,15 @@ def login():
             return redirect(url_for('auth.login_signup_page'))
 
         # Check if user exists and password matches
-        cursor_auth.execute(
+        user = fetch_one(
             "SELECT * FROM aqi_login_data WHERE email=%s AND password=%s",
             (email, password)
         )
-        user = cursor_auth.fetchone()
 
         print(user)
 
         if user:
-            if user['is_verified'] == 1:
+            if user['is_verified']:
                 session['user_email'] = user['email']
                 session['user_role'] = user['role']
                 session['user'] = user['username']
@@ -154,8 +157,8 @@ def login():
                     if user['unique_id'] == 'null':
                         print('\ninside try --\n', user['user'])
                         unique_id = user['user'][0:3] + str(random.randint(10000,99999))
-                        cursor_auth.execute(
-                            "INSERT INTO aqi_login_data SET unique_id = %s where email = %s",
+                        execute(
+                            "UPDATE aqi_login_data SET unique_id = %s WHERE email = %s",
                             (unique_id,user['email'])
                         )
                         session['unique_id'] = unique_id
@@ -209,8 +212,7 @@ def verify():
             flash("Please enter the OTP.", "danger")
             return redirect(url_for('auth.verify'))
 
-        cursor_auth.execute("SELECT * FROM aqi_login_data WHERE email=%s", (email,))
-        user = cursor_auth.fetchone()
+        user = fetch_one("SELECT * FROM aqi_login_data WHERE email=%s", (email,))
 
         if not user or not user.get('otp') or not user.get('otp_created_at'):
             flash("Invalid OTP or session. Please request a new one.", "danger")
@@ -229,11 +231,10 @@ def verify():
                 return redirect(url_for('auth.resend_otp'))
 
             if user['otp'] == entered_otp:
-                cursor_auth.execute(
-                    "UPDATE aqi_login_data SET is_verified = 1, otp = NULL, otp_created_at = NULL WHERE email = %s",
+                execute(
+                    "UPDATE aqi_login_data SET is_verified = TRUE, otp = NULL, otp_created_at = NULL WHERE email = %s",
                     (email,)
                 )
-                mycon_obj.commit()
                 flash("Account verified successfully! You can now log in.", "success")
                 session.pop('user_email', None)
 
@@ -252,8 +253,7 @@ def verify():
     # GET request - show verify page
     remaining = 0
     try:
-        cursor_auth.execute("SELECT otp_created_at FROM aqi_login_data WHERE email=%s", (email,))
-        data = cursor_auth.fetchone()
+        data = fetch_one("SELECT otp_created_at FROM aqi_login_data WHERE email=%s", (email,))
         if data and data['otp_created_at']:
             otp_created_at = data['otp_created_at']
             if isinstance(otp_created_at, str):
@@ -275,8 +275,7 @@ def resend_otp():
         flash("Session expired. Please sign up again.", "danger")
         return redirect(url_for('auth.login_signup_page'))
 
-    cursor_auth.execute("SELECT otp_created_at FROM aqi_login_data WHERE email=%s", (email,))
-    data = cursor_auth.fetchone()
+    data = fetch_one("SELECT otp_created_at FROM aqi_login_data WHERE email=%s", (email,))
 
     if data and data['otp_created_at']:
         otp_created_at = data['otp_created_at']
@@ -292,11 +291,10 @@ def resend_otp():
     otp = str(random.randint(100000, 999999))
     otp_created_at = datetime.utcnow()
     try:
-        cursor_auth.execute(
+        execute(
             "UPDATE aqi_login_data SET otp=%s, otp_created_at=%s WHERE email=%s",
             (otp, otp_created_at, email)
         )
-        mycon_obj.commit()
 
         msg = Message(
             'Your New OTP Code',
@@ -0,0 +1,60 @@
+from .extensions import *
+from app.db import pool_stats
+from .aqi_prediction_service import model_registry
+
+admin_auth = Blueprint('admin_auth', __name__)
+
+
+@admin_auth.route('/api/admin/models', methods=['GET'])
+def model_status():
+    """Active model version of this worker, its load time and memory footprint"""
+    if not has_internal_token():
+        return jsonify({'error': 'Unauthorized', 'success': False}), 401
+
+    status = model_registry.status()
+    status['pid'] = os.getpid()
+    return jsonify(status), 200
+
+
+@admin_auth.route('/api/admin/models/reload', methods=['POST'])
+def reload_models():
+    """
+    Load a version on this worker, publish it and swap it in; other workers
+    follow within MODEL_RELOAD_POLL_SECONDS. CURRENT only changes once the
+    version has loaded and passed ModelSet.validate().
+    Body (optional): {"version": "v20250101-020000"} - omit to re-read CURRENT
+    """
+    if not has_internal_token():
+        return jsonify({'error': 'Unauthorized', 'success': False}), 401
+
+    data = request.get_json(silent=True) or {}
+    version = data.get('version')
+    try:
+        if version:
+            model_registry.activate(version)
+            swapped = True
+        else:
+            swapped = model_registry.reload(force=bool(data.get('force')))
+    except FileNotFoundError as e:
+        return jsonify({'error': str(e), 'success': False}), 404
+    except Exception as e:
+        return jsonify({'error': f'Version {version} failed to load: {e}', 'success': False}), 422
+
+    status = model_registry.status()
+    body = {
+        'success': model_registry.last_error is None,
+        'swapped': swapped,
+        'active': status['active'],
+        'last_error': status['last_error'],
+        'pid': os.getpid()
+    }
+    return jsonify(body), 200 if body['success'] else 500
+
+
+@admin_auth.route('/api/admin/db-pool', methods=['GET'])
+def db_pool_status():
+    """Connection pool metrics of this worker (size, waits, health checks, recycling)"""
+    if not has_internal_token():
+        return jsonify({'error': 'Unauthorized', 'success': False}), 401
+
+    return jsonify(pool_stats()), 200
@@ -3,7 +3,8 @@ import json
 import requests
 from .locationService import location_service
 import psycopg2
-from app.db import get_db_connection
+from app.db import connection, request_db_stats, DatabaseUnavailable
+from .personalized_ai_advisor import handle_personalized_recommendation_request, load_user_profiles
 
 ai_advisor_auth = Blueprint('ai_advisor_auth', __name__)
 
@@ -26,22 +27,6 @@ except Exception as e:
     gemini_available = False
 
 
-def get_aqi_category(aqi):
-    """Get AQI category based on value"""
-    if aqi <= 50:
-        return 'Good'
-    elif aqi <= 100:
-        return 'Moderate'
-    elif aqi <= 150:
-        return 'Unhealthy for Sensitive Groups'
-    elif aqi <= 200:
-        return 'Unhealthy'
-    elif aqi <= 300:
-        return 'Very Unhealthy'
-    else:
-        return 'Hazardous'
-
-
 @ai_advisor_auth.route('/ai_advisor', methods=['GET'])
 def ai_advisor():
     """AI Advisor page route - No login required to view page"""
@@ -455,6 +440,33 @@ def get_enhanced_fallback_advice(aqi, aqi_category, pollutants, age, age_group,
     }), 200
 
 
+@ai_advisor_auth.route('/api/aqi/personalized-recommendation', methods=['POST'])
+def personalized_recommendation():
+    """
+    Gemini health recommendation for the current AQI, personalised with the
+    logged-in user's aqi_login_data and user_health_profile rows.
+    Body: {"aqi": 180, "category": "Moderate", "location": "Delhi",
+           "pollutants": {...}, "weather": {...}, "dominant_pollutant": "pm25"}
+    """
+    data = request.get_json(silent=True) or {}
+    
+    # Anonymous users get general advice; no profile lookup, no connection
+    login_profile, health_profile = None, None
+    if 'user_id' in session:
+        try:
+            # Both profile lookups share the request's connection; the block
+            # commits before the Gemini call, so no transaction waits on it
+            with connection() as conn:
+                login_profile, health_profile = load_user_profiles(session['user_id'], conn)
+        except DatabaseUnavailable as e:
+            print(f"⚠️ Profiles unavailable, using general advice: {e}")
+    
+    result, status_code = handle_personalized_recommendation_request(data, login_profile, health_profile)
+    
+    result['metadata'] = {'db_connections': request_db_stats()['connections']}
+    return jsonify(result), status_code
+
+
 @ai_advisor_auth.route('/api/user/check', methods=['GET'])
 def check_user_logged_in():
     """Check if user is logged in and return user data from session"""
@@ -465,15 +477,11 @@ def check_user_logged_in():
         
         try:
             # Fetch user data from database
-            conn = get_db_connection()
-            if not conn:
-                return jsonify({'logged_in': False, 'error': 'Database connection failed'}), 500
-            cursor = conn.cursor()
-            print('cursor is created successfully')
-            cursor.execute("SELECT username, email, age, gender, city FROM aqi_login_data WHERE id = %s", (user_id,))
-            user = cursor.fetchone()
-            cursor.close()
-            conn.close()
+            with connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT username, email, age, gender, city FROM aqi_login_data WHERE id = %s", (user_id,))
+                user = cursor.fetchone()
+                cursor.close()
             
             if user:
                 user_data = {
@@ -491,6 +499,9 @@ def check_user_logged_in():
                 print(f"⚠️ User ID {user_id} not found in database")
                 return jsonify({'logged_in': False}), 401
                 
+        except DatabaseUnavailable as e:
+            print(f"❌ Database connection failed: {e}")
+            return jsonify({'logged_in': False, 'error': 'Database connection failed'}), 500
         except Exception as e:
             print(f"❌ Database error: {e}")
             flash('Cannot fetch user data from database', 'danger')
@@ -512,12 +523,11 @@ def get_user_city():
         
         # Try to fetch from database
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute("SELECT city FROM aqi_login_data WHERE id = %s", (session.get('user_id'),))
-            result = cursor.fetchone()
-            cursor.close()
-            conn.close()
+            with connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT city FROM aqi_login_data WHERE id = %s", (session.get('user_id'),))
+                result = cursor.fetchone()
+                cursor.close()
             
             if result and result[0]:
                 return jsonify({'city': result[0]}), 200
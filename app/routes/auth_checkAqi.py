@@ -1,10 +1,18 @@
 from .extensions import *
 from .locationService import location_service
+import math
 import os
+import time
 import requests
 
 # Import the prediction service
-from .aqi_prediction_service import get_aqi_prediction, load_multi_horizon_models
+from .aqi_prediction_service import get_aqi_prediction, get_aqi_predictions_batch, forecast_singleflight
+from .aqi_history_service import get_aqi_history, RESOLUTIONS, DEFAULT_HISTORY_POINTS, MAX_HISTORY_POINTS, expected_points
+from app.db import DatabaseUnavailable
+from app.forecast_cache import forecast_cache
+from app.db import request_db_stats
+from app.aqi_engine import us_aqi_category
+from app.forecast_warmer import location_demand, forecast_warmer
 
 checkAqi_auth = Blueprint('checkAqi_auth', __name__)
 
@@ -16,28 +24,11 @@ WAQI_API_TOKEN = os.getenv('WAQI_API_TOKEN', '46797eab2434e3cb85537e21e9a80bcb30
 OPENWEATHER_BASE_URL = 'https://api.openweathermap.org/data/2.5'
 OPENWEATHER_API_KEY = os.getenv('OPENWEATHER_API_KEY', '6589ed49a6410165ea63662b113ed824')
 
-# Load ML models at startup
-try:
-    load_multi_horizon_models()
-    print("✅ ML prediction models loaded successfully")
-except Exception as e:
-    print(f"⚠️ Warning: Could not load ML models: {e}")
-
-
-def get_aqi_category(aqi):
-    """Get AQI category based on value"""
-    if aqi <= 50:
-        return 'Good'
-    elif aqi <= 100:
-        return 'Moderate'
-    elif aqi <= 150:
-        return 'Unhealthy for Sensitive Groups'
-    elif aqi <= 200:
-        return 'Unhealthy'
-    elif aqi <= 300:
-        return 'Very Unhealthy'
-    else:
-        return 'Hazardous'
+# Upper bound on locations per batch prediction request
+MAX_BATCH_LOCATIONS = int(os.getenv('MAX_BATCH_LOCATIONS', 100))
+
+# ML models are loaded by create_app's preload_models() (PRELOAD_MODELS) or,
+# with preloading off, by the model registry on the first forecast
 
 
 def fetch_weather_data(lat, lon):
@@ -143,7 +134,7 @@ def get_aqi_by_city(city_name):
             if 'co' in iaqi:
                 pollutants['co'] = iaqi['co'].get('v')
         
-        aqi_category = get_aqi_category(aqi_data['aqi'])
+        aqi_category = us_aqi_category(aqi_data['aqi'])
         
         print(f"\n✅ Complete AQI Data Retrieved:")
         print(f"  📊 Location: {location_data['display_name']}")
@@ -220,7 +211,7 @@ def get_aqi_by_geo():
             if 'co' in iaqi:
                 pollutants['co'] = iaqi['co'].get('v')
         
-        aqi_category = get_aqi_category(aqi_data['aqi'])
+        aqi_category = us_aqi_category(aqi_data['aqi'])
         
         print(f"\n✅ AQI Data Retrieved:")
         print(f"  📊 Location: {location_data['display_name']}")
@@ -273,6 +264,7 @@ def predict_aqi_by_city(city_name):
         location_data = result['location']
         lat = location_data['lat']
         lon = location_data['lon']
+        location_demand.record(lat, lon)
         
         # Get prediction - pass current_aqi if provided
         prediction_result = get_aqi_prediction(lat, lon, location_data['display_name'], current_aqi)
@@ -311,6 +303,7 @@ def predict_aqi_by_geo():
         print(f"\n{'='*60}")
         print(f"🤖 ML Prediction request for: ({lat}, {lon})")
         print(f"{'='*60}")
+        location_demand.record(lat, lon)
         
         # Get location name
         result = location_service.get_aqi_from_coordinates(lat, lon)
@@ -335,6 +328,146 @@ def predict_aqi_by_geo():
         return jsonify({'error': str(e), 'success': False}), 500
 
 
+@checkAqi_auth.route('/api/aqi/predict/batch', methods=['POST'])
+def predict_aqi_batch():
+    """
+    Get 24-hour AQI predictions for many coordinates in one call
+    Body: {"locations": [{"lat": 28.61, "lon": 77.21, "name": "Delhi", "current_aqi": 180}, ...]}
+    """
+    try:
+        start_time = time.time()
+        data = request.get_json(silent=True) or {}
+        raw_locations = data.get('locations') if isinstance(data, dict) else None
+        
+        if not isinstance(raw_locations, list) or not raw_locations:
+            return jsonify({'error': 'locations must be a non-empty list', 'success': False}), 400
+        
+        if len(raw_locations) > MAX_BATCH_LOCATIONS:
+            return jsonify({
+                'error': f'At most {MAX_BATCH_LOCATIONS} locations per request',
+                'success': False
+            }), 400
+        
+        locations = []
+        for item in raw_locations:
+            try:
+                locations.append({
+                    'latitude': float(item['lat']),
+                    'longitude': float(item.get('lon', item.get('lng'))),
+                    'name': item.get('name'),
+                    'current_aqi': float(item['current_aqi']) if item.get('current_aqi') is not None else None
+                })
+            except (AttributeError, KeyError, TypeError, ValueError):
+                return jsonify({'error': f'Invalid location: {item}', 'success': False}), 400
+            # float() accepts NaN/inf, which cannot be snapped to a cache cell
+            values = [v for v in locations[-1].values() if isinstance(v, float)]
+            if not all(math.isfinite(v) for v in values):
+                return jsonify({'error': f'Non-finite value in location: {item}', 'success': False}), 400
+        
+        print(f"\n🤖 Batch ML prediction request for {len(locations)} locations")
+        for location in locations:
+            location_demand.record(location['latitude'], location['longitude'])
+        
+        results = get_aqi_predictions_batch(locations)
+        processing_time = int((time.time() - start_time) * 1000)
+        
+        return jsonify({
+            'success': True,
+            'count': len(results),
+            'results': results,
+            'metadata': {
+                'processing_time_ms': processing_time,
+                'per_location_ms': round(processing_time / len(results), 2),
+                'db_connections': request_db_stats()['connections']
+            }
+        }), 200
+        
+    except Exception as e:
+        print(f"❌ Batch prediction error: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e), 'success': False}), 500
+
+
+def _parse_history_time(value: str) -> datetime:
+    """
+    ISO date/datetime as a naive local datetime, the clock hour_timestamp and
+    datetime.now() use; an explicit offset (e.g. +05:30) is converted to it
+    """
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+
+@checkAqi_auth.route('/api/aqi/history', methods=['GET'])
+def aqi_history():
+    """
+    Historical AQI series for charts
+    Query: lat, lon (or lng), from, to (ISO dates/datetimes; default the last 7 days),
+           resolution = auto | hour | day | week (default auto), points = point budget for auto
+    """
+    try:
+        start_time = time.time()
+        lat = request.args.get('lat', type=float)
+        lon = request.args.get('lon', type=float)
+        if lon is None:
+            lon = request.args.get('lng', type=float)
+        if lat is None or lon is None:
+            return jsonify({'error': 'Missing latitude or longitude', 'success': False}), 400
+        
+        try:
+            to_time = _parse_history_time(request.args['to']) if request.args.get('to') else datetime.now()
+            from_time = (_parse_history_time(request.args['from']) if request.args.get('from')
+                         else to_time - timedelta(days=7))
+        except ValueError:
+            return jsonify({'error': 'from/to must be ISO dates, e.g. 2025-01-31 or 2025-01-31T12:00', 'success': False}), 400
+        if from_time >= to_time:
+            return jsonify({'error': 'from must be before to', 'success': False}), 400
+        
+        resolution = request.args.get('resolution', 'auto').lower()
+        if resolution != 'auto' and resolution not in RESOLUTIONS:
+            return jsonify({'error': f"resolution must be auto, {', '.join(RESOLUTIONS)}", 'success': False}), 400
+        
+        max_points = min(request.args.get('points', DEFAULT_HISTORY_POINTS, type=int), MAX_HISTORY_POINTS)
+        if max_points < 1:
+            return jsonify({'error': 'points must be positive', 'success': False}), 400
+        if resolution != 'auto' and expected_points(resolution, from_time, to_time) > MAX_HISTORY_POINTS:
+            return jsonify({
+                'error': f'More than {MAX_HISTORY_POINTS} {resolution} points; use a coarser resolution or auto',
+                'success': False
+            }), 400
+        
+        result = get_aqi_history(lat, lon, from_time, to_time, resolution, max_points)
+        result['metadata'] = {
+            'processing_time_ms': int((time.time() - start_time) * 1000),
+            'point_budget': max_points,
+            'db_connections': request_db_stats()['connections']
+        }
+        return jsonify(result), 200
+        
+    except DatabaseUnavailable as e:
+        print(f"❌ History database error: {e}")
+        return jsonify({'error': 'Database unavailable', 'success': False}), 503
+    except Exception as e:
+        print(f"❌ History error: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e), 'success': False}), 500
+
+
+@checkAqi_auth.route('/api/aqi/predict/cache/stats', methods=['GET'])
+def forecast_cache_stats():
+    """Hit/miss counters of the hourly forecast cache (per worker process)"""
+    stats = forecast_cache.stats()
+    stats['last_warm_up'] = forecast_warmer.last_run
+    stats['single_flight'] = {
+        'forecast': forecast_singleflight.stats(),
+        'location_name': location_service.location_flight.stats()
+    }
+    return jsonify(stats), 200
+
+
 # ============================================================================
 # EXISTING ENDPOINTS
 # ============================================================================
@@ -352,7 +485,7 @@ def get_aqi_by_station(uid):
             aqi_value = station_data.get('aqi')
             
             if aqi_value:
-                station_data['category'] = get_aqi_category(int(aqi_value))
+                station_data['category'] = us_aqi_category(int(aqi_value))
             
             return jsonify(station_data), 200
         
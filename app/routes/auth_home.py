@@ -1,5 +1,5 @@
 from .extensions import *
-from app.db import get_db_connection
+from app.db import connection
 
 home_auth = Blueprint('home_auth', __name__)
 
@@ -9,16 +9,13 @@ def get_active_user_count():
     Returns: Integer count of users
     """
     try:
-        conn = get_db_connection()
-        if not conn:
-            return 0
-        cursor_home_auth = conn.cursor()
-        # Fixed SQL query - removed space in table name
-        query = 'SELECT COUNT(id) FROM aqi_login_data;'
-        cursor_home_auth.execute(query)
-        result = cursor_home_auth.fetchone()
-        cursor_home_auth.close()
-        conn.close()
+        with connection() as conn:
+            cursor_home_auth = conn.cursor()
+            # Fixed SQL query - removed space in table name
+            query = 'SELECT COUNT(id) FROM aqi_login_data;'
+            cursor_home_auth.execute(query)
+            result = cursor_home_auth.fetchone()
+            cursor_home_auth.close()
         
         # Extract count from result tuple
         user_count = result[0] if result else 0
@@ -346,11 +346,7 @@ def get_fallback_recommendations(aqi, aqi_category, dominant_pollutant):
 def store_alert_in_db(user_email, alert, recommendations):
     """Store alert in PostgreSQL database"""
     try:
-        from app.db import get_db_connection
-        conn = get_db_connection()
-        if not conn:
-            return
-        cursor = conn.cursor()
+        from app.db import connection
         
         # Store with expiry time (30 minutes after creation)
         expiry_time = datetime.now() + timedelta(minutes=30)
@@ -361,31 +357,45 @@ def store_alert_in_db(user_email, alert, recommendations):
         # Convert pollutants dict to JSON string
         pollutants_json = json.dumps(alert.get('pollutants', {}))
         
+        # user_email is the primary key: the new alert replaces the user's
+        # previous one, including an expired row the sweeper has not reached yet
         query = """
         INSERT INTO tracking_alerts 
         (user_email, alert_type, alert_timestamp, location, latitude, longitude, 
          aqi, aqi_category, message, recommendations, pollutants, expiry_time)
         VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        ON CONFLICT (user_email) DO UPDATE SET
+            alert_type = EXCLUDED.alert_type,
+            alert_timestamp = EXCLUDED.alert_timestamp,
+            location = EXCLUDED.location,
+            latitude = EXCLUDED.latitude,
+            longitude = EXCLUDED.longitude,
+            aqi = EXCLUDED.aqi,
+            aqi_category = EXCLUDED.aqi_category,
+            message = EXCLUDED.message,
+            recommendations = EXCLUDED.recommendations,
+            pollutants = EXCLUDED.pollutants,
+            expiry_time = EXCLUDED.expiry_time,
+            created_at = CURRENT_TIMESTAMP
         """
         
-        cursor.execute(query, (
-            user_email,
-            alert['type'],
-            datetime.fromisoformat(alert['timestamp']),
-            alert['location'],
-            alert['latitude'],
-            alert['longitude'],
-            alert['aqi'],
-            alert['aqi_category'],
-            alert['message'],
-            recommendations_json,
-            pollutants_json,
-            expiry_time
-        ))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, (
+                user_email,
+                alert['type'],
+                datetime.fromisoformat(alert['timestamp']),
+                alert['location'],
+                alert['latitude'],
+                alert['longitude'],
+                alert['aqi'],
+                alert['aqi_category'],
+                alert['message'],
+                recommendations_json,
+                pollutants_json,
+                expiry_time
+            ))
+            cursor.close()
         
         print(f"✓ Alert stored in database (expires at {expiry_time})")
         
@@ -396,20 +406,11 @@ def store_alert_in_db(user_email, alert, recommendations):
 
 
 def get_alerts_from_db(user_email):
-    """Retrieve active alerts from database and clean up expired ones"""
+    """Retrieve active alerts from database (expired rows are removed by app.alert_sweeper)"""
     try:
-        from app.db import get_db_connection
-        conn = get_db_connection()
-        if not conn:
-            return []
-        cursor = conn.cursor()
-        
-        # First, delete expired alerts
-        delete_query = "DELETE FROM tracking_alerts WHERE expiry_time < NOW()"
-        cursor.execute(delete_query)
-        conn.commit()
-        
-        # Get active alerts
+        from app.db import connection
+        
+        # Get active alerts (idx_tracking_alerts_user_active skips expired rows)
         query = """
         SELECT alert_type, alert_timestamp, location, latitude, longitude,
                aqi, aqi_category, message, recommendations, pollutants
@@ -419,10 +420,11 @@ def get_alerts_from_db(user_email):
         LIMIT 50
         """
         
-        cursor.execute(query, (user_email,))
-        rows = cursor.fetchall()
-        cursor.close()
-        conn.close()
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, (user_email,))
+            rows = cursor.fetchall()
+            cursor.close()
         
         alerts = []
         for row in rows:
@@ -455,19 +457,14 @@ def get_alerts_from_db(user_email):
 def clear_alerts_from_db(user_email):
     """Clear all alerts for user from database"""
     try:
-        from app.db import get_db_connection
-        conn = get_db_connection()
-        if not conn:
-            return
-        cursor = conn.cursor()
+        from app.db import connection
         
         query = "DELETE FROM tracking_alerts WHERE user_email = %s"
-        cursor.execute(query, (user_email,))
-        conn.commit()
-        
-        deleted_count = cursor.rowcount
-        cursor.close()
-        conn.close()
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, (user_email,))
+            deleted_count = cursor.rowcount
+            cursor.close()
         
         print(f"✓ Deleted {deleted_count} alerts from database")
         
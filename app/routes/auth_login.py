@@ -4,7 +4,7 @@ from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timedelta
 import psycopg2
 import random
-from app.db import get_db_connection
+from app.db import connection, DatabaseUnavailable
 from app.__init__ import mail
 
 
@@ -39,16 +39,15 @@ def verify_page():
     # Calculate remaining time
     email = session['verification_email']
     
-    mycon = get_db_connection()
-    if not mycon:
+    try:
+        with connection() as mycon:
+            cursor = mycon.cursor()
+            cursor.execute("SELECT otp_created_at FROM aqi_login_data WHERE email = %s", (email,))
+            result = cursor.fetchone()
+            cursor.close()
+    except DatabaseUnavailable:
         flash('Database connection failed. Please try again later.', 'error')
         return redirect(url_for('home_auth.aqi_homepage'))
-        
-    cursor = mycon.cursor()
-    cursor.execute("SELECT otp_created_at FROM aqi_login_data WHERE email = %s", (email,))
-    result = cursor.fetchone()
-    cursor.close()
-    mycon.close()
     
     remaining = 600  # Default 10 minutes
     if result and result[0]:
@@ -78,49 +77,40 @@ def verify():
             flash('Please enter a valid 6-digit OTP', 'error')
             return redirect(url_for('login_auth.verify_page'))
         
-        mycon = get_db_connection()
-        if not mycon:
-            flash('Database connection failed. Please try again later.', 'error')
-            return redirect(url_for('login_auth.verify_page'))
+        with connection() as mycon:
+            cursor = mycon.cursor()
+            cursor.execute(
+                "SELECT otp, otp_created_at FROM aqi_login_data WHERE email = %s",
+                (email,)
+            )
+            result = cursor.fetchone()
             
-        cursor = mycon.cursor()
-        cursor.execute(
-            "SELECT otp, otp_created_at FROM aqi_login_data WHERE email = %s",
-            (email,)
-        )
-        result = cursor.fetchone()
-        
-        if not result:
-            cursor.close()
-            mycon.close()
-            flash('User not found. Please sign up again.', 'error')
-            return redirect(url_for('login_auth.login_signup_page', form='signup'))
-        
-        stored_otp, otp_created_at = result
-        
-        # Check if OTP is expired (10 minutes)
-        # Use utcnow() to match DB (UTC)
-        if datetime.utcnow() - otp_created_at > timedelta(minutes=10):
-            cursor.close()
-            mycon.close()
-            flash('OTP has expired. Please request a new code.', 'error')
-            return redirect(url_for('login_auth.verify_page'))
-        
-        # Verify OTP
-        if stored_otp != otp:
+            if not result:
+                cursor.close()
+                flash('User not found. Please sign up again.', 'error')
+                return redirect(url_for('login_auth.login_signup_page', form='signup'))
+            
+            stored_otp, otp_created_at = result
+            
+            # Check if OTP is expired (10 minutes)
+            # Use utcnow() to match DB (UTC)
+            if datetime.utcnow() - otp_created_at > timedelta(minutes=10):
+                cursor.close()
+                flash('OTP has expired. Please request a new code.', 'error')
+                return redirect(url_for('login_auth.verify_page'))
+            
+            # Verify OTP
+            if stored_otp != otp:
+                cursor.close()
+                flash('Invalid OTP. Please try again.', 'error')
+                return redirect(url_for('login_auth.verify_page'))
+            
+            # Mark as verified
+            cursor.execute(
+                "UPDATE aqi_login_data SET is_verified = TRUE, otp = NULL WHERE email = %s",
+                (email,)
+            )
             cursor.close()
-            mycon.close()
-            flash('Invalid OTP. Please try again.', 'error')
-            return redirect(url_for('login_auth.verify_page'))
-        
-        # Mark as verified
-        cursor.execute(
-            "UPDATE aqi_login_data SET is_verified = TRUE, otp = NULL WHERE email = %s",
-            (email,)
-        )
-        mycon.commit()
-        cursor.close()
-        mycon.close()
         
         # Clear verification session
         session.pop('verification_email', None)
@@ -129,6 +119,9 @@ def verify():
         flash('Email verified successfully! You can now log in.', 'success')
         return redirect(url_for('login_auth.login_signup_page'))
         
+    except DatabaseUnavailable:
+        flash('Database connection failed. Please try again later.', 'error')
+        return redirect(url_for('login_auth.verify_page'))
     except Exception as e:
         print(f"❌ Verification error: {str(e)}")
         import traceback
@@ -151,19 +144,13 @@ def resend_otp():
         # Generate new OTP
         otp = ''.join([str(random.randint(0, 9)) for _ in range(6)])
         
-        mycon = get_db_connection()
-        if not mycon:
-            flash('Database connection failed. Please try again later.', 'error')
-            return redirect(url_for('login_auth.verify_page'))
-            
-        cursor = mycon.cursor()
-        cursor.execute(
-            "UPDATE aqi_login_data SET otp = %s, otp_created_at = NOW() WHERE email = %s",
-            (otp, email)
-        )
-        mycon.commit()
-        cursor.close()
-        mycon.close()
+        with connection() as mycon:
+            cursor = mycon.cursor()
+            cursor.execute(
+                "UPDATE aqi_login_data SET otp = %s, otp_created_at = NOW() WHERE email = %s",
+                (otp, email)
+            )
+            cursor.close()
         
         # Send OTP email
         try:
@@ -176,6 +163,9 @@ def resend_otp():
         
         return redirect(url_for('login_auth.verify_page'))
         
+    except DatabaseUnavailable:
+        flash('Database connection failed. Please try again later.', 'error')
+        return redirect(url_for('login_auth.verify_page'))
     except Exception as e:
         print(f"❌ Resend OTP error: {str(e)}")
         import traceback
@@ -201,15 +191,11 @@ def login():
         if not email or not password:
             return jsonify({'success': False, 'message': 'Email and password required'}), 400
         
-        mycon = get_db_connection()
-        if not mycon:
-            return jsonify({'success': False, 'message': 'Database connection failed'}), 503
-            
-        cursor = mycon.cursor()
-        cursor.execute("SELECT id, username, email, age, gender, city, password, is_verified FROM aqi_login_data WHERE email = %s", (email,))
-        user = cursor.fetchone()
-        cursor.close()
-        mycon.close()
+        with connection() as mycon:
+            cursor = mycon.cursor()
+            cursor.execute("SELECT id, username, email, age, gender, city, password, is_verified FROM aqi_login_data WHERE email = %s", (email,))
+            user = cursor.fetchone()
+            cursor.close()
         
         if not user:
             return jsonify({'success': False, 'message': 'Invalid email or password\nPlease Sign Up first'}), 401
@@ -272,6 +258,8 @@ def login():
             }
         }), 200
         
+    except DatabaseUnavailable:
+        return jsonify({'success': False, 'message': 'Database connection failed'}), 503
     except Exception as e:
         print(f"❌ Login error: {str(e)}")
         import traceback
@@ -301,28 +289,22 @@ def signup():
         # Generate OTP
         otp = ''.join([str(random.randint(0, 9)) for _ in range(6)])
         
-        mycon = get_db_connection()
-        if not mycon:
-            return jsonify({'success': False, 'message': 'Database connection failed'}), 503
+        with connection() as mycon:
+            cursor = mycon.cursor()
             
-        cursor = mycon.cursor()
-        
-        # Check if email already exists
-        cursor.execute("SELECT email FROM aqi_login_data WHERE email = %s", (email,))
-        if cursor.fetchone():
+            # Check if email already exists
+            cursor.execute("SELECT email FROM aqi_login_data WHERE email = %s", (email,))
+            if cursor.fetchone():
+                cursor.close()
+                return jsonify({'success': False, 'message': 'Email already registered'}), 409
+            
+            # Insert user
+            cursor.execute(
+                """INSERT INTO aqi_login_data (username, email, age, gender, city, password, otp, otp_created_at, is_verified) 
+                   VALUES (%s, %s, %s, %s, %s, %s, %s, NOW(), FALSE)""",
+                (username, email, age, gender, city, hashed_password, otp)
+            )
             cursor.close()
-            mycon.close()
-            return jsonify({'success': False, 'message': 'Email already registered'}), 409
-        
-        # Insert user
-        cursor.execute(
-            """INSERT INTO aqi_login_data (username, email, age, gender, city, password, otp, otp_created_at, is_verified) 
-               VALUES (%s, %s, %s, %s, %s, %s, %s, NOW(), FALSE)""",
-            (username, email, age, gender, city, hashed_password, otp)
-        )
-        mycon.commit()
-        cursor.close()
-        mycon.close()
         
         # Store email in session for verify page
         session['verification_email'] = email
@@ -340,6 +322,8 @@ def signup():
             'message': 'Registration successful! Please check your email for OTP.'
         }), 201
         
+    except DatabaseUnavailable:
+        return jsonify({'success': False, 'message': 'Database connection failed'}), 503
     except Exception as e:
         print(f"❌ Signup error: {str(e)}")
         import traceback
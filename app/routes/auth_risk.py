@@ -0,0 +1,206 @@
+from .extensions import *
+import time
+import numpy as np
+from flask import Response
+from psycopg2.extras import RealDictCursor
+from app.db import connection, DatabaseUnavailable
+from app.risk import JITTER, calculate_risk_index_batch
+
+risk_auth = Blueprint('risk_auth', __name__)
+
+# Rows scored and streamed per step (also the DB fetch size for cohorts)
+RISK_STREAM_CHUNK_ROWS = int(os.getenv('RISK_STREAM_CHUNK_ROWS', 5000))
+
+# Upper bound on rows in an explicit-columns request
+MAX_RISK_BATCH_ROWS = int(os.getenv('MAX_RISK_BATCH_ROWS', 1_000_000))
+
+# Defaults for people without a health profile
+DEFAULT_AGE = 30
+DEFAULT_EXPOSURE_HOURS = 2.0
+DEFAULT_ACTIVITY_LEVEL = 5          # user_health_profile scale 1-10
+
+MAX_CONDITIONS = 8
+MAX_SYMPTOMS = 8
+EMPTY_ANSWERS = {'', 'none', 'no', 'nil', 'na', 'n/a'}
+
+COLUMN_DEFAULTS = {
+    'sex': 0,
+    'pre_existing_condition': 0,
+    'current_symptoms': 0,
+    'exposure_hours': DEFAULT_EXPOSURE_HOURS,
+    'season': 0,
+    'activity_level': 1
+}
+
+
+def _count_items(text, limit):
+    """Number of comma-separated entries in a free-text answer"""
+    if not text:
+        return 0
+    return min(limit, sum(1 for item in str(text).split(',') if item.strip().lower() not in EMPTY_ANSWERS))
+
+
+def cohort_risk_inputs(rows, aqi, season):
+    """
+    Map aqi_login_data + user_health_profile rows to calculate_risk_index_batch
+    arguments. Activity 1-10 becomes the model's 0-2 (1-3, 4-7, 8-10).
+    """
+    activity_level = np.array([
+        DEFAULT_ACTIVITY_LEVEL if r['physical_activity_level'] is None else r['physical_activity_level']
+        for r in rows
+    ], dtype=float)
+
+    return {
+        'age': np.array([DEFAULT_AGE if r['age'] is None else r['age'] for r in rows], dtype=float),
+        'sex': np.array([1 if str(r['gender'] or '').lower().startswith('m') else 0 for r in rows]),
+        'aqi': np.full(len(rows), float(aqi)),
+        'condition': np.array([_count_items(r['chronic_conditions'], MAX_CONDITIONS) for r in rows]),
+        'symptoms': np.array([_count_items(r['current_problems'], MAX_SYMPTOMS) for r in rows]),
+        'exposure': np.array([
+            DEFAULT_EXPOSURE_HOURS if r['daily_outdoor_hours'] is None else r['daily_outdoor_hours']
+            for r in rows
+        ], dtype=float),
+        'season': np.full(len(rows), season),
+        'activity': np.digitize(activity_level, [4, 8])
+    }
+
+
+def _score(inputs, rng):
+    """Batch score; rng=None is the deterministic mode (no ±JITTER variation)"""
+    jitter = None if rng is None else rng.uniform(-JITTER, JITTER, len(inputs['aqi']))
+    return calculate_risk_index_batch(**inputs, jitter=jitter)
+
+
+def _ndjson(obj):
+    return json.dumps(obj, separators=(',', ':')) + '\n'
+
+
+def stream_column_scores(columns, rng, start_time):
+    """NDJSON lines for explicit column arrays, scored RISK_STREAM_CHUNK_ROWS at a time"""
+    n_rows = len(columns['aqi'])
+    ids = columns.get('id')
+    for start in range(0, n_rows, RISK_STREAM_CHUNK_ROWS):
+        end = min(start + RISK_STREAM_CHUNK_ROWS, n_rows)
+        scores = _score({
+            'age': columns['age'][start:end],
+            'sex': columns['sex'][start:end],
+            'aqi': columns['aqi'][start:end],
+            'condition': columns['pre_existing_condition'][start:end],
+            'symptoms': columns['current_symptoms'][start:end],
+            'exposure': columns['exposure_hours'][start:end],
+            'season': columns['season'][start:end],
+            'activity': columns['activity_level'][start:end]
+        }, rng)
+        yield ''.join(
+            _ndjson({'id': ids[start + i] if ids is not None else start + i, 'risk_index': int(score)})
+            for i, score in enumerate(scores)
+        )
+    yield _ndjson({'done': True, 'count': n_rows, 'processing_time_ms': int((time.time() - start_time) * 1000)})
+
+
+def stream_cohort_scores(city, aqi, rng, start_time):
+    """NDJSON lines for every verified user in a city, read with a server-side cursor"""
+    count = 0
+    try:
+        with connection() as conn:
+            cursor = conn.cursor('risk_cohort', cursor_factory=RealDictCursor)
+            cursor.itersize = RISK_STREAM_CHUNK_ROWS
+            cursor.execute("""
+                SELECT l.id, l.email, l.age, l.gender,
+                       h.chronic_conditions, h.current_problems,
+                       h.daily_outdoor_hours, h.physical_activity_level
+                FROM aqi_login_data l
+                LEFT JOIN user_health_profile h ON h.email = l.email
+                WHERE LOWER(l.city) = LOWER(%s) AND l.is_verified = TRUE
+                ORDER BY l.id
+            """, (city,))
+
+            season = (datetime.now().month % 12) // 3
+            while True:
+                rows = cursor.fetchmany(RISK_STREAM_CHUNK_ROWS)
+                if not rows:
+                    break
+                scores = _score(cohort_risk_inputs(rows, aqi, season), rng)
+                yield ''.join(
+                    _ndjson({'id': row['id'], 'email': row['email'], 'risk_index': int(score)})
+                    for row, score in zip(rows, scores)
+                )
+                count += len(rows)
+            cursor.close()
+    except DatabaseUnavailable:
+        yield _ndjson({'error': 'Database connection failed', 'success': False})
+        return
+
+    yield _ndjson({'done': True, 'city': city, 'aqi': aqi, 'count': count,
+                   'processing_time_ms': int((time.time() - start_time) * 1000)})
+
+
+@risk_auth.route('/api/risk/batch', methods=['POST'])
+def risk_batch():
+    """
+    Score many people at once; results stream back as NDJSON (one object per
+    line, then a {"done": true, ...} summary line).
+    Body, explicit columns (age, aqi required; others default):
+        {"columns": {"id": [...], "age": [...], "aqi": [...], "pre_existing_condition": [...],
+                     "current_symptoms": [...], "exposure_hours": [...], "activity_level": [...]},
+         "deterministic": true}
+    or a city cohort from aqi_login_data + user_health_profile (X-Internal-Token header):
+        {"city": "Delhi", "aqi": 312, "deterministic": true}
+    "deterministic": false adds the ±5 jitter of calculate_risk_index ("seed" optional).
+    """
+    start_time = time.time()
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Body must be a JSON object', 'success': False}), 400
+
+    rng = None
+    if not data.get('deterministic', True):
+        seed = data.get('seed')
+        if seed is not None and (isinstance(seed, bool) or not isinstance(seed, int) or seed < 0):
+            return jsonify({'error': 'seed must be a non-negative integer', 'success': False}), 400
+        rng = np.random.default_rng(seed)
+
+    if data.get('city'):
+        # Cohort results include user emails
+        if not has_internal_token():
+            return jsonify({'error': 'Unauthorized', 'success': False}), 401
+        try:
+            aqi = float(data['aqi'])
+        except (KeyError, TypeError, ValueError):
+            return jsonify({'error': 'aqi must be a number', 'success': False}), 400
+        if not np.isfinite(aqi):
+            return jsonify({'error': 'aqi must be a finite number', 'success': False}), 400
+
+        print(f"\n🩺 Risk re-score for {data['city']} at AQI {aqi:.0f}")
+        lines = stream_cohort_scores(data['city'], aqi, rng, start_time)
+    else:
+        raw = data.get('columns')
+        if not isinstance(raw, dict) or 'age' not in raw or 'aqi' not in raw:
+            return jsonify({'error': 'Provide "columns" with at least age and aqi, or a "city"', 'success': False}), 400
+
+        try:
+            n_rows = len(raw['aqi'])
+            columns = {'age': np.asarray(raw['age'], dtype=float), 'aqi': np.asarray(raw['aqi'], dtype=float)}
+            for name, default in COLUMN_DEFAULTS.items():
+                columns[name] = np.asarray(raw[name], dtype=float) if name in raw else np.full(n_rows, default)
+            if 'id' in raw:
+                columns['id'] = list(raw['id'])
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': f'Invalid columns: {e}', 'success': False}), 400
+
+        if any(len(values) != n_rows for values in columns.values()):
+            return jsonify({'error': 'All columns must have the same length', 'success': False}), 400
+        if n_rows > MAX_RISK_BATCH_ROWS:
+            return jsonify({'error': f'At most {MAX_RISK_BATCH_ROWS} rows per request', 'success': False}), 400
+
+        # null becomes NaN under dtype=float; NaN/inf would be streamed as int64 garbage
+        non_finite = [name for name, values in columns.items() if name != 'id' and not np.isfinite(values).all()]
+        if non_finite:
+            return jsonify({
+                'error': f"Columns must hold finite numbers (null, NaN or inf in: {', '.join(non_finite)})",
+                'success': False
+            }), 400
+
+        lines = stream_column_scores(columns, rng, start_time)
+
+    return Response(lines, mimetype='application/x-ndjson')
@@ -6,5 +6,18 @@ from app import mail
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timedelta
 import random
+import hmac
 import os
-import json
\ No newline at end of file
+import json
+
+
+# Shared secret for internal/admin endpoints (X-Internal-Token header); unset disables them
+INTERNAL_API_TOKEN = os.getenv('INTERNAL_API_TOKEN')
+
+
+def has_internal_token():
+    """True when the request carries the configured internal API token (constant-time compare)"""
+    token = request.headers.get('X-Internal-Token')
+    if not INTERNAL_API_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token.encode('utf-8'), INTERNAL_API_TOKEN.encode('utf-8'))
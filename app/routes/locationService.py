@@ -10,6 +10,7 @@ from geopy.exc import GeocoderTimedOut, GeocoderServiceError
 from math import radians, sin, cos, sqrt, atan2
 import os
 from flask import Blueprint, request, jsonify
+from app.singleflight import SingleFlight
 
 # AQI API Configuration
 WAQI_API_TOKEN = os.getenv('WAQI_API_TOKEN', '46797eab2434e3cb85537e21e9a80bcb309220e3')
@@ -21,6 +22,8 @@ class LocationService:
     
     def __init__(self):
         self.geolocator = Nominatim(user_agent="aqi_health_advisor")
+        # Concurrent lookups of the same place share one geocode + WAQI call
+        self.location_flight = SingleFlight('location_name')
     
     @staticmethod
     def calculate_distance(lat1, lon1, lat2, lon2):
@@ -197,8 +200,13 @@ class LocationService:
     def get_aqi_from_location_name(self, location_name):
         """
         Complete flow: Location name -> Coordinates -> AQI
-        Returns: dict with location and AQI data
+        Returns: dict with location and AQI data (shared between concurrent
+        identical requests - do not mutate)
         """
+        key = ' '.join(str(location_name).lower().split())
+        return self.location_flight.do(key, self._get_aqi_from_location_name, location_name)
+    
+    def _get_aqi_from_location_name(self, location_name):
         # Step 1: Geocode location
         geocode_result = self.geocode_location(location_name)
         if not geocode_result['success']:
@@ -1,6 +1,5 @@
 import os
 import requests
-from flask import session
 from datetime import datetime
 from app.db import get_db_cursor
 
@@ -576,14 +575,43 @@ EXTREME DANGER for ALL age groups. Life-threatening conditions for everyone, esp
 # Flask Integration Function
 # ============================================================================
 
-def handle_personalized_recommendation_request(request_data, db_connection):
+def load_user_profiles(user_id, db_connection):
+    """
+    Fetch BOTH aqi_login_data and user_health_profile (if available)
+    
+    Args:
+        user_id: User ID from session
+        db_connection: PostgreSQL database connection
+        
+    Returns:
+        tuple: (login_profile, health_profile), either may be None
+    """
+    print(f"👤 User ID {user_id} is logged in - fetching profiles...")
+    
+    # Get basic profile from aqi_login_data
+    login_profile = get_user_profile_from_aqi_login_data(user_id, db_connection)
+    
+    health_profile = None
+    if login_profile and login_profile.get('email'):
+        # Get extended health profile if available
+        health_profile = get_user_health_profile(login_profile['email'], db_connection)
+    
+    if not login_profile and not health_profile:
+        print(f"⚠️ No profiles found for user ID: {user_id}")
+    
+    return login_profile, health_profile
+
+
+def handle_personalized_recommendation_request(request_data, login_profile=None, health_profile=None):
     """
     Handle Flask request for personalized recommendation
-    Fetches BOTH aqi_login_data and user_health_profile (if available)
+    Profiles come from load_user_profiles(), fetched (and the connection
+    released) before this makes the Gemini call
     
     Args:
         request_data: Request JSON data
-        db_connection: PostgreSQL database connection
+        login_profile: aqi_login_data row or None
+        health_profile: user_health_profile fields or None
         
     Returns:
         tuple: (response_dict, status_code)
@@ -596,25 +624,8 @@ def handle_personalized_recommendation_request(request_data, db_connection):
         weather = request_data.get('weather', {})
         dominant_pollutant = request_data.get('dominant_pollutant')
         
-        # Get user profiles if logged in
-        login_profile = None
-        health_profile = None
-        user_id = session.get('user_id')
-        
-        if user_id:
-            print(f"👤 User ID {user_id} is logged in - fetching profiles...")
-            
-            # Get basic profile from aqi_login_data
-            login_profile = get_user_profile_from_aqi_login_data(user_id, db_connection)
-            
-            if login_profile and login_profile.get('email'):
-                # Get extended health profile if available
-                health_profile = get_user_health_profile(login_profile['email'], db_connection)
-            
-            if not login_profile and not health_profile:
-                print(f"⚠️ No profiles found for user ID: {user_id}")
-        else:
-            print("ℹ️ No user logged in - using general recommendations")
+        if not login_profile and not health_profile:
+            print("ℹ️ No user profile - using general recommendations")
         
         # Generate personalized recommendation using BOTH profiles
         result = generate_personalized_recommendation(
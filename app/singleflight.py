@@ -0,0 +1,77 @@
+"""
+Single-Flight Request Coalescing
+================================
+When many threads ask for the same key at once, only the first one runs
+the function; the others wait for it and receive the same result (or the
+same exception). Nothing is cached once the call finishes - that is the
+forecast cache's job - so only truly concurrent duplicates are collapsed.
+
+    flight = SingleFlight('forecast')
+    result = flight.do(key, compute, *args)
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Collapses concurrent calls with the same key into one execution"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls = {}    # key -> _Call in flight
+        self._lock = threading.Lock()
+        self.calls = 0          # do() invocations
+        self.executions = 0     # times the function actually ran
+        self.collapsed = 0      # invocations that waited on another caller
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            if call is not None:
+                self.collapsed += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.executions += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'name': self.name,
+                'calls': self.calls,
+                'executions': self.executions,
+                'collapsed': self.collapsed,
+                'in_flight': len(self._calls),
+                'collapse_rate': round(self.collapsed / self.calls, 4) if self.calls else 0.0
+            }
@@ -1,7 +1,7 @@
 from flask_socketio import emit, join_room, leave_room
 from flask import session, flash
 from . import socketio
-from .db import get_db_connection
+from .db import connection
 from datetime import datetime
 
 @socketio.on('connect')
@@ -27,14 +27,10 @@ def handle_send_message(data):
     '''
     
     try:
-        conn = get_db_connection()
-        if not conn:
-            return
-        cursor_socket = conn.cursor()
-        cursor_socket.execute(sendData_query, (from_user, to_user, message, now.date(), now.time()))
-        conn.commit()
-        cursor_socket.close()
-        conn.close()
+        with connection() as conn:
+            cursor_socket = conn.cursor()
+            cursor_socket.execute(sendData_query, (from_user, to_user, message, now.date(), now.time()))
+            cursor_socket.close()
         print(f'✓ Message saved to database')
     except Exception as e:
         print(f'✗ Database error: {e}')
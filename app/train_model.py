@@ -9,6 +9,10 @@ Trains 12 separate Random Forest models:
 
 This gives much better hourly predictions compared to iterative forecasting.
 
+Optionally also trains a single multi-output Random Forest that predicts all
+12 horizons in one pass, and compares its latency and MAE with the
+per-horizon models.
+
 Author: AQI Prediction System
 """
 
@@ -23,6 +27,9 @@ import seaborn as sns
 from datetime import datetime
 import os
 import json
+import time
+
+from feature_store import engineer_features, add_targets, load_training_frame
 
 # ============================================================================
 # CONFIGURATION
@@ -31,6 +38,9 @@ import json
 # Data configuration
 DATA_FILE = 'aqi_ml_dataset.csv'  # From preprocessing script
 
+# Columnar cache of raw history + features (see feature_store.py); unset = read DATA_FILE every run
+FEATURE_STORE_DIR = os.getenv('FEATURE_STORE_DIR')
+
 # Model configuration
 MODELS_DIR = 'models'
 os.makedirs(MODELS_DIR, exist_ok=True)
@@ -50,6 +60,11 @@ MAX_FEATURES = 0.85
 # Prediction horizons (hours ahead to predict)
 PREDICTION_HORIZONS = list(range(1, 13))  # 1, 2, 3, ..., 12 hours
 
+# Multi-output forecaster (one forest for all horizons)
+TRAIN_MULTI_OUTPUT = True
+MULTI_OUTPUT_MODEL_FILENAME = 'aqi_rf_model_multi.pkl'
+LATENCY_BENCHMARK_ROWS = 200  # Single-row predictions timed per forecaster
+
 
 # ============================================================================
 # FEATURE ENGINEERING FOR MULTI-HORIZON
@@ -68,60 +83,13 @@ def prepare_multi_horizon_data(df_raw):
     df['datetime'] = pd.to_datetime(df['datetime'])
     df = df.sort_values('datetime').reset_index(drop=True)
     
-    # Temporal features
-    print("\n[1/5] Creating temporal features...")
-    df['hour'] = df['datetime'].dt.hour
-    df['day_of_week'] = df['datetime'].dt.dayofweek
-    df['day_of_month'] = df['datetime'].dt.day
-    df['month'] = df['datetime'].dt.month
-    df['is_weekend'] = (df['day_of_week'] >= 5).astype(int)
-    
-    df['hour_sin'] = np.sin(2 * np.pi * df['hour'] / 24)
-    df['hour_cos'] = np.cos(2 * np.pi * df['hour'] / 24)
-    df['dow_sin'] = np.sin(2 * np.pi * df['day_of_week'] / 7)
-    df['dow_cos'] = np.cos(2 * np.pi * df['day_of_week'] / 7)
-    
-    # Lag features
-    print("[2/5] Creating lag features...")
-    lag_hours = [1, 2, 3, 6, 12, 24]
-    pollutants = ['pm2_5', 'pm10', 'no2', 'so2', 'co', 'o3']
-    
-    for pollutant in pollutants:
-        col_name = f'components.{pollutant}'
-        for lag in lag_hours:
-            df[f'{pollutant}_lag_{lag}h'] = df[col_name].shift(lag)
-    
-    for lag in lag_hours:
-        df[f'aqi_lag_{lag}h'] = df['indian_aqi'].shift(lag)
-    
-    # Rolling statistics
-    print("[3/5] Creating rolling statistics...")
-    rolling_windows = [3, 6, 12, 24]
-    
-    for pollutant in pollutants:
-        col_name = f'components.{pollutant}'
-        for window in rolling_windows:
-            df[f'{pollutant}_rolling_mean_{window}h'] = df[col_name].rolling(window=window).mean()
-            df[f'{pollutant}_rolling_std_{window}h'] = df[col_name].rolling(window=window).std()
-    
-    for window in rolling_windows:
-        df[f'aqi_rolling_mean_{window}h'] = df['indian_aqi'].rolling(window=window).mean()
-        df[f'aqi_rolling_std_{window}h'] = df['indian_aqi'].rolling(window=window).std()
-    
-    # Rate of change
-    print("[4/5] Creating rate of change features...")
-    for pollutant in pollutants:
-        col_name = f'components.{pollutant}'
-        df[f'{pollutant}_change_1h'] = df[col_name].diff(1)
-        df[f'{pollutant}_change_3h'] = df[col_name].diff(3)
-    
-    df['aqi_change_1h'] = df['indian_aqi'].diff(1)
-    df['aqi_change_3h'] = df['indian_aqi'].diff(3)
+    # Temporal, lag, rolling and rate-of-change features (shared with the feature store)
+    print("\n[1/2] Creating temporal, lag, rolling and rate of change features...")
+    df = engineer_features(df)
     
     # Create multiple target variables (1h to 12h ahead)
-    print("[5/5] Creating target variables for each horizon...")
-    for hours_ahead in PREDICTION_HORIZONS:
-        df[f'target_aqi_{hours_ahead}h'] = df['indian_aqi'].shift(-hours_ahead)
+    print("[2/2] Creating target variables for each horizon...")
+    df = add_targets(df)
     
     # Drop rows with NaN
     rows_before = len(df)
@@ -152,27 +120,31 @@ def get_feature_columns(df):
 # TRAINING FUNCTIONS
 # ============================================================================
 
-def train_model_for_horizon(X_train, y_train, X_test, y_test, hours_ahead):
-    """Train a Random Forest model for a specific prediction horizon"""
-    
-    print(f"\n{'=' * 70}")
-    print(f"TRAINING MODEL FOR {hours_ahead}H AHEAD")
-    print(f"{'=' * 70}")
-    
-    # Initialize model
-    model = RandomForestRegressor(
+def build_random_forest(n_jobs=-1):
+    """Random Forest with the shared training hyperparameters"""
+    return RandomForestRegressor(
         n_estimators=N_ESTIMATORS,
         max_depth=MAX_DEPTH,
         min_samples_split=MIN_SAMPLES_SPLIT,
         min_samples_leaf=MIN_SAMPLES_LEAF,
         random_state=RANDOM_STATE,
-        n_jobs=-1,
+        n_jobs=n_jobs,
         verbose=0,
         max_features=MAX_FEATURES,
         max_leaf_nodes=MAX_LEAF_NODES,
         min_impurity_decrease=MIN_IMPURITY_DECREASE
-        
     )
+
+
+def train_model_for_horizon(X_train, y_train, X_test, y_test, hours_ahead, n_jobs=-1):
+    """Train a Random Forest model for a specific prediction horizon"""
+    
+    print(f"\n{'=' * 70}")
+    print(f"TRAINING MODEL FOR {hours_ahead}H AHEAD")
+    print(f"{'=' * 70}")
+    
+    # Initialize model
+    model = build_random_forest(n_jobs)
     
 
     # Train
@@ -264,6 +236,103 @@ def train_all_models(df):
     return all_models, all_metrics, feature_cols
 
 
+def train_multi_output_model(df, feature_cols):
+    """Train one Random Forest that predicts all horizons at once"""
+    
+    print(f"\n{'=' * 70}")
+    print(f"TRAINING MULTI-OUTPUT MODEL ({len(PREDICTION_HORIZONS)} HORIZONS)")
+    print(f"{'=' * 70}")
+    
+    target_cols = [f'target_aqi_{hours_ahead}h' for hours_ahead in PREDICTION_HORIZONS]
+    X = df[feature_cols]
+    Y = df[target_cols]
+    
+    X_train, X_test, Y_train, Y_test = train_test_split(
+        X, Y, test_size=TEST_SIZE, random_state=RANDOM_STATE, shuffle=False
+    )
+    
+    model = build_random_forest()
+    
+    print(f"Training on {len(X_train)} samples...")
+    model.fit(X_train, Y_train)
+    
+    Y_train_pred = model.predict(X_train)
+    Y_test_pred = model.predict(X_test)
+    
+    metrics = []
+    for idx, hours_ahead in enumerate(PREDICTION_HORIZONS):
+        y_test = Y_test.iloc[:, idx]
+        metrics.append({
+            'hours_ahead': hours_ahead,
+            'train_mae': float(mean_absolute_error(Y_train.iloc[:, idx], Y_train_pred[:, idx])),
+            'test_mae': float(mean_absolute_error(y_test, Y_test_pred[:, idx])),
+            'test_rmse': float(np.sqrt(mean_squared_error(y_test, Y_test_pred[:, idx]))),
+            'test_r2': float(r2_score(y_test, Y_test_pred[:, idx])),
+            'train_samples': len(X_train),
+            'test_samples': len(X_test)
+        })
+    
+    model_path = os.path.join(MODELS_DIR, MULTI_OUTPUT_MODEL_FILENAME)
+    joblib.dump(model, model_path)
+    print(f"✓ Saved multi-output model to {model_path}")
+    
+    return model, metrics, X_test
+
+
+def compare_forecasters(all_models, per_horizon_metrics, multi_model, multi_metrics, X_test):
+    """Compare single-row latency and MAE of per-horizon vs multi-output models"""
+    
+    print("\n" + "=" * 70)
+    print("PER-HORIZON vs MULTI-OUTPUT COMPARISON")
+    print("=" * 70)
+    
+    n_rows = min(LATENCY_BENCHMARK_ROWS, len(X_test))
+    rows = [X_test.iloc[[i]] for i in range(n_rows)]
+    
+    # Per-horizon: 12 predict calls per request
+    start = time.perf_counter()
+    for row in rows:
+        for hours_ahead in PREDICTION_HORIZONS:
+            all_models[hours_ahead]['model'].predict(row)
+    per_horizon_ms = (time.perf_counter() - start) * 1000 / n_rows
+    
+    # Multi-output: one predict call per request
+    start = time.perf_counter()
+    for row in rows:
+        multi_model.predict(row)
+    multi_ms = (time.perf_counter() - start) * 1000 / n_rows
+    
+    print(f"\nSingle-row latency (mean over {n_rows} rows):")
+    print(f"  Per-horizon (12 models): {per_horizon_ms:7.2f} ms")
+    print(f"  Multi-output (1 model):  {multi_ms:7.2f} ms")
+    
+    print(f"\n{'Horizon':>8} {'Per-horizon MAE':>16} {'Multi-output MAE':>17}")
+    horizons = []
+    for single, multi in zip(per_horizon_metrics, multi_metrics):
+        print(f"{single['hours_ahead']:>7}h {single['test_mae']:>16.2f} {multi['test_mae']:>17.2f}")
+        horizons.append({
+            'hours_ahead': single['hours_ahead'],
+            'per_horizon_test_mae': single['test_mae'],
+            'multi_output_test_mae': multi['test_mae']
+        })
+    
+    comparison = {
+        'latency_ms': {
+            'per_horizon': per_horizon_ms,
+            'multi_output': multi_ms,
+            'rows_timed': n_rows
+        },
+        'horizons': horizons
+    }
+    
+    comparison_path = os.path.join(MODELS_DIR, 'forecaster_comparison.json')
+    with open(comparison_path, 'w') as f:
+        json.dump(comparison, f, indent=2)
+    print(f"\n✓ Saved comparison to {comparison_path}")
+    
+    return comparison
+
+
 # ============================================================================
 # VISUALIZATION
 # ============================================================================
@@ -342,13 +411,15 @@ def main():
     print("=" * 70)
     print(f"\nWill train {len(PREDICTION_HORIZONS)} models for horizons: {PREDICTION_HORIZONS}")
     
-    # Load data
-    print(f"\nLoading data from {DATA_FILE}...")
-    df_raw = pd.read_csv(DATA_FILE)
-    print(f"✓ Loaded {len(df_raw)} records")
-    
-    # Prepare data
-    df_prepared = prepare_multi_horizon_data(df_raw)
+    # Load and prepare data
+    if FEATURE_STORE_DIR:
+        print(f"\nSyncing feature store {FEATURE_STORE_DIR} with {DATA_FILE}...")
+        df_prepared = load_training_frame(DATA_FILE, FEATURE_STORE_DIR)
+    else:
+        print(f"\nLoading data from {DATA_FILE}...")
+        df_raw = pd.read_csv(DATA_FILE)
+        print(f"✓ Loaded {len(df_raw)} records")
+        df_prepared = prepare_multi_horizon_data(df_raw)
     
     # Train all models
     all_models, all_metrics, feature_cols = train_all_models(df_prepared)
@@ -359,6 +430,11 @@ def main():
         json.dump(all_metrics, f, indent=2)
     print(f"\n✓ Saved metrics to {metrics_path}")
     
+    # Train the multi-output forecaster alongside the per-horizon models
+    if TRAIN_MULTI_OUTPUT:
+        multi_model, multi_metrics, X_test = train_multi_output_model(df_prepared, feature_cols)
+        compare_forecasters(all_models, all_metrics, multi_model, multi_metrics, X_test)
+    
     # Create visualizations
     print("\nCreating visualizations...")
     plot_metrics_comparison(all_metrics)
@@ -384,10 +460,15 @@ def main():
     print(f"\nModels saved in: {MODELS_DIR}/")
     print("Files created:")
     print("  - aqi_rf_model_1h.pkl ... aqi_rf_model_12h.pkl")
+    if TRAIN_MULTI_OUTPUT:
+        print(f"  - {MULTI_OUTPUT_MODEL_FILENAME}")
+        print("  - forecaster_comparison.json")
     print("  - feature_names.txt")
     print("  - model_metrics.json")
     print("  - metrics_comparison.png")
     print("  - sample_predictions.png")
+    print("\nExport flat-array models for serving (from the repository root):")
+    print("  python -m app.tree_inference app/models")
     
     return all_models, all_metrics
 
@@ -0,0 +1,261 @@
+"""
+Parallel Multi-Horizon Training
+===============================
+Trains the 12 per-horizon Random Forests concurrently.
+
+The feature matrix is built once and written to memory-mapped .npy files
+(float32 features, the dtype sklearn trees split on). Every worker process
+maps the same file, so no per-horizon copy of X is pickled or held in
+private memory. The CPU budget is split between processes (horizons
+trained at once) and tree jobs (n_jobs inside each forest).
+
+Usage (from the app/ directory, like train_model.py):
+    python train_parallel.py --processes 4 --tree-jobs 2
+
+Writes the same artifacts as train_model.py (models/aqi_rf_model_{h}h.pkl,
+aqi_rf_model_multi.pkl when TRAIN_MULTI_OUTPUT is set, feature_names.txt,
+model_metrics.json) plus training_run.json with wall-clock time and peak
+RSS for the run. The multi-output forest is fitted in the same pool, since
+serving prefers it over the per-horizon models; flat exports of every
+rewritten model are removed so serving cannot pick up the old forests.
+"""
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.metrics import mean_absolute_error
+
+from feature_store import load_training_frame
+from train_model import (
+    DATA_FILE, FEATURE_STORE_DIR, MODELS_DIR, MULTI_OUTPUT_MODEL_FILENAME, PREDICTION_HORIZONS,
+    TEST_SIZE, TRAIN_MULTI_OUTPUT, build_random_forest, prepare_multi_horizon_data,
+    get_feature_columns, train_model_for_horizon
+)
+from tree_inference import flat_model_path
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+CPU_COUNT = os.cpu_count() or 1
+DEFAULT_PROCESSES = int(os.getenv('TRAIN_PROCESSES', min(len(PREDICTION_HORIZONS), CPU_COUNT)))
+DEFAULT_TREE_JOBS = int(os.getenv('TRAIN_TREE_JOBS', max(1, CPU_COUNT // DEFAULT_PROCESSES)))
+
+SHARED_DIR = os.path.join(MODELS_DIR, '_shared')
+RUN_REPORT_FILENAME = 'training_run.json'
+
+
+def _peak_rss_mb(who=resource.RUSAGE_SELF) -> float:
+    """Peak resident set size in MB (ru_maxrss is KB on Linux, bytes on macOS)"""
+    peak = resource.getrusage(who).ru_maxrss
+    return round(peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024, 1)
+
+
+# ============================================================================
+# SHARED FEATURE MATRIX
+# ============================================================================
+
+def write_shared_matrix(df, feature_cols, shared_dir=SHARED_DIR):
+    """Write X (float32) and all horizon targets (float64) once as .npy files"""
+    os.makedirs(shared_dir, exist_ok=True)
+    target_cols = [f'target_aqi_{hours_ahead}h' for hours_ahead in PREDICTION_HORIZONS]
+
+    X_path = os.path.join(shared_dir, 'X.npy')
+    Y_path = os.path.join(shared_dir, 'Y.npy')
+    np.save(X_path, np.ascontiguousarray(df[feature_cols].to_numpy(dtype=np.float32)))
+    np.save(Y_path, np.ascontiguousarray(df[target_cols].to_numpy(dtype=np.float64)))
+    return X_path, Y_path
+
+
+def _split_point(n_rows):
+    """Same chronological split as train_test_split(..., shuffle=False)"""
+    return n_rows - int(np.ceil(n_rows * TEST_SIZE))
+
+
+def _train_horizon_worker(hours_ahead, X_path, Y_path, feature_cols, tree_jobs):
+    """Process-pool task: map the shared matrix, fit one horizon, save it"""
+    X = np.load(X_path, mmap_mode='r')
+    Y = np.load(Y_path, mmap_mode='r')
+    y = Y[:, PREDICTION_HORIZONS.index(hours_ahead)]
+    n_train = _split_point(len(X))
+
+    start = time.perf_counter()
+    model, metrics, _, _ = train_model_for_horizon(
+        X[:n_train], y[:n_train], X[n_train:], y[n_train:], hours_ahead, n_jobs=tree_jobs
+    )
+    # Keep column names like a DataFrame fit, so serving builds the same input
+    model.feature_names_in_ = np.asarray(feature_cols, dtype=object)
+
+    model_path = os.path.join(MODELS_DIR, f'aqi_rf_model_{hours_ahead}h.pkl')
+    joblib.dump(model, model_path)
+
+    metrics['fit_seconds'] = round(time.perf_counter() - start, 2)
+    metrics['worker_pid'] = os.getpid()
+    metrics['worker_peak_rss_mb'] = _peak_rss_mb()
+    return metrics
+
+
+def _train_multi_output_worker(X_path, Y_path, feature_cols, tree_jobs):
+    """Process-pool task: fit the multi-output forest on every horizon target, save it"""
+    X = np.load(X_path, mmap_mode='r')
+    Y = np.load(Y_path, mmap_mode='r')
+    n_train = _split_point(len(X))
+
+    start = time.perf_counter()
+    model = build_random_forest(tree_jobs)
+    model.fit(X[:n_train], Y[:n_train])
+    model.feature_names_in_ = np.asarray(feature_cols, dtype=object)
+    Y_test_pred = model.predict(X[n_train:])
+
+    joblib.dump(model, os.path.join(MODELS_DIR, MULTI_OUTPUT_MODEL_FILENAME))
+
+    return {
+        'test_mae': {hours_ahead: float(mean_absolute_error(Y[n_train:, idx], Y_test_pred[:, idx]))
+                     for idx, hours_ahead in enumerate(PREDICTION_HORIZONS)},
+        'fit_seconds': round(time.perf_counter() - start, 2),
+        'worker_pid': os.getpid(),
+        'worker_peak_rss_mb': _peak_rss_mb()
+    }
+
+
+def discard_stale_models(models_dir=MODELS_DIR):
+    """
+    Remove flat exports of the models this run rewrites, and the multi-output
+    model itself when it is not retrained; serving prefers both, and they
+    were fitted on the previous feature order.
+    """
+    model_names = [f'aqi_rf_model_{hours_ahead}h' for hours_ahead in PREDICTION_HORIZONS]
+    multi_name = MULTI_OUTPUT_MODEL_FILENAME[:-len('.pkl')]
+    model_names.append(multi_name)
+    for model_name in model_names:
+        shutil.rmtree(flat_model_path(models_dir, model_name), ignore_errors=True)
+
+    multi_path = os.path.join(models_dir, MULTI_OUTPUT_MODEL_FILENAME)
+    if not TRAIN_MULTI_OUTPUT and os.path.exists(multi_path):
+        os.remove(multi_path)
+        print(f"✓ Removed {multi_path} (TRAIN_MULTI_OUTPUT is off)")
+
+
+# ============================================================================
+# DRIVER
+# ============================================================================
+
+def train_all_models_parallel(df, processes=DEFAULT_PROCESSES, tree_jobs=DEFAULT_TREE_JOBS):
+    """Train every horizon in a process pool over one memory-mapped feature matrix"""
+
+    print("\n" + "=" * 70)
+    print(f"PARALLEL MULTI-HORIZON TRAINING ({processes} processes x {tree_jobs} tree jobs)")
+    print("=" * 70)
+
+    discard_stale_models()
+
+    feature_cols = get_feature_columns(df)
+    feature_names_path = os.path.join(MODELS_DIR, 'feature_names.txt')
+    with open(feature_names_path, 'w') as f:
+        for feat in feature_cols:
+            f.write(f"{feat}\n")
+    print(f"✓ Saved feature names to {feature_names_path}")
+
+    X_path, Y_path = write_shared_matrix(df, feature_cols)
+    print(f"✓ Wrote shared feature matrix ({len(df)} x {len(feature_cols)}, float32) to {SHARED_DIR}/")
+
+    all_metrics, multi_metrics = [], None
+    try:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            futures = {}
+            if TRAIN_MULTI_OUTPUT:
+                # Submitted first: the largest fit, started while the horizons queue
+                futures[pool.submit(_train_multi_output_worker, X_path, Y_path, feature_cols, tree_jobs)] = None
+            for hours_ahead in PREDICTION_HORIZONS:
+                futures[pool.submit(_train_horizon_worker, hours_ahead, X_path, Y_path,
+                                    feature_cols, tree_jobs)] = hours_ahead
+            for future in as_completed(futures):
+                metrics = future.result()
+                if futures[future] is None:
+                    multi_metrics = metrics
+                    mean_mae = np.mean(list(metrics['test_mae'].values()))
+                    print(f"✓ multi-output done in {metrics['fit_seconds']:.1f}s "
+                          f"(mean MAE {mean_mae:.2f}, worker peak RSS {metrics['worker_peak_rss_mb']} MB)")
+                    continue
+                all_metrics.append(metrics)
+                print(f"✓ {metrics['hours_ahead']:2d}h done in {metrics['fit_seconds']:.1f}s "
+                      f"(MAE {metrics['test_mae']:.2f}, worker peak RSS {metrics['worker_peak_rss_mb']} MB)")
+    finally:
+        shutil.rmtree(SHARED_DIR, ignore_errors=True)
+
+    all_metrics.sort(key=lambda m: m['hours_ahead'])
+    return all_metrics, feature_cols, multi_metrics
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Train all horizon models in parallel')
+    parser.add_argument('--data', default=DATA_FILE, help='Training CSV (default: %(default)s)')
+    parser.add_argument('--feature-store', default=FEATURE_STORE_DIR,
+                        help='Load features from this columnar store instead of recomputing them')
+    parser.add_argument('--processes', type=int, default=DEFAULT_PROCESSES,
+                        help='Horizons trained at the same time (default: %(default)s)')
+    parser.add_argument('--tree-jobs', type=int, default=DEFAULT_TREE_JOBS,
+                        help='n_jobs inside each forest (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    run_start = time.perf_counter()
+
+    if args.feature_store:
+        df_prepared = load_training_frame(args.data, args.feature_store)
+    else:
+        print(f"\nLoading data from {args.data}...")
+        df_prepared = prepare_multi_horizon_data(pd.read_csv(args.data))
+
+    all_metrics, feature_cols, multi_metrics = train_all_models_parallel(df_prepared, args.processes, args.tree_jobs)
+
+    metrics_path = os.path.join(MODELS_DIR, 'model_metrics.json')
+    with open(metrics_path, 'w') as f:
+        json.dump(all_metrics, f, indent=2)
+    print(f"\n✓ Saved metrics to {metrics_path}")
+
+    # Children's ru_maxrss is the largest single worker; the sum bounds concurrent use
+    worker_peaks = [m['worker_peak_rss_mb'] for m in all_metrics + ([multi_metrics] if multi_metrics else [])]
+    report = {
+        'wall_clock_seconds': round(time.perf_counter() - run_start, 2),
+        'processes': args.processes,
+        'tree_jobs': args.tree_jobs,
+        'samples': len(df_prepared),
+        'features': len(feature_cols),
+        'peak_rss_mb': {
+            'driver': _peak_rss_mb(resource.RUSAGE_SELF),
+            'largest_worker': _peak_rss_mb(resource.RUSAGE_CHILDREN),
+            'sum_of_worker_peaks': round(sum(worker_peaks), 1)
+        },
+        'horizon_fit_seconds': {m['hours_ahead']: m['fit_seconds'] for m in all_metrics},
+        'multi_output': multi_metrics
+    }
+
+    report_path = os.path.join(MODELS_DIR, RUN_REPORT_FILENAME)
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print("\n" + "=" * 70)
+    print("PARALLEL TRAINING COMPLETE")
+    print("=" * 70)
+    print(f"  Wall clock:           {report['wall_clock_seconds']:.1f}s")
+    print(f"  Peak RSS (driver):    {report['peak_rss_mb']['driver']} MB")
+    print(f"  Peak RSS (worker):    {report['peak_rss_mb']['largest_worker']} MB")
+    print(f"  Sum of worker peaks:  {report['peak_rss_mb']['sum_of_worker_peaks']} MB")
+    print(f"✓ Saved run report to {report_path}")
+    print("\nExport flat-array models for serving (from the repository root):")
+    print("  python -m app.tree_inference app/models")
+
+    return all_metrics, report
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,269 @@
+"""
+Flat-Array Tree Inference Engine
+================================
+Converts trained scikit-learn forests into flat NumPy arrays
+(feature index, threshold, left/right child, leaf value) and evaluates
+them without sklearn at serve time.
+
+Forecast requests predict a single row, where sklearn's per-call input
+validation and joblib dispatch cost more than walking the trees. The
+evaluator here walks every tree of the forest for all rows at once with
+plain NumPy indexing.
+
+Export (run from the repository root):
+    python -m app.tree_inference app/models
+
+Every exported model is checked against model.predict before it is written.
+Its meta.json records the size, mtime and sha256 of the source pickle, and
+an export whose pickle has since been rewritten (e.g. by train_model.py) is
+treated as stale and not served.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sys
+from typing import Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+FLAT_DIR_NAME = 'flat'
+FLAT_ARRAYS = ('feature', 'threshold', 'left', 'right', 'value', 'roots')
+PARITY_ROWS = 500
+PARITY_RTOL = 1e-9
+PARITY_ATOL = 1e-6
+
+
+# ============================================================================
+# FLAT FOREST
+# ============================================================================
+
+class FlatForest:
+    """A tree ensemble stored as flat NumPy arrays"""
+
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth, n_features):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value          # (n_nodes, n_outputs)
+        self.roots = roots          # index of each tree's root node
+        self.max_depth = int(max_depth)
+        self.n_features_in_ = int(n_features)
+        self.n_outputs_ = value.shape[1]
+        self.n_estimators = len(roots)
+
+    @classmethod
+    def from_sklearn(cls, model) -> 'FlatForest':
+        """Flatten a fitted RandomForestRegressor (or any forest of DecisionTreeRegressors)"""
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            node_ids = np.arange(tree.node_count)
+            is_leaf = tree.children_left == -1
+
+            # Leaves point at themselves so every row can take max_depth steps
+            left = np.where(is_leaf, node_ids, tree.children_left) + offset
+            right = np.where(is_leaf, node_ids, tree.children_right) + offset
+
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(tree.threshold)
+            lefts.append(left)
+            rights.append(right)
+            values.append(tree.value.reshape(tree.node_count, -1))
+            roots.append(offset)
+
+            offset += tree.node_count
+            max_depth = max(max_depth, tree.max_depth)
+
+        return cls(
+            feature=np.concatenate(features).astype(np.int32),
+            threshold=np.concatenate(thresholds).astype(np.float64),
+            left=np.concatenate(lefts).astype(np.int32),
+            right=np.concatenate(rights).astype(np.int32),
+            value=np.concatenate(values).astype(np.float64),
+            roots=np.asarray(roots, dtype=np.int32),
+            max_depth=max_depth,
+            n_features=model.n_features_in_
+        )
+
+    def predict(self, X) -> np.ndarray:
+        """
+        Predict for one or many rows.
+
+        Mirrors RandomForestRegressor.predict: returns shape (n_rows,) for
+        single-output forests and (n_rows, n_outputs) otherwise. X must be
+        NaN-free with columns in training order.
+        """
+        # sklearn evaluates splits on float32 inputs
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X has {X.shape[1]} features, expected {self.n_features_in_}")
+
+        rows = np.arange(X.shape[0])[:, None]
+        nodes = np.broadcast_to(self.roots, (X.shape[0], self.n_estimators))
+
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+
+        predictions = self.value[nodes].mean(axis=1)
+        if self.n_outputs_ == 1:
+            return predictions[:, 0]
+        return predictions
+
+    def save(self, path: str, source: Optional[Dict] = None):
+        """
+        Write each array as its own .npy file plus a small meta.json;
+        `source` is the pickle's source_fingerprint().
+        """
+        os.makedirs(path, exist_ok=True)
+        for name in FLAT_ARRAYS:
+            np.save(os.path.join(path, f'{name}.npy'), getattr(self, name))
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump({
+                'max_depth': self.max_depth,
+                'n_features': self.n_features_in_,
+                'n_outputs': self.n_outputs_,
+                'n_estimators': self.n_estimators,
+                'source': source
+            }, f, indent=2)
+
+    @classmethod
+    def load(cls, path: str, mmap_mode: Optional[str] = None) -> 'FlatForest':
+        """Load a flat forest written by save()"""
+        with open(os.path.join(path, 'meta.json'), 'r') as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode)
+                  for name in FLAT_ARRAYS}
+        return cls(max_depth=meta['max_depth'], n_features=meta['n_features'], **arrays)
+
+
+def flat_model_path(models_dir: str, model_name: str) -> str:
+    """Directory holding the flat arrays for a model (e.g. 'aqi_rf_model_1h')"""
+    return os.path.join(models_dir, FLAT_DIR_NAME, model_name)
+
+
+def flat_model_exists(models_dir: str, model_name: str) -> bool:
+    return os.path.exists(os.path.join(flat_model_path(models_dir, model_name), 'meta.json'))
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_fingerprint(pickle_path: str) -> Dict:
+    """Identity of the pickle an export was made from"""
+    stat = os.stat(pickle_path)
+    return {'file': os.path.basename(pickle_path), 'bytes': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns, 'sha256': _sha256(pickle_path)}
+
+
+def flat_model_is_current(models_dir: str, model_name: str) -> bool:
+    """
+    True if the flat export was made from the model's pickle as it is now,
+    or if there is no pickle to compare with (flat-only deployments). An
+    export without a recorded source is stale. A matching size and mtime
+    is trusted; otherwise (e.g. a copy that reset mtimes) the hash decides.
+    """
+    pickle_path = os.path.join(models_dir, f'{model_name}.pkl')
+    if not os.path.exists(pickle_path):
+        return True
+    with open(os.path.join(flat_model_path(models_dir, model_name), 'meta.json'), 'r') as f:
+        source = json.load(f).get('source')
+    if not source:
+        return False
+
+    stat = os.stat(pickle_path)
+    if stat.st_size != source['bytes']:
+        return False
+    if stat.st_mtime_ns == source['mtime_ns']:
+        return True
+    return _sha256(pickle_path) == source['sha256']
+
+
+# ============================================================================
+# PARITY CHECK
+# ============================================================================
+
+def make_parity_rows(flat: FlatForest, n_rows: int = PARITY_ROWS, seed: int = 0) -> np.ndarray:
+    """
+    Build rows that exercise both sides of the forest's own split thresholds.
+    Values are drawn from the thresholds used for each feature, nudged
+    slightly up or down, so no training data is needed.
+    """
+    rng = np.random.default_rng(seed)
+    is_split = flat.left != np.arange(len(flat.left))
+    X = rng.normal(0, 100, size=(n_rows, flat.n_features_in_))
+
+    for feature_idx in range(flat.n_features_in_):
+        feature_thresholds = flat.threshold[is_split & (flat.feature == feature_idx)]
+        if len(feature_thresholds):
+            picks = rng.choice(feature_thresholds, size=n_rows)
+            X[:, feature_idx] = picks + rng.choice([-1e-3, 1e-3], size=n_rows)
+
+    return X
+
+
+def check_parity(model, flat: FlatForest, X) -> float:
+    """Compare flat predictions with model.predict and return the max abs difference"""
+    expected = np.asarray(model.predict(X), dtype=np.float64)
+    actual = flat.predict(X)
+
+    if not np.allclose(actual, expected, rtol=PARITY_RTOL, atol=PARITY_ATOL):
+        max_diff = float(np.max(np.abs(actual - expected)))
+        raise AssertionError(f"Flat forest predictions differ from model.predict (max diff {max_diff})")
+
+    return float(np.max(np.abs(actual - expected))) if len(expected) else 0.0
+
+
+# ============================================================================
+# EXPORT
+# ============================================================================
+
+def export_models_dir(models_dir: str) -> Dict[str, float]:
+    """Flatten every forest pickle in models_dir and verify parity before saving"""
+    import joblib
+
+    exported = {}
+    for filename in sorted(os.listdir(models_dir)):
+        if not (filename.startswith('aqi_rf_model_') and filename.endswith('.pkl')):
+            continue
+
+        model_name = filename[:-len('.pkl')]
+        pickle_path = os.path.join(models_dir, filename)
+        model = joblib.load(pickle_path)
+        flat = FlatForest.from_sklearn(model)
+
+        X = make_parity_rows(flat)
+        max_diff = check_parity(model, flat, X)
+
+        flat.save(flat_model_path(models_dir, model_name), source=source_fingerprint(pickle_path))
+        exported[model_name] = max_diff
+        print(f"✓ Exported {model_name}: {flat.n_estimators} trees, "
+              f"{len(flat.feature)} nodes, max parity diff {max_diff:.2e}")
+
+    if not exported:
+        print(f"⚠️  No aqi_rf_model_*.pkl files found in {models_dir}")
+    return exported
+
+
+if __name__ == '__main__':
+    default_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models')
+    export_models_dir(sys.argv[1] if len(sys.argv) > 1 else default_dir)
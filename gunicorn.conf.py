@@ -0,0 +1,34 @@
+"""
+Gunicorn configuration (picked up automatically by `gunicorn run:app`).
+
+With preload_app the app - and the memory-mapped flat model arrays - are
+loaded once in the master before forking, so every worker shares the same
+physical pages. Models only available as pickled sklearn forests are not
+shared that way (the startup report flags them). Background threads do not
+survive fork, so they are started per worker in post_fork instead of in
+create_app.
+"""
+
+import os
+
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+if preload_app:
+    os.environ['DEFER_BACKGROUND_JOBS'] = 'true'
+
+
+def post_fork(server, worker):
+    from app.memory_report import log_memory
+
+    log_memory(f"worker {worker.pid} after fork")
+
+    if preload_app:
+        from app import log_model_storage, start_background_jobs
+        log_model_storage(f"worker {worker.pid} models")
+        start_background_jobs()
+
+
+def post_worker_init(worker):
+    from app.memory_report import log_memory
+
+    log_memory(f"worker {worker.pid} ready")